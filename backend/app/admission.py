@@ -0,0 +1,293 @@
+import asyncio
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+from config import config
+
+logger = logging.getLogger("agent")
+
+ADMIT = "admit"
+QUEUE = "queue"
+REJECT = "reject"
+
+@dataclass
+class Decision:
+    """Outcome of one admission request; ``retry_after`` is seconds until the caller should try again"""
+    action: str
+    retry_after: int = 0
+    queue_id: Optional[str] = None
+    position: int = 0
+    estimated_wait: int = 0
+
+def default_capacity() -> int:
+    """Concurrent calls this host's agent workers take, or 0 when they are CPU-limited instead"""
+    return config.ADMISSION_MAX_SESSIONS or config.AGENT_WORKERS * config.AGENT_MAX_JOBS
+
+class AdmissionStore:
+    """Worker load, pending admissions and the caller queue in a local SQLite file.
+
+    Agent job processes publish their load here and every API worker on the machine
+    reads it, so admission decisions see the whole host. Each decision runs in one
+    ``BEGIN IMMEDIATE`` transaction, so concurrent API workers cannot over-admit.
+    """
+
+    def __init__(
+        self,
+        path: str = config.ADMISSION_STORE_PATH,
+        capacity: Optional[int] = None,
+        max_loop_lag: float = config.ADMISSION_MAX_LOOP_LAG_MS / 1000,
+        queue_max: int = config.ADMISSION_QUEUE_MAX,
+        clock=time.time,
+    ):
+        self.path = path
+        self.capacity = default_capacity() if capacity is None else capacity
+        self.max_loop_lag = max_loop_lag
+        self.queue_max = queue_max
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(
+                "CREATE TABLE IF NOT EXISTS worker_load "
+                "(worker TEXT PRIMARY KEY, active INTEGER NOT NULL, loop_lag REAL NOT NULL, "
+                "avg_call REAL NOT NULL, updated_at REAL NOT NULL);"
+                "CREATE TABLE IF NOT EXISTS admissions (session_id TEXT PRIMARY KEY, admitted_at REAL NOT NULL);"
+                "CREATE TABLE IF NOT EXISTS admission_queue "
+                "(queue_id TEXT PRIMARY KEY, enqueued_at REAL NOT NULL, seen_at REAL NOT NULL);"
+            )
+            self._conn = conn
+        return self._conn
+
+    def _publish(self, worker: str, active: int, loop_lag: float, avg_call: float):
+        with self._lock:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO worker_load (worker, active, loop_lag, avg_call, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (worker, active, loop_lag, avg_call, self._clock()),
+            )
+
+    def _claim(self, session_id: str):
+        with self._lock:
+            self._connect().execute("DELETE FROM admissions WHERE session_id = ?", (session_id,))
+
+    def _load(self, conn: sqlite3.Connection, now: float) -> tuple[int, float, float]:
+        """Active plus admitted-but-not-started calls, mean loop lag and mean call length"""
+        conn.execute("DELETE FROM admissions WHERE admitted_at < ?", (now - config.ADMISSION_PENDING_SECONDS,))
+        conn.execute("DELETE FROM admission_queue WHERE seen_at < ?", (now - config.ADMISSION_QUEUE_TTL_SECONDS,))
+        active, lag, avg_call = conn.execute(
+            "SELECT COALESCE(SUM(active), 0), COALESCE(AVG(loop_lag), 0), AVG(NULLIF(avg_call, 0)) "
+            "FROM worker_load WHERE updated_at >= ?",
+            (now - config.ADMISSION_STALE_SECONDS,),
+        ).fetchone()
+        pending = conn.execute("SELECT COUNT(*) FROM admissions").fetchone()[0]
+        return active + pending, lag, avg_call or config.ADMISSION_AVG_CALL_SECONDS
+
+    def _estimate(self, position: int, free: int, avg_call: float) -> int:
+        """Seconds until ``position`` callers ahead have been admitted"""
+        if self.capacity <= 0:
+            return config.ADMISSION_POLL_SECONDS
+        return max(1, math.ceil(avg_call * max(position - free, 1) / self.capacity))
+
+    def _admit(self, session_ids: list[str], queue_id: Optional[str], resume: bool) -> Decision:
+        now = self._clock()
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                decision = self._decide(conn, now, session_ids, queue_id, resume)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return decision
+
+    def _decide(self, conn: sqlite3.Connection, now: float, session_ids: list[str], queue_id: Optional[str], resume: bool) -> Decision:
+        load, lag, avg_call = self._load(conn, now)
+        free = self.capacity - load if self.capacity > 0 else len(session_ids)
+        queued = conn.execute(
+            "SELECT enqueued_at FROM admission_queue WHERE queue_id = ?", (queue_id,)
+        ).fetchone() if queue_id else None
+        if queued:
+            ahead = conn.execute(
+                "SELECT COUNT(*) FROM admission_queue WHERE enqueued_at < ?", (queued[0],)
+            ).fetchone()[0]
+        else:
+            # A rejoining caller already waited once; new callers go behind the queue
+            ahead = 0 if resume else conn.execute("SELECT COUNT(*) FROM admission_queue").fetchone()[0]
+
+        if lag <= self.max_loop_lag and free - ahead >= len(session_ids):
+            if queued:
+                conn.execute("DELETE FROM admission_queue WHERE queue_id = ?", (queue_id,))
+            conn.executemany(
+                "INSERT OR REPLACE INTO admissions (session_id, admitted_at) VALUES (?, ?)",
+                [(session_id, now) for session_id in session_ids],
+            )
+            return Decision(ADMIT)
+
+        if len(session_ids) == 1 and (queued or ahead < self.queue_max):
+            if not queued:
+                queue_id = uuid.uuid4().hex
+                conn.execute(
+                    "INSERT INTO admission_queue (queue_id, enqueued_at, seen_at) VALUES (?, ?, ?)",
+                    (queue_id, now, now),
+                )
+            else:
+                conn.execute("UPDATE admission_queue SET seen_at = ? WHERE queue_id = ?", (now, queue_id))
+            wait = self._estimate(ahead + 1, free, avg_call)
+            return Decision(
+                QUEUE,
+                retry_after=min(wait, config.ADMISSION_POLL_SECONDS),
+                queue_id=queue_id,
+                position=ahead + 1,
+                estimated_wait=wait,
+            )
+
+        wait = self._estimate(ahead + len(session_ids), free, avg_call)
+        return Decision(REJECT, retry_after=wait, estimated_wait=wait)
+
+    async def publish(self, worker: str, active: int, loop_lag: float, avg_call: float):
+        """Record one job process's current load"""
+        await asyncio.to_thread(self._publish, worker, active, loop_lag, avg_call)
+
+    async def claim(self, session_id: str):
+        """Mark an admitted session as started, so it counts through its worker's load instead"""
+        await asyncio.to_thread(self._claim, session_id)
+
+    async def admit(self, session_ids: list[str], queue_id: Optional[str] = None, resume: bool = False) -> Decision:
+        """Admit, queue or reject callers for ``session_ids``, reserving capacity when admitted.
+
+        Only single callers are queued; ``queue_id`` keeps a queued caller's place
+        across polls and ``resume`` lets a dropped caller skip the queue.
+        """
+        return await asyncio.to_thread(self._admit, session_ids, queue_id, resume)
+
+class LoadReporter:
+    """Publishes a job process's active calls, event-loop lag and mean call length to the admission store"""
+
+    def __init__(self, store: AdmissionStore, interval: float = config.ADMISSION_PUBLISH_SECONDS):
+        self.store = store
+        self.interval = interval
+        self.worker = f"{os.uname().nodename}:{os.getpid()}"
+        self.active = 0
+        self.avg_call = 0.0
+        self._started: dict[str, float] = {}
+        self._lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def session_started(self, session_id: Optional[str]) -> str:
+        """Count a call that just started; returns the key to pass to ``session_ended``"""
+        key = session_id or uuid.uuid4().hex
+        self._started[key] = time.monotonic()
+        self.active += 1
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        # Publish before claiming so the call is never missing from both
+        await self._publish()
+        if session_id:
+            try:
+                await self.store.claim(session_id)
+            except sqlite3.Error as e:
+                logger.warning("Could not claim admission for session %s: %s", session_id, e)
+        return key
+
+    async def session_ended(self, key: str):
+        """Stop counting a call and fold its length into the mean call length"""
+        started = self._started.pop(key, None)
+        if started is None:
+            return
+        self.active -= 1
+        duration = time.monotonic() - started
+        # Exponentially weighted, so the estimate follows recent call lengths
+        self.avg_call = duration if not self.avg_call else 0.8 * self.avg_call + 0.2 * duration
+        if self.active == 0 and self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self._publish()
+
+    async def _publish(self):
+        try:
+            await self.store.publish(self.worker, self.active, self._lag, self.avg_call)
+        except sqlite3.Error as e:
+            logger.warning("Could not publish worker load: %s", e)
+
+    async def _run(self):
+        # Sleep in short ticks; how late each tick wakes is the loop's lag
+        tick = 0.1
+        while True:
+            lag, deadline = 0.0, time.monotonic() + self.interval
+            while time.monotonic() < deadline:
+                started = time.monotonic()
+                await asyncio.sleep(tick)
+                lag = max(lag, time.monotonic() - started - tick)
+            self._lag = lag
+            await self._publish()
+
+class TokenBucketLimiter:
+    """Per-client token buckets: ``rate`` requests per second with bursts of up to ``burst``.
+
+    Buckets live in this process, so each API worker enforces the limit separately.
+    """
+
+    def __init__(
+        self,
+        rate: float = config.TOKEN_RATE_PER_MINUTE / 60,
+        burst: int = config.TOKEN_RATE_BURST,
+        max_clients: int = config.RATE_LIMIT_MAX_CLIENTS,
+        clock=time.monotonic,
+    ):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.max_clients = max_clients
+        self._clock = clock
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    def acquire(self, client: str, cost: int = 1) -> float:
+        """Take ``cost`` tokens from the client's bucket; returns 0, or seconds until they are available.
+
+        A cost above ``burst`` can never be paid, so it returns ``math.inf``.
+        """
+        if self.rate <= 0:
+            return 0.0
+        if cost > self.burst:
+            return math.inf
+        now = self._clock()
+        tokens, updated = self._buckets.pop(client, (float(self.burst), now))
+        tokens = min(float(self.burst), tokens + (now - updated) * self.rate)
+        if tokens >= cost:
+            tokens -= cost
+            wait = 0.0
+        else:
+            wait = (cost - tokens) / self.rate
+        self._buckets[client] = (tokens, now)
+        while len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return wait
+
+_store: Optional[AdmissionStore] = None
+_reporter: Optional[LoadReporter] = None
+
+def get_admission_store() -> AdmissionStore:
+    """Process-wide admission store at ADMISSION_STORE_PATH"""
+    global _store
+    if _store is None:
+        _store = AdmissionStore()
+    return _store
+
+def get_load_reporter() -> LoadReporter:
+    """Load reporter for this job process"""
+    global _reporter
+    if _reporter is None:
+        _reporter = LoadReporter(get_admission_store())
+    return _reporter
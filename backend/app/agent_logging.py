@@ -0,0 +1,161 @@
+import atexit
+import datetime
+import json
+import logging
+import queue
+import re
+import sys
+import zlib
+from logging.handlers import QueueHandler, QueueListener
+from typing import Callable, Optional
+from config import config
+
+EMAIL_PATTERN = re.compile(r"([\w.+-])[\w.+-]*@([\w-]+(?:\.[\w-]+)+)")
+# Digit runs with a leading + or separators; bare runs (IDs, epoch times) are left alone
+PHONE_PATTERN = re.compile(r"(?<![\w.:/+-])\+?\(?\d[\d\s().-]{4,}\d\b(?![.:/-]\d)")
+# Separated digits that are not phone numbers: dates, decimals and IPv4 addresses
+NOT_PHONE_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2}|\d+\.\d+|\d{1,3}(?:\.\d{1,3}){3}")
+
+# LogRecord attributes that are not caller-supplied ``extra`` fields
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "log_context"}
+
+class Sensitive:
+    """Wraps a free-text value (name, address) so it is only written out when LOG_PII is on"""
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self) -> str:
+        return str(self.value) if config.LOG_PII else "[redacted]"
+
+def _mask_phone(match: re.Match) -> str:
+    number = match.group()
+    digits = re.sub(r"\D", "", number)
+    if not 7 <= len(digits) <= 15 or number.isdigit() or NOT_PHONE_PATTERN.fullmatch(number):
+        return number
+    return "***" + digits[-4:]
+
+def mask_contacts(text: str) -> str:
+    """Mask emails and phone numbers, keeping enough to correlate (first letter, last 4 digits)"""
+    text = EMAIL_PATTERN.sub(r"\1***@\2", text)
+    return PHONE_PATTERN.sub(_mask_phone, text)
+
+def redact(text: str) -> str:
+    """``mask_contacts`` unless LOG_PII is on"""
+    return text if config.LOG_PII else mask_contacts(text)
+
+def redact_value(value):
+    """``redact`` applied to a structured ``extra`` value; numbers pass through, other objects as text"""
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, dict):
+        return {key: redact_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact_value(item) for item in value]
+    return redact(str(value))
+
+def no_context() -> dict:
+    return {}
+
+class ContextQueueHandler(QueueHandler):
+    """Enqueues records without formatting them, tagged with ``context()`` (the agent's room).
+
+    The stock QueueHandler formats in the calling thread; here formatting, redaction
+    and I/O all happen on the listener thread, off the media event loop.
+    """
+
+    def __init__(self, log_queue: queue.SimpleQueue, max_size: int, context: Callable[[], dict] = no_context):
+        super().__init__(log_queue)
+        self.max_size = max_size
+        self.context = context
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.log_context = self.context()
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        # SimpleQueue.put is lock-free C code; bound it by size instead of a locked Queue
+        if self.queue.qsize() >= self.max_size:
+            self.dropped += 1
+            return
+        self.queue.put(record)
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, room context and extras"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": redact(record.getMessage()),
+            **getattr(record, "log_context", {}),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = redact_value(value)
+        if record.exc_info:
+            entry["exc_info"] = redact(self.formatException(record.exc_info))
+        return json.dumps(entry, default=str)
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines for local development, with the same redaction"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        room = getattr(record, "log_context", {}).get("room")
+        prefix = f"[{room}] " if room else ""
+        record.msg, record.args = prefix + redact(record.getMessage()), None
+        return super().format(record)
+
+class TurnSampler:
+    """Keeps per-turn metrics logs for a fixed share of turns.
+
+    Decided per speech_id, so every stage of a sampled turn is logged together.
+    """
+
+    def __init__(self, rate: float):
+        self.threshold = int(max(0.0, min(rate, 1.0)) * 0xFFFFFFFF)
+
+    def sample(self, speech_id: Optional[str]) -> bool:
+        if self.threshold >= 0xFFFFFFFF:
+            return True
+        if not speech_id or self.threshold == 0:
+            return False
+        return zlib.crc32(speech_id.encode()) <= self.threshold
+
+_listener: Optional[QueueListener] = None
+
+def setup_logging(stream=None, context: Callable[[], dict] = no_context) -> QueueListener:
+    """Route the "agent" loggers through a queue to a listener thread; safe to call again.
+
+    ``context`` returns fields to tag each record with. This module does not import
+    LiveKit, so services without an agent (email dispatcher, retention) can use it.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter() if config.LOG_FORMAT == "json" else TextFormatter(
+        "%(asctime)s %(levelname)s %(name)s: %(message)s"
+    ))
+    log_queue = queue.SimpleQueue()
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+    logger = logging.getLogger("agent")
+    logger.handlers = [ContextQueueHandler(log_queue, config.LOG_QUEUE_SIZE, context)]
+    logger.setLevel(config.LOG_LEVEL)
+    # livekit's own handlers format records in the calling thread; keep ours off them
+    logger.propagate = False
+    return _listener
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -1,50 +1,297 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from livekit import api
-import uuid
-from datetime import timedelta
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
+from sqlalchemy.ext.asyncio import AsyncSession
+import csv
+import hmac
+import io
+import json
+import logging
+import math
+import sqlite3
+from typing import Optional
 from config import config
+from admission import ADMIT, QUEUE, Decision, TokenBucketLimiter, get_admission_store
+from async_db import AsyncSessionLocal, get_async_db
+import async_crud
+from crud import decode_cursor, edit_values, encode_cursor
+from latency_metrics import ADMISSION_DECISIONS, render_metrics
+from models import SupportTicket
+from token_service import SESSION_ID_PATTERN, TokenService
+
+logger = logging.getLogger("agent")
 
 app = FastAPI(title="DeskHelp Support API")
 
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
+    allow_origins=config.CORS_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After"],
 )
 
-@app.post("/api/token")
-async def create_room_token():
-    """Generate a LiveKit room token for anonymous users"""
-    if not config.validate_livekit_config():
-        missing_vars = config.get_missing_livekit_vars()
+# Validate LiveKit settings once at startup rather than on every token request
+try:
+    token_service: Optional[TokenService] = TokenService.from_config(config)
+    token_config_error = None
+except ValueError as e:
+    token_service = None
+    token_config_error = str(e)
+
+class TokenRequest(BaseModel):
+    # The resume_token of a dropped call's earlier token response
+    resume_token: Optional[str] = Field(None, max_length=200)
+    queue_id: Optional[str] = Field(None, pattern=SESSION_ID_PATTERN)
+
+# A batch is charged one rate-limit token per session, so it can be no larger than the bucket
+TOKEN_BATCH_MAX = (
+    min(config.TOKEN_BATCH_MAX, config.TOKEN_RATE_BURST) if config.TOKEN_RATE_PER_MINUTE > 0 else config.TOKEN_BATCH_MAX
+)
+
+class TokenBatchRequest(BaseModel):
+    count: int = Field(ge=1, le=TOKEN_BATCH_MAX)
+
+class TicketEdit(BaseModel):
+    id: int = Field(gt=0)
+    name: Optional[str] = Field(None, min_length=1, max_length=100)
+    email: Optional[str] = Field(None, min_length=1, max_length=255)
+    phone: Optional[str] = Field(None, min_length=1, max_length=20)
+    address: Optional[str] = Field(None, min_length=1, max_length=500)
+    issue: Optional[str] = Field(None, min_length=1, max_length=100)
+    price: Optional[float] = Field(None, gt=0)
+
+class TicketBatchEditRequest(BaseModel):
+    edits: list[TicketEdit] = Field(min_length=1, max_length=config.TICKET_EDIT_BATCH_MAX)
+
+TICKET_FIELDS = ["id", "name", "email", "phone", "address", "issue", "price", "created_at"]
+EXPORT_BATCH_SIZE = 1000
+
+def ticket_to_dict(ticket: SupportTicket) -> dict:
+    data = {field: getattr(ticket, field) for field in TICKET_FIELDS}
+    data["created_at"] = ticket.created_at.isoformat() if ticket.created_at else None
+    return data
+
+def get_token_service() -> TokenService:
+    if token_service is None:
+        raise HTTPException(status_code=500, detail=token_config_error)
+    return token_service
+
+def require_admin(authorization: Optional[str] = Header(None)):
+    """Routes that expose or change caller details need ``Authorization: Bearer <ADMIN_API_KEY>``"""
+    if not config.ADMIN_API_KEY:
+        raise HTTPException(status_code=503, detail="Admin routes are disabled; set ADMIN_API_KEY")
+    scheme, _, key = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(key.encode(), config.ADMIN_API_KEY.encode()):
+        raise HTTPException(
+            status_code=401, detail="Invalid or missing admin API key", headers={"WWW-Authenticate": "Bearer"}
+        )
+
+rate_limiter = TokenBucketLimiter()
+
+def client_address(request: Request) -> str:
+    if config.RATE_LIMIT_TRUST_PROXY:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+def rate_limit(request: Request, cost: int = 1):
+    """Spend ``cost`` of the client's token-request budget, or raise 429 with Retry-After"""
+    wait = rate_limiter.acquire(client_address(request), cost)
+    if wait == math.inf:
         raise HTTPException(
-            status_code=500, 
-            detail=f"LiveKit configuration missing: {', '.join(missing_vars)}"
+            status_code=400, detail=f"At most {rate_limiter.burst} tokens can be requested at once"
+        )
+    if wait:
+        ADMISSION_DECISIONS.labels("rate_limited").inc()
+        raise HTTPException(
+            status_code=429,
+            detail="Too many token requests",
+            headers={"Retry-After": str(math.ceil(wait))},
+        )
+
+async def admit(session_ids: list[str], queue_id: Optional[str] = None, resume: bool = False) -> Decision:
+    """Admission decision for new sessions; admits when admission control is off or its store fails"""
+    if not config.ADMISSION_CONTROL:
+        return Decision(ADMIT)
+    try:
+        decision = await get_admission_store().admit(session_ids, queue_id=queue_id, resume=resume)
+    except sqlite3.Error as e:
+        logger.warning("Admission store unavailable, admitting: %s", e)
+        decision = Decision(ADMIT)
+    ADMISSION_DECISIONS.labels(decision.action).inc()
+    return decision
+
+def not_admitted(decision: Decision) -> JSONResponse:
+    """202 with a queue position to poll with, or 503, both carrying Retry-After"""
+    headers = {"Retry-After": str(decision.retry_after)}
+    if decision.action == QUEUE:
+        return JSONResponse(
+            status_code=202,
+            headers=headers,
+            content={
+                "status": "queued",
+                "queue_id": decision.queue_id,
+                "position": decision.position,
+                "estimated_wait_seconds": decision.estimated_wait,
+                "retry_after": decision.retry_after,
+            },
         )
-    
-    session_id = str(uuid.uuid4())[:8]
-    room_name = f"support-{session_id}"
-    identity = f"customer-{session_id}"
-    
-    token = api.AccessToken(config.LIVEKIT_API_KEY, config.LIVEKIT_API_SECRET) \
-        .with_identity(identity) \
-        .with_name(f"Customer {session_id}") \
-        .with_grants(api.VideoGrants(
-            room_join=True,
-            room=room_name,
-        )) \
-        .with_ttl(timedelta(hours=1))
-    
+    return JSONResponse(
+        status_code=503,
+        headers=headers,
+        content={"detail": "All agents are busy, please try again later", "retry_after": decision.retry_after},
+    )
+
+@app.post("/api/token")
+async def create_room_token(
+    http_request: Request,
+    request: Optional[TokenRequest] = None,
+    service: TokenService = Depends(get_token_service),
+):
+    """Generate a LiveKit room token for anonymous users; pass resume_token to rejoin a dropped call.
+
+    Only a resume token this server signed, and still within the call's resume window,
+    rejoins the earlier room and skips the queue; any other value starts a new session.
+    While the agent workers are full, callers are queued (202 with a ``queue_id`` to send
+    back after Retry-After) or, once the queue is full, turned away with 503.
+    """
+    rate_limit(http_request)
+    resume_id = None
+    if request and request.resume_token:
+        resume_id = service.verify_resume_token(request.resume_token)
+        if resume_id is None:
+            logger.info("Ignoring an invalid or expired resume token")
+    session_id = resume_id or service.new_session_id()
+    decision = await admit([session_id], queue_id=request.queue_id if request else None, resume=resume_id is not None)
+    if decision.action != ADMIT:
+        return not_admitted(decision)
+    return service.issue(session_id)
+
+@app.post("/api/token/batch")
+async def create_room_tokens(
+    http_request: Request, request: TokenBatchRequest, service: TokenService = Depends(get_token_service)
+):
+    """Generate several room tokens in one round trip; all are admitted together or none are"""
+    rate_limit(http_request, cost=request.count)
+    session_ids = [service.new_session_id() for _ in range(request.count)]
+    decision = await admit(session_ids)
+    if decision.action != ADMIT:
+        return not_admitted(decision)
+    return {"tokens": service.issue_batch(session_ids)}
+
+@app.get("/api/tickets", dependencies=[Depends(require_admin)])
+async def list_tickets(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    email: Optional[str] = None,
+    phone: Optional[str] = None,
+    issue: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """List tickets oldest first; pass back next_cursor to fetch the following page"""
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    tickets = await async_crud.get_tickets_page(
+        db, limit=limit, after=after, email=email, phone=phone, issue=issue
+    )
+    return {
+        "tickets": [ticket_to_dict(ticket) for ticket in tickets],
+        "next_cursor": encode_cursor(tickets[-1]) if len(tickets) == limit else None,
+    }
+
+@app.get("/api/tickets/export", dependencies=[Depends(require_admin)])
+async def export_tickets(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    email: Optional[str] = None,
+    phone: Optional[str] = None,
+    issue: Optional[str] = None,
+):
+    """Stream every matching ticket as NDJSON or CSV in constant memory"""
+
+    async def rows():
+        # The session lives inside the generator so it stays open for the whole stream
+        async with AsyncSessionLocal() as db:
+            if format == "csv":
+                buffer = io.StringIO()
+                writer = csv.DictWriter(buffer, fieldnames=TICKET_FIELDS)
+                writer.writeheader()
+                yield buffer.getvalue()
+            async for batch in async_crud.stream_tickets(
+                db, batch_size=EXPORT_BATCH_SIZE, email=email, phone=phone, issue=issue
+            ):
+                if format == "csv":
+                    buffer.seek(0)
+                    buffer.truncate()
+                    writer.writerows(ticket_to_dict(ticket) for ticket in batch)
+                    yield buffer.getvalue()
+                else:
+                    yield "".join(json.dumps(ticket_to_dict(ticket)) + "\n" for ticket in batch)
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        rows(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="tickets.{format}"'},
+    )
+
+@app.patch("/api/tickets", dependencies=[Depends(require_admin)])
+async def edit_tickets(request: TicketBatchEditRequest, db: AsyncSession = Depends(get_async_db)):
+    """Edit several tickets in one transaction; each sets only the fields it gives.
+
+    Every ticket is one ``UPDATE ... RETURNING``, so the response carries the stored
+    rows without reading them back. Later edits to the same ticket win.
+    """
+    edits: dict[int, dict] = {}
+    for edit in request.edits:
+        values = edit_values(**edit.model_dump(exclude={"id"}))
+        edits[edit.id] = {**edits.get(edit.id, {}), **values}
+    updated = await async_crud.edit_tickets(db, edits)
     return {
-        "token": token.to_jwt(),
-        "url": config.LIVEKIT_URL,
-        "room": room_name,
-        "session_id": session_id
+        "tickets": [ticket_to_dict(ticket) for ticket in updated.values()],
+        "not_found": [ticket_id for ticket_id in edits if ticket_id not in updated],
     }
 
+@app.get("/api/tickets/{ticket_id}", dependencies=[Depends(require_admin)])
+async def get_ticket(ticket_id: int, db: AsyncSession = Depends(get_async_db)):
+    ticket = await async_crud.get_ticket(db, ticket_id)
+    if not ticket:
+        raise HTTPException(status_code=404, detail=f"Ticket {ticket_id} not found")
+    return ticket_to_dict(ticket)
+
+@app.get("/api/stats", dependencies=[Depends(require_admin)])
+async def ticket_stats(
+    hours: int = Query(24, ge=1, le=24 * 31),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Tickets and revenue per issue and per hour for the last ``hours`` hours.
+
+    Read from the hourly stats that every ticket write keeps up to date, so the cost
+    does not grow with the number of tickets.
+    """
+    return await async_crud.get_ticket_stats(db, hours=hours)
+
+@app.post("/api/stats/rebuild", dependencies=[Depends(require_admin)])
+async def rebuild_ticket_stats(
+    hours: int = Query(24, ge=1, le=24 * 31),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Recount the hourly stats from every ticket, then return them like GET /api/stats"""
+    counted = await async_crud.rebuild_ticket_stats(db)
+    return {"rebuilt_from": counted, **await async_crud.get_ticket_stats(db, hours=hours)}
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus scrape endpoint, including agent job processes in multiprocess mode"""
+    payload, content_type = render_metrics()
+    return Response(content=payload, media_type=content_type)
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
\ No newline at end of file
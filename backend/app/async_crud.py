@@ -0,0 +1,176 @@
+import asyncio
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from crud import (
+    edit_statement, edit_values, edits_delta, new_ticket_rows, outbox_entries, previous_values_query, returned_ticket,
+    tickets_page_query,
+)
+from email_outbox import confirmation_rows
+from models import EmailOutbox, SupportTicket, TicketArchiveFile, TicketIdempotencyKey
+from ticket_archive import add_archived_stats, archived_files_query, read_archived_ticket
+from ticket_stats import StatsDelta, rebuild_statements, source_query, stats_queries, summarize, upsert_statements
+from typing import AsyncIterator, Optional
+from datetime import datetime, timezone
+
+async def create_ticket(
+    db: AsyncSession,
+    name: str,
+    email: str,
+    phone: str,
+    address: str,
+    issue: str,
+    price: float
+) -> SupportTicket:
+    """Create a new support ticket without blocking the event loop"""
+    rows, delta = new_ticket_rows([dict(name=name, email=email, phone=phone, address=address, issue=issue, price=price)])
+    db_ticket = SupportTicket(**rows[0])
+    db.add(db_ticket)
+    await apply_ticket_stats(db, delta)
+    # The confirmation email commits with its ticket, or not at all
+    await db.flush()
+    db.add_all(outbox_entries([db_ticket.id], rows))
+    await db.commit()
+    await db.refresh(db_ticket)
+    return db_ticket
+
+async def edit_ticket(
+    db: AsyncSession,
+    ticket_id: int,
+    name: Optional[str] = None,
+    email: Optional[str] = None,
+    phone: Optional[str] = None,
+    address: Optional[str] = None,
+    issue: Optional[str] = None,
+    price: Optional[float] = None
+) -> Optional[SupportTicket]:
+    """Edit an existing support ticket without blocking the event loop, changing only the given fields"""
+    values = edit_values(name=name, email=email, phone=phone, address=address, issue=issue, price=price)
+    return (await edit_tickets(db, {ticket_id: values})).get(ticket_id)
+
+async def edit_tickets(db: AsyncSession, edits: dict[int, dict]) -> dict[int, SupportTicket]:
+    """Apply several tickets' edits in one transaction and commit; returns the tickets that exist"""
+    updated = await update_tickets(db, edits)
+    await db.commit()
+    return updated
+
+async def insert_tickets(db: AsyncSession, tickets: list[dict]) -> list[int]:
+    """Bulk insert tickets and their confirmation emails and return the ticket IDs in input order.
+
+    Does not commit, so callers can group several writes into one transaction.
+    """
+    if not tickets:
+        return []
+    rows, delta = new_ticket_rows(tickets)
+    stmt = insert(SupportTicket).returning(SupportTicket.id, sort_by_parameter_order=True)
+    result = await db.execute(stmt, rows)
+    await apply_ticket_stats(db, delta)
+    ids = list(result.scalars().all())
+    emails = confirmation_rows(ids, tickets)
+    if emails:
+        await db.execute(insert(EmailOutbox), emails)
+    return ids
+
+async def insert_idempotency_keys(db: AsyncSession, keys: list[dict]):
+    """Record which ticket each idempotency key created. Does not commit."""
+    if keys:
+        now = datetime.now(timezone.utc)
+        await db.execute(insert(TicketIdempotencyKey), [{"created_at": now, **key} for key in keys])
+
+async def get_ticket_id_by_key(db: AsyncSession, key: str) -> Optional[int]:
+    """Ticket ID an idempotency key already created, if any"""
+    return await db.scalar(select(TicketIdempotencyKey.ticket_id).where(TicketIdempotencyKey.key == key))
+
+async def update_tickets(db: AsyncSession, edits: dict[int, dict]) -> dict[int, SupportTicket]:
+    """Apply each ticket's field values with one ``UPDATE ... RETURNING`` and no prior read. Does not commit.
+
+    Returns the updated tickets by ID; unknown IDs are left out. Only edits that change
+    issue or price need the old values (for the hourly stats), read in one locking SELECT.
+    """
+    query = previous_values_query(edits)
+    previous = {row.id: tuple(row[1:]) for row in await db.execute(query)} if query is not None else {}
+    returning = db.get_bind().dialect.update_returning
+    updated = {}
+    for ticket_id, values in edits.items():
+        if values and not returning:
+            # No UPDATE ... RETURNING on this database (MySQL): update, then read the row back
+            if (await db.execute(edit_statement(ticket_id, values, returning=False))).rowcount == 0:
+                continue
+            values = {}
+        ticket = (await db.scalars(edit_statement(ticket_id, values))).first()
+        if ticket is not None:
+            updated[ticket_id] = returned_ticket(ticket)
+    await apply_ticket_stats(db, edits_delta(previous, updated))
+    return updated
+
+async def apply_ticket_stats(db: AsyncSession, delta: StatsDelta):
+    """Add one transaction's ticket changes to the hourly stats. Does not commit."""
+    for stmt in upsert_statements(db.get_bind().dialect.name, delta):
+        await db.execute(stmt)
+
+async def rebuild_ticket_stats(db: AsyncSession) -> int:
+    """Recount the hourly stats from every ticket and commit; returns the number of tickets counted"""
+    for stmt in rebuild_statements(db.get_bind().dialect.name):
+        await db.execute(stmt)
+    delta, counted = StatsDelta(), 0
+    result = await db.stream(source_query())
+    async for partition in result.partitions():
+        for created_at, issue, price in partition:
+            delta.add(created_at, issue, price)
+        counted += len(partition)
+    # Archived tickets still count towards the stats
+    paths = (await db.scalars(select(TicketArchiveFile.path))).all()
+    counted += await asyncio.to_thread(add_archived_stats, delta, paths)
+    await apply_ticket_stats(db, delta)
+    await db.commit()
+    return counted
+
+async def get_ticket_stats(db: AsyncSession, hours: int = 24) -> dict:
+    """Ticket counts and revenue per issue and per hour, read from the maintained stats"""
+    by_issue, by_hour = stats_queries(hours)
+    return summarize(await db.execute(by_issue), await db.execute(by_hour))
+
+async def get_ticket(db: AsyncSession, ticket_id: int) -> Optional[SupportTicket]:
+    """Get a support ticket by ID, from the archive if the retention job has moved it there"""
+    ticket = await db.get(SupportTicket, ticket_id)
+    if ticket is None:
+        paths = (await db.scalars(archived_files_query(ticket_id))).all()
+        if paths:
+            # Parquet reads block, so they run off the event loop
+            ticket = await asyncio.to_thread(read_archived_ticket, paths, ticket_id)
+    return ticket
+
+async def get_tickets_page(
+    db: AsyncSession,
+    limit: int = 100,
+    after: Optional[tuple[datetime, int]] = None,
+    email: Optional[str] = None,
+    phone: Optional[str] = None,
+    issue: Optional[str] = None
+) -> list[SupportTicket]:
+    """Get a page of support tickets after the given (created_at, id) position"""
+    query = tickets_page_query(limit=limit, after=after, email=email, phone=phone, issue=issue)
+    return list((await db.scalars(query)).all())
+
+async def find_tickets_by_email(db: AsyncSession, email: str, limit: int = 20) -> list[SupportTicket]:
+    """Get a repeat caller's tickets by email, oldest first"""
+    return await get_tickets_page(db, limit=limit, email=email)
+
+async def find_tickets_by_phone(db: AsyncSession, phone: str, limit: int = 20) -> list[SupportTicket]:
+    """Get a repeat caller's tickets by phone number, oldest first"""
+    return await get_tickets_page(db, limit=limit, phone=phone)
+
+async def stream_tickets(
+    db: AsyncSession,
+    batch_size: int = 1000,
+    email: Optional[str] = None,
+    phone: Optional[str] = None,
+    issue: Optional[str] = None
+) -> AsyncIterator[list[SupportTicket]]:
+    """Yield matching tickets in batches from a server-side cursor (yield_per).
+
+    Only one batch is held in memory at a time, however many rows match.
+    """
+    query = tickets_page_query(limit=None, email=email, phone=phone, issue=issue)
+    result = await db.stream_scalars(query.execution_options(yield_per=batch_size))
+    async for partition in result.partitions():
+        yield partition
@@ -0,0 +1,38 @@
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from config import config
+from db import configure_engine, engine_options
+
+if not config.validate_database_config():
+    raise ValueError("DATABASE_URL environment variable is required!")
+
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+}
+
+def to_async_url(database_url: str) -> str:
+    """Map a sync DATABASE_URL onto its asyncio driver"""
+    url = make_url(database_url)
+    driver = ASYNC_DRIVERS.get(url.drivername)
+    if driver:
+        url = url.set(drivername=driver)
+    return url.render_as_string(hide_password=False)
+
+async_engine = create_async_engine(
+    to_async_url(config.DATABASE_URL),
+    **engine_options(to_async_url(config.DATABASE_URL))
+)
+configure_engine(async_engine.sync_engine)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
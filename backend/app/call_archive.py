@@ -0,0 +1,405 @@
+import atexit
+import datetime
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from itertools import count
+from typing import Iterable, Optional
+from config import config
+
+logger = logging.getLogger("agent")
+
+# Record kinds
+MESSAGE = "message"
+TOOL = "tool"
+METRICS = "metrics"
+
+# Per-stage latency each metrics type reports, stored in the ``latency`` column
+METRIC_LATENCY = {
+    "llm_metrics": "ttft",
+    "tts_metrics": "ttfb",
+    "eou_metrics": "end_of_utterance_delay",
+    "stt_metrics": "duration",
+}
+
+# Tool arguments holding caller details; their values are redacted across the whole call
+PII_ARGUMENTS = ("name", "email", "phone", "address")
+REDACTED = "[redacted]"
+
+def archive_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("session_id", pa.string()),
+        ("room", pa.string()),
+        ("ticket_id", pa.int64()),
+        ("seq", pa.int32()),
+        ("time", pa.timestamp("ms", tz="UTC")),
+        ("kind", pa.string()),
+        ("name", pa.string()),
+        ("text", pa.string()),
+        ("speech_id", pa.string()),
+        ("latency", pa.float64()),
+        ("duration", pa.float64()),
+        ("prompt_tokens", pa.int32()),
+        ("completion_tokens", pa.int32()),
+        ("is_error", pa.bool_()),
+        ("data", pa.string()),
+    ])
+
+class CallRecorder:
+    """Buffers one call's transcript, tool calls and metrics in memory.
+
+    Event handlers only copy a few attributes into a list; serialization and disk
+    writes happen on the archive's writer thread once the call is closed.
+    """
+
+    def __init__(self, archive: "CallArchive", session_id: Optional[str], room: str):
+        self.archive = archive
+        self.session_id = session_id
+        self.room = room
+        self.records: list[dict] = []
+        self._seq = count()
+
+    def attach(self, session):
+        """Subscribe to an AgentSession's conversation, tool and metrics events"""
+        session.on("conversation_item_added", self.on_conversation_item)
+        session.on("function_tools_executed", self.on_tools_executed)
+        session.on("metrics_collected", self.on_metrics)
+
+    def _add(self, kind: str, name: str, created_at: float, **fields):
+        self.records.append({"seq": next(self._seq), "time": created_at, "kind": kind, "name": name, **fields})
+
+    def on_conversation_item(self, ev):
+        item = ev.item
+        if getattr(item, "type", None) != "message":
+            return
+        self._add(
+            MESSAGE, item.role, item.created_at,
+            text=item.text_content,
+            data={"interrupted": item.interrupted, "transcript_confidence": item.transcript_confidence},
+        )
+
+    def on_tools_executed(self, ev):
+        for call, output in zip(ev.function_calls, ev.function_call_outputs):
+            self._add(
+                TOOL, call.name, call.created_at,
+                text=output.output if output is not None else None,
+                is_error=output.is_error if output is not None else None,
+                data=call.arguments,
+            )
+
+    def on_metrics(self, ev):
+        m = ev.metrics
+        self._add(METRICS, m.type, m.timestamp, speech_id=getattr(m, "speech_id", None), data=m)
+
+    def close(self, ticket_id: Optional[int] = None):
+        """Hand the call to the writer thread, linked to the ticket it created or edited"""
+        records, self.records = self.records, []
+        if records:
+            self.archive.submit(self.session_id, self.room, ticket_id, records)
+
+def to_row(session_id: Optional[str], room: str, ticket_id: Optional[int], record: dict) -> dict:
+    """Flatten one buffered record into the archive schema; runs on the writer thread"""
+    data = record.get("data")
+    row = {
+        "session_id": session_id,
+        "room": room,
+        "ticket_id": ticket_id,
+        "seq": record["seq"],
+        "time": datetime.datetime.fromtimestamp(record["time"], datetime.timezone.utc),
+        "kind": record["kind"],
+        "name": record["name"],
+        "text": record.get("text"),
+        "speech_id": record.get("speech_id"),
+        "is_error": record.get("is_error"),
+    }
+    if record["kind"] == METRICS:
+        latency = METRIC_LATENCY.get(record["name"])
+        row["latency"] = getattr(data, latency, None) if latency else None
+        row["duration"] = getattr(data, "duration", None)
+        row["prompt_tokens"] = getattr(data, "prompt_tokens", None)
+        row["completion_tokens"] = getattr(data, "completion_tokens", None)
+        data = data.model_dump(mode="json", exclude={"type", "timestamp", "speech_id"})
+    row["data"] = data if data is None or isinstance(data, str) else json.dumps(data, default=str)
+    return row
+
+def redact_call(records: list[dict]) -> list[dict]:
+    """One call's records without the caller's details, for when CALL_ARCHIVE_PII is off.
+
+    The name, email, phone and address the caller gave any tool are replaced wherever
+    they appear in the call's messages and tool calls; other emails and phone numbers
+    are masked as in the agent logs. Runs on the writer thread.
+    """
+    from agent_logging import mask_contacts
+
+    known = set()
+    for record in records:
+        if record["kind"] == TOOL and record.get("data"):
+            try:
+                arguments = json.loads(record["data"])
+            except ValueError:
+                continue
+            if isinstance(arguments, dict):
+                known.update(
+                    value.strip() for field in PII_ARGUMENTS
+                    if isinstance(value := arguments.get(field), str) and len(value.strip()) >= 3
+                )
+    # Longest first, so a full address goes before the street name inside it
+    pattern = re.compile(
+        "|".join(re.escape(value) for value in sorted(known, key=len, reverse=True)), re.IGNORECASE
+    ) if known else None
+
+    def scrub(text: Optional[str]) -> Optional[str]:
+        if not text:
+            return text
+        if pattern is not None:
+            text = pattern.sub(REDACTED, text)
+        return mask_contacts(text)
+
+    redacted = []
+    for record in records:
+        if record["kind"] == MESSAGE:
+            record = {**record, "text": scrub(record.get("text"))}
+        elif record["kind"] == TOOL:
+            data = record.get("data")
+            try:
+                arguments = json.loads(data) if data else None
+            except ValueError:
+                arguments = None
+            if isinstance(arguments, dict):
+                data = json.dumps({
+                    key: REDACTED if key in PII_ARGUMENTS else scrub(value) if isinstance(value, str) else value
+                    for key, value in arguments.items()
+                })
+            else:
+                data = scrub(data)
+            record = {**record, "text": scrub(record.get("text")), "data": data}
+        redacted.append(record)
+    return redacted
+
+class CallArchive:
+    """Writes closed calls to zstd-compressed Parquet files from a background thread.
+
+    Files are partitioned by the UTC date of each record (``date=YYYY-MM-DD/``), one
+    file per date per flush. A flush happens once ``batch_rows`` rows are waiting
+    or ``flush_seconds`` after the first of them, whichever comes first. Calls
+    submitted while ``max_pending`` calls are already waiting are dropped.
+    """
+
+    def __init__(
+        self,
+        directory: str = config.CALL_ARCHIVE_DIR,
+        batch_rows: int = config.CALL_ARCHIVE_BATCH_ROWS,
+        flush_seconds: float = config.CALL_ARCHIVE_FLUSH_SECONDS,
+        compression_level: int = config.CALL_ARCHIVE_ZSTD_LEVEL,
+        max_pending: int = config.CALL_ARCHIVE_MAX_PENDING,
+    ):
+        self.directory = directory
+        self.batch_rows = max(1, batch_rows)
+        self.flush_seconds = flush_seconds
+        self.compression_level = compression_level
+        self.max_pending = max_pending
+        self.dropped = 0
+        self.rows_written = 0
+        self.files_written = 0
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._files = count()
+        self._thread: Optional[threading.Thread] = None
+
+    def recorder(self, session_id: Optional[str], room: str) -> CallRecorder:
+        return CallRecorder(self, session_id, room)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="call-archive", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def submit(self, session_id: Optional[str], room: str, ticket_id: Optional[int], records: list[dict]):
+        # SimpleQueue.put never blocks, so the event loop never waits on the writer
+        if self._queue.qsize() >= self.max_pending:
+            self.dropped += 1
+            return
+        self.start()
+        self._queue.put((session_id, room, ticket_id, records))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until every call submitted so far is on disk; call it off the event loop"""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def stop(self):
+        """Write everything still queued, then stop the writer thread"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        pending: list[tuple] = []
+        rows = 0
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = False
+            if isinstance(item, tuple):
+                pending.append(item)
+                rows += len(item[3])
+                deadline = deadline or time.monotonic() + self.flush_seconds
+            # None stops the thread and an Event asks for a flush; both write what is pending
+            if pending and (not isinstance(item, tuple) or rows >= self.batch_rows):
+                try:
+                    self._write(pending)
+                except Exception as e:
+                    logger.error("Could not archive %d calls: %s", len(pending), e)
+                pending, rows, deadline = [], 0, None
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is None:
+                return
+
+    def _write(self, calls: list[tuple]):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        by_date: dict[str, list[dict]] = {}
+        for session_id, room, ticket_id, records in calls:
+            if not config.CALL_ARCHIVE_PII:
+                records = redact_call(records)
+            for record in records:
+                row = to_row(session_id, room, ticket_id, record)
+                by_date.setdefault(row["time"].date().isoformat(), []).append(row)
+
+        schema = archive_schema()
+        for date, rows in by_date.items():
+            partition = os.path.join(self.directory, f"date={date}")
+            os.makedirs(partition, exist_ok=True)
+            name = f"calls-{os.getpid()}-{int(time.time() * 1000)}-{next(self._files)}.parquet"
+            path = os.path.join(partition, name)
+            # Written under a dot-name and renamed, so readers never see a partial file
+            tmp_path = os.path.join(partition, f".{name}.tmp")
+            pq.write_table(
+                pa.Table.from_pylist(rows, schema=schema),
+                tmp_path,
+                compression="zstd",
+                compression_level=self.compression_level,
+            )
+            os.replace(tmp_path, path)
+            self.rows_written += len(rows)
+            self.files_written += 1
+
+_archive: Optional[CallArchive] = None
+
+def get_call_archive() -> Optional[CallArchive]:
+    """Process-wide archive, or None when CALL_ARCHIVE is off or pyarrow is not installed"""
+    global _archive
+    if _archive is None and config.CALL_ARCHIVE:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            logger.warning("pyarrow is not installed; call records will not be archived")
+            return None
+        _archive = CallArchive()
+    return _archive
+
+def read_call_records(
+    directory: str = config.CALL_ARCHIVE_DIR,
+    start: Optional[datetime.date] = None,
+    end: Optional[datetime.date] = None,
+    ticket_id: Optional[int] = None,
+    session_id: Optional[str] = None,
+    kinds: Optional[Iterable[str]] = None,
+    columns: Optional[list[str]] = None,
+):
+    """Archived records as a pyarrow Table, ordered by call and sequence.
+
+    ``start``/``end`` (inclusive) prune date partitions before any file is opened;
+    the other filters are pushed down to the Parquet row groups.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(
+        directory,
+        format="parquet",
+        partitioning="hive",
+        schema=archive_schema().append(pa.field("date", pa.string())),
+    )
+    conditions = []
+    if start is not None:
+        conditions.append(pc.field("date") >= start.isoformat())
+    if end is not None:
+        conditions.append(pc.field("date") <= end.isoformat())
+    if ticket_id is not None:
+        conditions.append(pc.field("ticket_id") == ticket_id)
+    if session_id is not None:
+        conditions.append(pc.field("session_id") == session_id)
+    if kinds is not None:
+        conditions.append(pc.field("kind").isin(list(kinds)))
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    table = dataset.to_table(filter=expression, columns=columns)
+    sort_keys = [(key, "ascending") for key in ("session_id", "time", "seq") if key in table.column_names]
+    return table.sort_by(sort_keys) if sort_keys else table
+
+def compact_partition(directory: str, date: datetime.date, compression_level: int = config.CALL_ARCHIVE_ZSTD_LEVEL) -> int:
+    """Merge one date's archive files into a single file; returns how many files were merged.
+
+    Each agent job process writes its own file, so a busy day holds one small file per
+    call. Merging them shares the dictionaries and footers and speeds up reads.
+    """
+    import pyarrow.parquet as pq
+
+    partition = os.path.join(directory, f"date={date.isoformat()}")
+    if not os.path.isdir(partition):
+        return 0
+    files = sorted(os.path.join(partition, name) for name in os.listdir(partition) if name.endswith(".parquet"))
+    if len(files) < 2:
+        return 0
+    table = pq.read_table(files, schema=archive_schema()).sort_by(
+        [("session_id", "ascending"), ("time", "ascending"), ("seq", "ascending")]
+    )
+    name = f"compacted-{int(time.time() * 1000)}.parquet"
+    tmp_path = os.path.join(partition, f".{name}.tmp")
+    pq.write_table(table, tmp_path, compression="zstd", compression_level=compression_level)
+    os.replace(tmp_path, os.path.join(partition, name))
+    for path in files:
+        os.remove(path)
+    return len(files)
+
+def read_transcript(directory: str = config.CALL_ARCHIVE_DIR, **filters) -> list[dict]:
+    """User and agent messages plus tool calls of the matching calls, as dicts in call order"""
+    table = read_call_records(
+        directory,
+        kinds=(MESSAGE, TOOL),
+        columns=["session_id", "ticket_id", "time", "seq", "kind", "name", "text", "data", "is_error"],
+        **filters,
+    )
+    return table.to_pylist()
+
+if __name__ == "__main__":
+    # Compact every finished day: python app/call_archive.py [archive dir]
+    import sys
+
+    directory = sys.argv[1] if len(sys.argv) > 1 else config.CALL_ARCHIVE_DIR
+    today = datetime.datetime.now(datetime.timezone.utc).date()
+    for entry in sorted(os.listdir(directory)):
+        if entry.startswith("date="):
+            date = datetime.date.fromisoformat(entry[len("date="):])
+            if date < today:
+                merged = compact_partition(directory, date)
+                if merged:
+                    print(f"{date}: merged {merged} files")
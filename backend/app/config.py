@@ -10,9 +10,150 @@ class Config:
     LIVEKIT_API_SECRET: Optional[str] = os.getenv("LIVEKIT_API_SECRET")
     LIVEKIT_URL: Optional[str] = os.getenv("LIVEKIT_URL")
     
+    # API Server Configuration
+    API_HOST: str = os.getenv("API_HOST", "0.0.0.0")
+    API_PORT: int = int(os.getenv("API_PORT", "8000"))
+    API_WORKERS: int = int(os.getenv("API_WORKERS", "1"))
+    TOKEN_TTL_SECONDS: int = int(os.getenv("TOKEN_TTL_SECONDS", "3600"))
+    TOKEN_BATCH_MAX: int = int(os.getenv("TOKEN_BATCH_MAX", "10"))  # capped at TOKEN_RATE_BURST
+    TICKET_EDIT_BATCH_MAX: int = int(os.getenv("TICKET_EDIT_BATCH_MAX", "100"))
+    # Bearer key for the ticket and stats admin routes; unset disables them
+    ADMIN_API_KEY: Optional[str] = os.getenv("ADMIN_API_KEY")
+    CORS_ORIGINS: list[str] = [
+        origin.strip() for origin in os.getenv("CORS_ORIGINS", "http://localhost:5173").split(",") if origin.strip()
+    ]
+    
+    # Agent Worker Configuration
+    AGENT_MODE: str = os.getenv("AGENT_MODE", "start")  # "dev" for local development
+    AGENT_WORKERS: int = int(os.getenv("AGENT_WORKERS", "1"))
+    AGENT_NUM_IDLE_PROCESSES: int = int(os.getenv("AGENT_NUM_IDLE_PROCESSES", str(min(os.cpu_count() or 1, 4))))
+    AGENT_LOAD_THRESHOLD: float = float(os.getenv("AGENT_LOAD_THRESHOLD", "0.7"))
+    AGENT_MAX_JOBS: int = int(os.getenv("AGENT_MAX_JOBS", "0"))
+    AGENT_DRAIN_TIMEOUT: int = int(os.getenv("AGENT_DRAIN_TIMEOUT", "1800"))
+    AGENT_HEALTH_PORT: int = int(os.getenv("AGENT_HEALTH_PORT", "8081"))  # worker i serves on this + i; 0 picks free ports
+    
+    # Admission Control (token requests admitted, queued or rejected by agent load)
+    ADMISSION_CONTROL: bool = os.getenv("ADMISSION_CONTROL", "true").lower() in ("1", "true", "yes")
+    ADMISSION_STORE_PATH: str = os.getenv("ADMISSION_STORE_PATH", ".cache/admission.sqlite3")
+    ADMISSION_MAX_SESSIONS: int = int(os.getenv("ADMISSION_MAX_SESSIONS", "0"))  # 0: AGENT_WORKERS * AGENT_MAX_JOBS
+    ADMISSION_MAX_LOOP_LAG_MS: float = float(os.getenv("ADMISSION_MAX_LOOP_LAG_MS", "250"))
+    ADMISSION_QUEUE_MAX: int = int(os.getenv("ADMISSION_QUEUE_MAX", "50"))
+    ADMISSION_POLL_SECONDS: int = int(os.getenv("ADMISSION_POLL_SECONDS", "5"))
+    ADMISSION_QUEUE_TTL_SECONDS: float = float(os.getenv("ADMISSION_QUEUE_TTL_SECONDS", "15"))
+    ADMISSION_PENDING_SECONDS: float = float(os.getenv("ADMISSION_PENDING_SECONDS", "30"))
+    ADMISSION_STALE_SECONDS: float = float(os.getenv("ADMISSION_STALE_SECONDS", "10"))
+    ADMISSION_PUBLISH_SECONDS: float = float(os.getenv("ADMISSION_PUBLISH_SECONDS", "2"))
+    ADMISSION_AVG_CALL_SECONDS: float = float(os.getenv("ADMISSION_AVG_CALL_SECONDS", "180"))
+    
+    # Token Rate Limiting (per client IP token bucket in each API worker)
+    TOKEN_RATE_PER_MINUTE: float = float(os.getenv("TOKEN_RATE_PER_MINUTE", "20"))  # 0 disables
+    TOKEN_RATE_BURST: int = int(os.getenv("TOKEN_RATE_BURST", "10"))
+    RATE_LIMIT_TRUST_PROXY: bool = os.getenv("RATE_LIMIT_TRUST_PROXY", "false").lower() in ("1", "true", "yes")
+    RATE_LIMIT_MAX_CLIENTS: int = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "100000"))
+    
+    # Supervisor Configuration (restart backoff for crashed services)
+    SUPERVISOR_BACKOFF_INITIAL: float = float(os.getenv("SUPERVISOR_BACKOFF_INITIAL", "1"))
+    SUPERVISOR_BACKOFF_MAX: float = float(os.getenv("SUPERVISOR_BACKOFF_MAX", "30"))
+    
+    # Idempotent Ticket Creation (recent keys kept in memory per process)
+    IDEMPOTENCY_CACHE_SIZE: int = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+    
+    # Ticket Draft Store (lets a reconnecting caller resume a partly collected ticket)
+    DRAFT_STORE: str = os.getenv("DRAFT_STORE", "sqlite")  # "sqlite" or "memory" (single process only)
+    DRAFT_STORE_PATH: str = os.getenv("DRAFT_STORE_PATH", ".cache/drafts.sqlite3")
+    DRAFT_TTL_SECONDS: float = float(os.getenv("DRAFT_TTL_SECONDS", "1800"))
+    DRAFT_STORE_MAX_ENTRIES: int = int(os.getenv("DRAFT_STORE_MAX_ENTRIES", "10000"))
+    
+    # LLM Context Configuration (older turns collapse into the ticket draft summary)
+    CONTEXT_KEEP_TURNS: int = int(os.getenv("CONTEXT_KEEP_TURNS", "3"))
+    
+    # LLM Response Cache (plain-text replies to recurring questions, shared by every job process on the host)
+    RESPONSE_CACHE: bool = os.getenv("RESPONSE_CACHE", "true").lower() in ("1", "true", "yes")
+    RESPONSE_CACHE_PATH: str = os.getenv("RESPONSE_CACHE_PATH", ".cache/responses.sqlite3")
+    RESPONSE_CACHE_TTL_SECONDS: float = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "86400"))
+    RESPONSE_CACHE_MAX_ENTRIES: int = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "5000"))
+    RESPONSE_CACHE_MIN_SESSIONS: int = int(os.getenv("RESPONSE_CACHE_MIN_SESSIONS", "2"))
+    RESPONSE_CACHE_MIN_WORDS: int = int(os.getenv("RESPONSE_CACHE_MIN_WORDS", "2"))
+    RESPONSE_CACHE_SIMILARITY: float = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.9"))  # 0 disables
+    RESPONSE_CACHE_INDEX_SECONDS: float = float(os.getenv("RESPONSE_CACHE_INDEX_SECONDS", "30"))
+    
+    # Provider Resilience (circuit breakers shared by every job process on the host, fallback chains, TTS hedging)
+    PROVIDER_FALLBACK: bool = os.getenv("PROVIDER_FALLBACK", "true").lower() in ("1", "true", "yes")
+    LLM_FALLBACK_MODEL: str = os.getenv("LLM_FALLBACK_MODEL", "gpt-4.1-mini")
+    LLM_ATTEMPT_TIMEOUT: float = float(os.getenv("LLM_ATTEMPT_TIMEOUT", "5"))
+    LLM_SLOW_TTFT_SECONDS: float = float(os.getenv("LLM_SLOW_TTFT_SECONDS", "2.5"))
+    TTS_SLOW_TTFB_SECONDS: float = float(os.getenv("TTS_SLOW_TTFB_SECONDS", "1.5"))
+    TTS_HEDGE_MS: float = float(os.getenv("TTS_HEDGE_MS", "0"))  # 0 disables hedging
+    BREAKER_FAILURE_THRESHOLD: int = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "3"))
+    BREAKER_RECOVERY_SECONDS: float = float(os.getenv("BREAKER_RECOVERY_SECONDS", "30"))
+    BREAKER_STORE_PATH: str = os.getenv("BREAKER_STORE_PATH", ".cache/breakers.sqlite3")
+    BREAKER_REFRESH_SECONDS: float = float(os.getenv("BREAKER_REFRESH_SECONDS", "1"))
+    
+    # Agent Logging Configuration (JSON lines written off the event loop)
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO").upper()
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "json")  # "json" or "text"
+    LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    LOG_METRICS_SAMPLE_RATE: float = float(os.getenv("LOG_METRICS_SAMPLE_RATE", "0.1"))
+    LOG_PII: bool = os.getenv("LOG_PII", "false").lower() in ("1", "true", "yes")
+    
+    # Call Archive (transcripts, tool calls and metrics as zstd Parquet; needs pyarrow)
+    CALL_ARCHIVE: bool = os.getenv("CALL_ARCHIVE", "true").lower() in ("1", "true", "yes")
+    CALL_ARCHIVE_DIR: str = os.getenv("CALL_ARCHIVE_DIR", "archive/calls")
+    CALL_ARCHIVE_BATCH_ROWS: int = int(os.getenv("CALL_ARCHIVE_BATCH_ROWS", "20000"))
+    CALL_ARCHIVE_FLUSH_SECONDS: float = float(os.getenv("CALL_ARCHIVE_FLUSH_SECONDS", "30"))
+    CALL_ARCHIVE_ZSTD_LEVEL: int = int(os.getenv("CALL_ARCHIVE_ZSTD_LEVEL", "6"))
+    CALL_ARCHIVE_MAX_PENDING: int = int(os.getenv("CALL_ARCHIVE_MAX_PENDING", "1000"))
+    CALL_ARCHIVE_PII: bool = os.getenv("CALL_ARCHIVE_PII", "false").lower() in ("1", "true", "yes")
+    
+    # Ticket Retention (tickets older than the retention age move to monthly zstd Parquet files; needs pyarrow)
+    TICKET_RETENTION_DAYS: float = float(os.getenv("TICKET_RETENTION_DAYS", "90"))  # 0 keeps every ticket hot
+    TICKET_ARCHIVE_DIR: str = os.getenv("TICKET_ARCHIVE_DIR", "archive/tickets")
+    TICKET_ARCHIVE_BATCH: int = int(os.getenv("TICKET_ARCHIVE_BATCH", "1000"))
+    TICKET_ARCHIVE_ZSTD_LEVEL: int = int(os.getenv("TICKET_ARCHIVE_ZSTD_LEVEL", "9"))
+    TICKET_RETENTION_INTERVAL_SECONDS: float = float(os.getenv("TICKET_RETENTION_INTERVAL_SECONDS", "3600"))
+    
+    # Confirmation Emails (outbox rows written with each ticket, sent by the email dispatcher; needs aiosmtplib)
+    EMAIL_CONFIRMATIONS: bool = os.getenv("EMAIL_CONFIRMATIONS", "true").lower() in ("1", "true", "yes")
+    EMAIL_FROM: str = os.getenv("EMAIL_FROM", "DeskHelp Support <support@deskhelp.local>")
+    SMTP_HOST: Optional[str] = os.getenv("SMTP_HOST") or None  # unset: no dispatcher, emails wait in the outbox
+    SMTP_PORT: int = int(os.getenv("SMTP_PORT", "587"))
+    SMTP_USERNAME: Optional[str] = os.getenv("SMTP_USERNAME") or None
+    SMTP_PASSWORD: Optional[str] = os.getenv("SMTP_PASSWORD") or None
+    SMTP_TLS: str = os.getenv("SMTP_TLS", "starttls")  # "starttls", "tls" or "none"
+    SMTP_TIMEOUT: float = float(os.getenv("SMTP_TIMEOUT", "30"))
+    EMAIL_POOL_SIZE: int = int(os.getenv("EMAIL_POOL_SIZE", "4"))
+    EMAIL_BATCH_SIZE: int = int(os.getenv("EMAIL_BATCH_SIZE", "200"))
+    EMAIL_POLL_SECONDS: float = float(os.getenv("EMAIL_POLL_SECONDS", "2"))
+    EMAIL_LEASE_SECONDS: float = float(os.getenv("EMAIL_LEASE_SECONDS", "300"))
+    EMAIL_MAX_ATTEMPTS: int = int(os.getenv("EMAIL_MAX_ATTEMPTS", "8"))
+    EMAIL_RETRY_BASE_SECONDS: float = float(os.getenv("EMAIL_RETRY_BASE_SECONDS", "30"))
+    EMAIL_RETRY_MAX_SECONDS: float = float(os.getenv("EMAIL_RETRY_MAX_SECONDS", "3600"))
+    
+    # Metrics Configuration (shared Prometheus multiprocess directory)
+    METRICS_MULTIPROC_DIR: Optional[str] = os.getenv("METRICS_MULTIPROC_DIR", ".cache/prometheus") or None
+    
     # Database Configuration
     DATABASE_URL: Optional[str] = os.getenv("DATABASE_URL")
     
+    # Connection Pool Configuration
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_CONNECT_TIMEOUT: int = int(os.getenv("DB_CONNECT_TIMEOUT", "10"))
+    
+    # SQLite Tuning (only applied when DATABASE_URL is SQLite)
+    SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    
+    # Phrase Audio Cache (pre-synthesized TTS for fixed agent lines)
+    PHRASE_CACHE_DIR: Optional[str] = os.getenv("PHRASE_CACHE_DIR", ".cache/phrases") or None
+    PHRASE_CACHE_MAX_ENTRIES: int = int(os.getenv("PHRASE_CACHE_MAX_ENTRIES", "64"))
+    
+    # Ticket Writer Configuration (group commit of agent ticket writes)
+    TICKET_WRITER_MAX_BATCH: int = int(os.getenv("TICKET_WRITER_MAX_BATCH", "100"))
+    TICKET_WRITER_MAX_DELAY_MS: float = float(os.getenv("TICKET_WRITER_MAX_DELAY_MS", "10"))
+    
     # OpenAI Configuration
     OPENAI_API_KEY: Optional[str] = os.getenv("OPENAI_API_KEY")
     
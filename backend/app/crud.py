@@ -1,15 +1,36 @@
+import base64
+from sqlalchemy import Select, select, tuple_, update
 from sqlalchemy.orm import Session
-from models import SupportTicket
+from sqlalchemy.orm.attributes import set_committed_value
+from email_outbox import confirmation_rows
+from issues import ISSUE_CATALOG
+from models import EmailOutbox, SupportTicket, TicketArchiveFile
+from ticket_archive import add_archived_stats, archived_files_query, read_archived_ticket
+from ticket_stats import StatsDelta, rebuild_statements, source_query, stats_queries, summarize, upsert_statements
 from typing import Optional
 from datetime import datetime, timezone
 
 ISSUE_TYPES = {
-    "wifi_not_working": {"description": "Wi-Fi not working", "price": 20.0},
-    "email_login_issues": {"description": "Email login issues - password reset", "price": 15.0},
-    "slow_laptop": {"description": "Slow laptop performance - CPU change", "price": 25.0},
-    "printer_problems": {"description": "Printer problems - power plug change", "price": 10.0}
+    issue.key: {"description": issue.description, "price": issue.price}
+    for issue in ISSUE_CATALOG
 }
 
+# Ticket columns an edit may change
+EDITABLE_FIELDS = ("name", "email", "phone", "address", "issue", "price")
+
+def new_ticket_rows(tickets: list[dict]) -> tuple[list[dict], StatsDelta]:
+    """Rows for new tickets, stamped with the current time, and the stats change they make"""
+    now = datetime.now(timezone.utc)
+    rows = [{"created_at": now, **ticket} for ticket in tickets]
+    delta = StatsDelta()
+    for row in rows:
+        delta.add(row["created_at"], row["issue"], row["price"])
+    return rows, delta
+
+def outbox_entries(ticket_ids: list[int], tickets: list[dict]) -> list[EmailOutbox]:
+    """Confirmation emails for tickets given their new IDs; added in the tickets' own transaction"""
+    return [EmailOutbox(**row) for row in confirmation_rows(ticket_ids, tickets)]
+
 def create_ticket(
     db: Session,
     name: str,
@@ -20,16 +41,13 @@ def create_ticket(
     price: float
 ) -> SupportTicket:
     """Create a new support ticket"""
-    db_ticket = SupportTicket(
-        name=name,
-        email=email,
-        phone=phone,
-        address=address,
-        issue=issue,
-        price=price,
-        created_at=datetime.now(timezone.utc)
-    )
+    rows, delta = new_ticket_rows([dict(name=name, email=email, phone=phone, address=address, issue=issue, price=price)])
+    db_ticket = SupportTicket(**rows[0])
     db.add(db_ticket)
+    apply_ticket_stats(db, delta)
+    # The confirmation email commits with its ticket, or not at all
+    db.flush()
+    db.add_all(outbox_entries([db_ticket.id], rows))
     db.commit()
     db.refresh(db_ticket)
     return db_ticket
@@ -44,32 +62,163 @@ def edit_ticket(
     issue: Optional[str] = None,
     price: Optional[float] = None
 ) -> Optional[SupportTicket]:
-    """Edit an existing support ticket"""
-    db_ticket = db.query(SupportTicket).filter(SupportTicket.id == ticket_id).first()
-    if not db_ticket:
+    """Edit an existing support ticket, changing only the fields that are given"""
+    values = edit_values(name=name, email=email, phone=phone, address=address, issue=issue, price=price)
+    db_ticket = update_tickets(db, {ticket_id: values}).get(ticket_id)
+    if db_ticket is not None:
+        # Keep the values RETURNING gave us rather than reloading them after commit
+        db.expunge(db_ticket)
+    db.commit()
+    return db_ticket
+
+def edit_values(**values) -> dict:
+    """The editable ticket fields that were actually given, i.e. not None"""
+    return {field: value for field, value in values.items() if field in EDITABLE_FIELDS and value is not None}
+
+def edit_statement(ticket_id: int, values: dict, returning: bool = True):
+    """``UPDATE ... SET <values> RETURNING *`` for one ticket; a plain SELECT when there is nothing to set"""
+    if not values:
+        stmt = select(SupportTicket).where(SupportTicket.id == ticket_id)
+    else:
+        stmt = update(SupportTicket).where(SupportTicket.id == ticket_id).values(**values)
+        if returning:
+            stmt = stmt.returning(SupportTicket)
+    return stmt.execution_options(populate_existing=True)
+
+def previous_values_query(edits: dict[int, dict]) -> Optional[Select]:
+    """Locking read of the stats inputs of the edited tickets whose issue or price changes"""
+    ids = [ticket_id for ticket_id, values in edits.items() if "issue" in values or "price" in values]
+    if not ids:
         return None
-    
-    if name is not None:
-        db_ticket.name = name
+    return (
+        select(SupportTicket.id, SupportTicket.created_at, SupportTicket.issue, SupportTicket.price)
+        .where(SupportTicket.id.in_(ids))
+        .with_for_update()
+    )
+
+def edits_delta(previous: dict[int, tuple], updated: dict[int, SupportTicket]) -> StatsDelta:
+    """Stats changes that move each edited ticket from its old issue and price to its new ones"""
+    delta = StatsDelta()
+    for ticket_id, (created_at, old_issue, old_price) in previous.items():
+        ticket = updated.get(ticket_id)
+        if ticket is not None:
+            delta.move(created_at, old_issue, old_price, ticket.issue, ticket.price)
+    return delta
+
+def returned_ticket(ticket: SupportTicket) -> SupportTicket:
+    """Normalize a RETURNING row: SQLite hands back a whole-number REAL price as an int"""
+    if isinstance(ticket.price, int):
+        set_committed_value(ticket, "price", float(ticket.price))
+    return ticket
+
+def update_tickets(db: Session, edits: dict[int, dict]) -> dict[int, SupportTicket]:
+    """Apply each ticket's field values with one ``UPDATE ... RETURNING`` and no prior read. Does not commit.
+
+    Returns the updated tickets by ID; unknown IDs are left out. Only edits that change
+    issue or price need the old values (for the hourly stats), read in one locking SELECT.
+    """
+    query = previous_values_query(edits)
+    previous = {row.id: tuple(row[1:]) for row in db.execute(query)} if query is not None else {}
+    returning = db.get_bind().dialect.update_returning
+    updated = {}
+    for ticket_id, values in edits.items():
+        if values and not returning:
+            # No UPDATE ... RETURNING on this database (MySQL): update, then read the row back
+            if db.execute(edit_statement(ticket_id, values, returning=False)).rowcount == 0:
+                continue
+            values = {}
+        ticket = db.scalars(edit_statement(ticket_id, values)).first()
+        if ticket is not None:
+            updated[ticket_id] = returned_ticket(ticket)
+    apply_ticket_stats(db, edits_delta(previous, updated))
+    return updated
+
+def apply_ticket_stats(db: Session, delta: StatsDelta):
+    """Add one transaction's ticket changes to the hourly stats. Does not commit."""
+    for stmt in upsert_statements(db.get_bind().dialect.name, delta):
+        db.execute(stmt)
+
+def rebuild_ticket_stats(db: Session) -> int:
+    """Recount the hourly stats from every ticket and commit; returns the number of tickets counted"""
+    dialect = db.get_bind().dialect.name
+    for stmt in rebuild_statements(dialect):
+        db.execute(stmt)
+    delta, counted = StatsDelta(), 0
+    for created_at, issue, price in db.execute(source_query()):
+        delta.add(created_at, issue, price)
+        counted += 1
+    # Archived tickets still count towards the stats
+    counted += add_archived_stats(delta, db.scalars(select(TicketArchiveFile.path)).all())
+    apply_ticket_stats(db, delta)
+    db.commit()
+    return counted
+
+def get_ticket_stats(db: Session, hours: int = 24) -> dict:
+    """Ticket counts and revenue per issue and per hour, read from the maintained stats"""
+    by_issue, by_hour = stats_queries(hours)
+    return summarize(db.execute(by_issue), db.execute(by_hour))
+
+def get_ticket(db: Session, ticket_id: int) -> Optional[SupportTicket]:
+    """Get a support ticket by ID, from the archive if the retention job has moved it there"""
+    ticket = db.query(SupportTicket).filter(SupportTicket.id == ticket_id).first()
+    if ticket is None:
+        paths = db.scalars(archived_files_query(ticket_id)).all()
+        if paths:
+            ticket = read_archived_ticket(paths, ticket_id)
+    return ticket
+
+def encode_cursor(ticket: SupportTicket) -> str:
+    """Opaque pagination cursor pointing just after the given ticket"""
+    raw = f"{ticket.created_at.isoformat()}|{ticket.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Inverse of encode_cursor; raises ValueError for malformed cursors"""
+    try:
+        created_at, ticket_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(ticket_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def tickets_page_query(
+    limit: Optional[int] = 100,
+    after: Optional[tuple[datetime, int]] = None,
+    email: Optional[str] = None,
+    phone: Optional[str] = None,
+    issue: Optional[str] = None
+) -> Select:
+    """Keyset-paginated ticket query ordered by (created_at, id).
+
+    Each page seeks on the (created_at, id) index instead of skipping rows, so page
+    cost stays flat however deep the client pages. ``limit=None`` returns every match.
+    """
+    query = select(SupportTicket)
     if email is not None:
-        db_ticket.email = email
+        query = query.where(SupportTicket.email == email)
     if phone is not None:
-        db_ticket.phone = phone
-    if address is not None:
-        db_ticket.address = address
+        query = query.where(SupportTicket.phone == phone)
     if issue is not None:
-        db_ticket.issue = issue
-    if price is not None:
-        db_ticket.price = price
-    
-    db.commit()
-    db.refresh(db_ticket)
-    return db_ticket
+        query = query.where(SupportTicket.issue == issue)
+    if after is not None:
+        query = query.where(tuple_(SupportTicket.created_at, SupportTicket.id) > tuple_(*after))
+    return query.order_by(SupportTicket.created_at, SupportTicket.id).limit(limit)
 
-def get_ticket(db: Session, ticket_id: int) -> Optional[SupportTicket]:
-    """Get a support ticket by ID"""
-    return db.query(SupportTicket).filter(SupportTicket.id == ticket_id).first()
+def get_tickets_page(
+    db: Session,
+    limit: int = 100,
+    after: Optional[tuple[datetime, int]] = None,
+    email: Optional[str] = None,
+    phone: Optional[str] = None,
+    issue: Optional[str] = None
+) -> list[SupportTicket]:
+    """Get a page of support tickets after the given (created_at, id) position"""
+    query = tickets_page_query(limit=limit, after=after, email=email, phone=phone, issue=issue)
+    return list(db.scalars(query).all())
+
+def find_tickets_by_email(db: Session, email: str, limit: int = 20) -> list[SupportTicket]:
+    """Get a repeat caller's tickets by email, oldest first"""
+    return get_tickets_page(db, limit=limit, email=email)
 
-def get_all_tickets(db: Session, skip: int = 0, limit: int = 100):
-    """Get all support tickets"""
-    return db.query(SupportTicket).offset(skip).limit(limit).all()
\ No newline at end of file
+def find_tickets_by_phone(db: Session, phone: str, limit: int = 20) -> list[SupportTicket]:
+    """Get a repeat caller's tickets by phone number, oldest first"""
+    return get_tickets_page(db, limit=limit, phone=phone)
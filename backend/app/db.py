@@ -1,23 +1,73 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.orm import sessionmaker
-from models import Base
 from config import config
 
 if not config.validate_database_config():
     raise ValueError("DATABASE_URL environment variable is required!")
 
-engine = create_engine(
-    config.DATABASE_URL, 
-    connect_args={"check_same_thread": False} if "sqlite" in config.DATABASE_URL else {}
-)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Driver-specific name of the connect timeout argument
+CONNECT_TIMEOUT_ARGS = {
+    "postgresql": "connect_timeout",
+    "postgresql+psycopg2": "connect_timeout",
+    "postgresql+asyncpg": "timeout",
+    "mysql": "connect_timeout",
+    "mysql+pymysql": "connect_timeout",
+    "mysql+aiomysql": "connect_timeout",
+}
+
+def is_sqlite(database_url: str) -> bool:
+    return make_url(database_url).get_backend_name() == "sqlite"
+
+def is_sqlite_memory(database_url: str) -> bool:
+    return is_sqlite(database_url) and make_url(database_url).database in (None, "", ":memory:")
+
+def engine_options(database_url: str) -> dict:
+    """Pool and connection arguments for create_engine/create_async_engine"""
+    if is_sqlite(database_url):
+        options = {
+            "connect_args": {
+                "check_same_thread": False,
+                "timeout": config.SQLITE_BUSY_TIMEOUT_MS / 1000,
+            },
+        }
+        if not is_sqlite_memory(database_url):
+            # SQLite allows a single writer per database; one pooled connection per
+            # process avoids "database is locked" churn between local connections.
+            options.update(pool_size=1, max_overflow=0, pool_timeout=config.DB_POOL_TIMEOUT)
+        return options
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+    options = {
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_pre_ping": config.DB_POOL_PRE_PING,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+        "pool_timeout": config.DB_POOL_TIMEOUT,
+    }
+    timeout_arg = CONNECT_TIMEOUT_ARGS.get(make_url(database_url).drivername)
+    if timeout_arg:
+        options["connect_args"] = {timeout_arg: config.DB_CONNECT_TIMEOUT}
+    return options
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(config.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.close()
+
+def configure_engine(sync_engine: Engine) -> Engine:
+    """Install per-connection tuning (WAL, synchronous=NORMAL, busy timeout) for SQLite"""
+    if is_sqlite(str(sync_engine.url)) and not is_sqlite_memory(str(sync_engine.url)):
+        event.listen(sync_engine, "connect", _set_sqlite_pragmas)
+    return sync_engine
+
+engine = configure_engine(create_engine(config.DATABASE_URL, **engine_options(config.DATABASE_URL)))
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
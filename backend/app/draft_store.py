@@ -0,0 +1,117 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from config import config
+from ticket_draft import TicketDraft
+
+logger = logging.getLogger("agent")
+
+class MemoryDraftStore:
+    """Ticket drafts by session_id in this process, evicted after ``ttl`` seconds or by LRU"""
+
+    def __init__(self, ttl: float = config.DRAFT_TTL_SECONDS, max_entries: int = config.DRAFT_STORE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._drafts: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+
+    async def get(self, session_id: str) -> Optional[TicketDraft]:
+        entry = self._drafts.get(session_id)
+        if entry is None:
+            return None
+        expires_at, data = entry
+        if expires_at < time.time():
+            del self._drafts[session_id]
+            return None
+        return TicketDraft.from_dict(data)
+
+    async def put(self, session_id: str, draft: TicketDraft):
+        self._drafts[session_id] = (time.time() + self.ttl, draft.to_dict())
+        self._drafts.move_to_end(session_id)
+        while len(self._drafts) > self.max_entries:
+            self._drafts.popitem(last=False)
+
+    async def delete(self, session_id: str):
+        self._drafts.pop(session_id, None)
+
+class SqliteDraftStore:
+    """Ticket drafts in a local SQLite file, shared by every job process on the machine.
+
+    Calls run in a worker thread so file I/O stays off the event loop. Expired rows
+    are ignored on read and purged on write.
+    """
+
+    def __init__(self, path: str = config.DRAFT_STORE_PATH, ttl: float = config.DRAFT_TTL_SECONDS):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS ticket_drafts "
+                "(session_id TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def _get(self, session_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT data FROM ticket_drafts WHERE session_id = ? AND expires_at >= ?",
+                (session_id, time.time()),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _put(self, session_id: str, data: dict):
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM ticket_drafts WHERE expires_at < ?", (now,))
+                conn.execute(
+                    "INSERT OR REPLACE INTO ticket_drafts (session_id, data, expires_at) VALUES (?, ?, ?)",
+                    (session_id, json.dumps(data), now + self.ttl),
+                )
+
+    def _delete(self, session_id: str):
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM ticket_drafts WHERE session_id = ?", (session_id,))
+
+    async def get(self, session_id: str) -> Optional[TicketDraft]:
+        data = await asyncio.to_thread(self._get, session_id)
+        return TicketDraft.from_dict(data) if data else None
+
+    async def put(self, session_id: str, draft: TicketDraft):
+        await asyncio.to_thread(self._put, session_id, draft.to_dict())
+
+    async def delete(self, session_id: str):
+        await asyncio.to_thread(self._delete, session_id)
+
+_store = None
+
+def get_draft_store():
+    """Process-wide draft store picked by DRAFT_STORE ("sqlite" or "memory")"""
+    global _store
+    if _store is None:
+        if config.DRAFT_STORE == "sqlite":
+            _store = SqliteDraftStore()
+        elif config.DRAFT_STORE == "memory":
+            # Each call runs in a fresh job process, so a reconnect never finds these drafts
+            logger.warning("DRAFT_STORE=memory keeps drafts in this job process only; dropped calls cannot resume")
+            _store = MemoryDraftStore()
+        else:
+            raise ValueError(f"DRAFT_STORE must be 'sqlite' or 'memory', not {config.DRAFT_STORE!r}")
+    return _store
@@ -0,0 +1,309 @@
+import asyncio
+import logging
+import random
+import signal
+from datetime import datetime, timedelta, timezone
+from email.mime.text import MIMEText
+from email.utils import formatdate, parseaddr
+from typing import Optional
+from sqlalchemy import select, update
+from config import config
+from models import EmailOutbox
+
+logger = logging.getLogger("agent")
+
+PENDING = "pending"
+SENT = "sent"
+FAILED = "failed"
+
+def confirmation_email(ticket_id: int, name: str, email: str, issue: str, price: float, **_) -> dict:
+    """Outbox row values for a new ticket's confirmation email"""
+    return {
+        "ticket_id": ticket_id,
+        "recipient": email,
+        "subject": f"DeskHelp ticket #{ticket_id} confirmed",
+        "body": (
+            f"Hi {name},\n\n"
+            f"Thanks for calling DeskHelp. Your support ticket #{ticket_id} is open.\n\n"
+            f"Issue: {issue}\n"
+            f"Service fee: ${price:.2f}\n\n"
+            f"Quote ticket #{ticket_id} if you call us again about this issue.\n\n"
+            "DeskHelp Support\n"
+        ),
+    }
+
+def recipient_address(value: str) -> Optional[str]:
+    """``value`` if it is exactly one bare email address, else None.
+
+    CR/LF (header injection), several addresses and display names are refused rather
+    than cleaned up, so an email only ever goes to the address the caller gave.
+    """
+    if any(char in value for char in "\r\n,;"):
+        return None
+    name, address = parseaddr(value)
+    if name or not address or address != value.strip() or any(char.isspace() for char in address):
+        return None
+    if address.count("@") != 1:
+        return None
+    local, domain = address.split("@")
+    if not local or "." not in domain or domain.startswith(".") or domain.endswith("."):
+        return None
+    return address
+
+def confirmation_rows(ticket_ids: list[int], tickets: list[dict]) -> list[dict]:
+    """Outbox rows for tickets just inserted, or none when EMAIL_CONFIRMATIONS is off.
+
+    Tickets whose email is not a single valid address are saved without one.
+    """
+    if not config.EMAIL_CONFIRMATIONS:
+        return []
+    rows = []
+    for ticket_id, ticket in zip(ticket_ids, tickets):
+        recipient = recipient_address(ticket["email"])
+        if recipient is None:
+            logger.warning("Not queueing a confirmation for ticket %s: invalid recipient", ticket_id)
+            continue
+        rows.append(confirmation_email(ticket_id, **{**ticket, "email": recipient}))
+    return rows
+
+async def claim_emails(db, limit: int, lease_seconds: float) -> list[EmailOutbox]:
+    """Lease up to ``limit`` due emails and commit; returns them with ``attempts`` already counted.
+
+    A leased row is not due again until the lease runs out, so a dispatcher that
+    stops before recording the outcome leaves its emails to be sent again.
+    """
+    now = datetime.now(timezone.utc)
+    due = (EmailOutbox.status == PENDING) & (EmailOutbox.next_attempt_at <= now)
+    ids = (await db.scalars(
+        select(EmailOutbox.id).where(due).order_by(EmailOutbox.next_attempt_at).limit(limit)
+        .with_for_update(skip_locked=True)
+    )).all()
+    if not ids:
+        return []
+    lease_until = now + timedelta(seconds=lease_seconds)
+    # Repeating the due condition keeps two dispatchers from leasing the same row
+    claim = update(EmailOutbox).where(EmailOutbox.id.in_(ids), due).values(
+        attempts=EmailOutbox.attempts + 1, next_attempt_at=lease_until
+    )
+    if db.get_bind().dialect.update_returning:
+        emails = (await db.scalars(
+            claim.returning(EmailOutbox).execution_options(populate_existing=True)
+        )).all()
+    else:
+        await db.execute(claim)
+        emails = (await db.scalars(
+            select(EmailOutbox).where(EmailOutbox.id.in_(ids), EmailOutbox.next_attempt_at == lease_until)
+        )).all()
+    await db.commit()
+    return sorted(emails, key=lambda email: email.id)
+
+async def record_email_results(db, sent: list[int], retries: list[dict]):
+    """Mark emails sent and reschedule (or give up on) failed ones in one transaction and commit"""
+    if sent:
+        await db.execute(
+            update(EmailOutbox).where(EmailOutbox.id.in_(sent))
+            .values(status=SENT, sent_at=datetime.now(timezone.utc), last_error=None)
+        )
+    if retries:
+        # Bulk UPDATE by primary key: one executemany for every failed email
+        await db.execute(update(EmailOutbox), retries)
+    await db.commit()
+
+def is_permanent(error: Exception) -> bool:
+    """5xx SMTP replies (unknown mailbox, rejected sender) will not succeed on retry"""
+    import aiosmtplib
+
+    if isinstance(error, aiosmtplib.SMTPRecipientsRefused):
+        return all(500 <= refused.code < 600 for refused in error.recipients)
+    return isinstance(error, aiosmtplib.SMTPResponseException) and 500 <= error.code < 600
+
+class SMTPPool:
+    """A fixed set of SMTP connections, each kept open and reused across messages"""
+
+    def __init__(
+        self,
+        hostname: Optional[str] = config.SMTP_HOST,
+        port: int = config.SMTP_PORT,
+        size: int = config.EMAIL_POOL_SIZE,
+        username: Optional[str] = config.SMTP_USERNAME,
+        password: Optional[str] = config.SMTP_PASSWORD,
+        tls: str = config.SMTP_TLS,
+        timeout: float = config.SMTP_TIMEOUT,
+    ):
+        import aiosmtplib
+
+        self.size = max(1, size)
+        self._clients = [
+            aiosmtplib.SMTP(
+                hostname=hostname,
+                port=port,
+                # connect() logs in by itself when given credentials
+                username=username,
+                password=password,
+                use_tls=tls == "tls",
+                start_tls=tls == "starttls",
+                timeout=timeout,
+            )
+            for _ in range(self.size)
+        ]
+        self._idle: asyncio.Queue = asyncio.Queue()
+        for client in self._clients:
+            self._idle.put_nowait(client)
+
+    async def send(self, sender: str, recipient: str, message: bytes):
+        """Send on an idle connection, opening it first if needed"""
+        import aiosmtplib
+
+        client = await self._idle.get()
+        try:
+            for attempt in range(2):
+                try:
+                    if not client.is_connected:
+                        await client.connect()
+                    await client.sendmail(sender, [recipient], message)
+                    return
+                except aiosmtplib.SMTPServerDisconnected:
+                    # Servers drop idle connections; reconnect once before failing the message
+                    client.close()
+                    if attempt:
+                        raise
+                except (aiosmtplib.SMTPResponseException, aiosmtplib.SMTPRecipientsRefused):
+                    # The server refused this message and aiosmtplib reset the envelope;
+                    # the connection is still usable
+                    raise
+                except (aiosmtplib.SMTPException, OSError, asyncio.TimeoutError):
+                    client.close()
+                    raise
+        finally:
+            self._idle.put_nowait(client)
+
+    async def close(self):
+        for client in self._clients:
+            if client.is_connected:
+                try:
+                    await client.quit()
+                except Exception:
+                    client.close()
+
+class EmailDispatcher:
+    """Drains the email outbox: leases due emails in batches, sends them over the SMTP
+    pool and records each outcome, retrying failures with exponential backoff.
+
+    Delivery is at least once: an email sent just before the dispatcher stops, but
+    not yet marked sent, goes out again when its lease runs out. Each message keeps
+    the same Message-ID across attempts so mail clients can drop the duplicate.
+    """
+
+    def __init__(
+        self,
+        pool: SMTPPool,
+        session_factory=None,
+        sender: str = config.EMAIL_FROM,
+        batch_size: int = config.EMAIL_BATCH_SIZE,
+        poll_seconds: float = config.EMAIL_POLL_SECONDS,
+        lease_seconds: float = config.EMAIL_LEASE_SECONDS,
+        max_attempts: int = config.EMAIL_MAX_ATTEMPTS,
+        retry_base: float = config.EMAIL_RETRY_BASE_SECONDS,
+        retry_max: float = config.EMAIL_RETRY_MAX_SECONDS,
+    ):
+        if session_factory is None:
+            from async_db import AsyncSessionLocal as session_factory
+        self.pool = pool
+        self.session_factory = session_factory
+        self.sender = sender
+        self.address = parseaddr(sender)[1]
+        self.domain = self.address.rpartition("@")[2] or "localhost"
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+
+    def message(self, email: EmailOutbox) -> bytes:
+        # The legacy (compat32) MIME classes build a message several times faster than
+        # EmailMessage, whose header parsing would otherwise cap a dispatcher's throughput
+        message = MIMEText(email.body, "plain", "utf-8")
+        message["From"] = self.sender
+        message["To"] = email.recipient
+        message["Subject"] = email.subject
+        message["Date"] = formatdate(usegmt=True)
+        message["Message-ID"] = f"<ticket-{email.ticket_id}.{email.id}@{self.domain}>"
+        return message.as_bytes()
+
+    def backoff(self, attempts: int) -> float:
+        """Seconds before retrying after ``attempts`` failures, jittered so retries spread out"""
+        delay = min(self.retry_max, self.retry_base * 2 ** (attempts - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    async def _send(self, email: EmailOutbox) -> Optional[Exception]:
+        try:
+            await self.pool.send(self.address, email.recipient, self.message(email))
+        except Exception as e:
+            return e
+        return None
+
+    async def dispatch_once(self) -> int:
+        """Send one batch of due emails; returns how many were claimed"""
+        from latency_metrics import CONFIRMATION_EMAILS
+
+        async with self.session_factory() as db:
+            emails = await claim_emails(db, self.batch_size, self.lease_seconds)
+        if not emails:
+            return 0
+        # The pool bounds concurrency, so the batch goes out over every connection at once
+        errors = await asyncio.gather(*(self._send(email) for email in emails))
+        sent, retries, now = [], [], datetime.now(timezone.utc)
+        for email, error in zip(emails, errors):
+            if error is None:
+                sent.append(email.id)
+                continue
+            give_up = is_permanent(error) or email.attempts >= self.max_attempts
+            retries.append({
+                "id": email.id,
+                "status": FAILED if give_up else PENDING,
+                "next_attempt_at": now + timedelta(seconds=0 if give_up else self.backoff(email.attempts)),
+                "last_error": f"{type(error).__name__}: {error}"[:500],
+            })
+            if give_up:
+                logger.error("Giving up on confirmation email %s for ticket %s: %s", email.id, email.ticket_id, error)
+            else:
+                logger.warning("Confirmation email %s for ticket %s failed, will retry: %s", email.id, email.ticket_id, error)
+        async with self.session_factory() as db:
+            await record_email_results(db, sent, retries)
+        CONFIRMATION_EMAILS.labels(outcome="sent").inc(len(sent))
+        for retry in retries:
+            CONFIRMATION_EMAILS.labels(outcome="failed" if retry["status"] == FAILED else "retried").inc()
+        return len(emails)
+
+    async def run(self, stop: asyncio.Event):
+        """Dispatch until ``stop`` is set, polling when the outbox has nothing due"""
+        while not stop.is_set():
+            try:
+                claimed = await self.dispatch_once()
+            except Exception as e:
+                # Database hiccups: the leases keep claimed emails safe, so just try again later
+                logger.error("Email dispatch failed: %s", e)
+                claimed = 0
+            if claimed < self.batch_size:
+                try:
+                    await asyncio.wait_for(stop.wait(), self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+        await self.pool.close()
+
+def run_email_dispatcher():
+    """Run the email dispatcher until SIGTERM (the supervisor's stop signal)"""
+    from agent_logging import setup_logging
+
+    setup_logging()
+
+    async def main():
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, stop.set)
+        logger.info("Email dispatcher sending through %s:%s", config.SMTP_HOST, config.SMTP_PORT)
+        await EmailDispatcher(SMTPPool()).run(stop)
+
+    asyncio.run(main())
@@ -0,0 +1,87 @@
+import asyncio
+import hashlib
+import logging
+import re
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+from async_crud import get_ticket_id_by_key
+from async_db import AsyncSessionLocal
+from config import config
+
+logger = logging.getLogger("agent")
+
+def idempotency_key(room: str, email: str, phone: str, issue: str) -> str:
+    """Stable key for one caller's ticket in one room, ignoring case, spacing and phone punctuation"""
+    normalized = "|".join([
+        room,
+        email.strip().lower(),
+        re.sub(r"\D", "", phone),
+        " ".join(issue.lower().split()),
+    ])
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+class TicketDeduplicator:
+    """Returns the existing ticket ID for a create_ticket that was already issued.
+
+    Lookups go to an in-memory LRU of recent keys first, then the
+    ticket_idempotency_keys table. Concurrent calls with the same key (a preemptive
+    generation racing the confirmed one) share a single in-flight create.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal, max_entries: int = config.IDEMPOTENCY_CACHE_SIZE):
+        self._session_factory = session_factory
+        self.max_entries = max_entries
+        self._recent: OrderedDict[str, int] = OrderedDict()
+        self._in_flight: dict[str, asyncio.Future] = {}
+        self.duplicates = 0
+
+    def _remember(self, key: str, ticket_id: int):
+        self._recent[key] = ticket_id
+        self._recent.move_to_end(key)
+        while len(self._recent) > self.max_entries:
+            self._recent.popitem(last=False)
+
+    async def _lookup(self, key: str) -> Optional[int]:
+        if key in self._recent:
+            self._recent.move_to_end(key)
+            return self._recent[key]
+        async with self._session_factory() as db:
+            ticket_id = await get_ticket_id_by_key(db, key)
+        if ticket_id is not None:
+            self._remember(key, ticket_id)
+        return ticket_id
+
+    async def create_once(self, key: str, create: Callable[[], Awaitable[int]]) -> tuple[int, bool]:
+        """Run ``create`` unless ``key`` already created a ticket; returns (ticket_id, created)"""
+        if key in self._in_flight:
+            self.duplicates += 1
+            return await asyncio.shield(self._in_flight[key]), False
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            ticket_id = await self._lookup(key)
+            created = ticket_id is None
+            if created:
+                ticket_id = await create()
+                self._remember(key, ticket_id)
+            else:
+                self.duplicates += 1
+            future.set_result(ticket_id)
+            return ticket_id, created
+        except BaseException as e:
+            future.set_exception(e)
+            # Nobody else may be waiting; don't leave "exception never retrieved" behind
+            future.exception()
+            raise
+        finally:
+            del self._in_flight[key]
+
+_deduplicator: Optional[TicketDeduplicator] = None
+
+def get_ticket_deduplicator() -> TicketDeduplicator:
+    """Process-wide deduplicator; a room's calls all run in one job process"""
+    global _deduplicator
+    if _deduplicator is None:
+        _deduplicator = TicketDeduplicator()
+    return _deduplicator
@@ -0,0 +1,62 @@
+import re
+from typing import NamedTuple, Optional
+
+class IssueType(NamedTuple):
+    key: str
+    name: str
+    description: str
+    price: float
+    keywords: tuple[str, ...]
+
+# Single source of truth for the supported issues, their prices and trigger words
+ISSUE_CATALOG = [
+    IssueType(
+        key="wifi_not_working",
+        name="wifi not working",
+        description="Wi-Fi not working",
+        price=20.0,
+        keywords=("wifi", "wi-fi", "wi fi", "wireless", "internet"),
+    ),
+    IssueType(
+        key="email_login_issues",
+        name="email login issues",
+        description="Email login issues - password reset",
+        price=15.0,
+        keywords=("email", "e-mail", "password", "login", "log in", "sign in"),
+    ),
+    IssueType(
+        key="slow_laptop",
+        name="slow laptop performance",
+        description="Slow laptop performance - CPU change",
+        price=25.0,
+        keywords=("laptop slow", "slow", "slowly", "sluggish", "lagging"),
+    ),
+    IssueType(
+        key="printer_problems",
+        name="printer problems",
+        description="Printer problems - power plug change",
+        price=10.0,
+        keywords=("printer", "printing", "ink", "power"),
+    ),
+]
+
+ISSUES_BY_KEY = {issue.key: issue for issue in ISSUE_CATALOG}
+ISSUES_BY_NAME = {issue.name: issue for issue in ISSUE_CATALOG}
+
+UNSUPPORTED = "unsupported"
+
+def _build_matcher() -> re.Pattern:
+    # One named group per issue; longer phrases first so "laptop slow" beats "slow".
+    # Phrases match whole words, plus a plural "s", so "ink" misses "inkscape"
+    groups = []
+    for issue in ISSUE_CATALOG:
+        phrases = sorted({issue.name, *issue.keywords}, key=len, reverse=True)
+        groups.append(f"(?P<{issue.key}>{'|'.join(re.escape(phrase) for phrase in phrases)})")
+    return re.compile(r"\b(?:" + "|".join(groups) + r")s?\b")
+
+ISSUE_MATCHER = _build_matcher()
+
+def match_issue(user_text: str) -> Optional[IssueType]:
+    """Return the issue whose trigger phrase appears first in the text, if any"""
+    match = ISSUE_MATCHER.search(user_text.lower())
+    return ISSUES_BY_KEY[match.lastgroup] if match else None
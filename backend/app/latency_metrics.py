@@ -0,0 +1,168 @@
+import os
+import re
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# Voice pipeline stages are tens of milliseconds to a few seconds
+LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.15, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0)
+DB_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+STT_DURATION = Histogram(
+    "helpdesk_stt_duration_seconds", "STT request duration", ["provider"], buckets=LATENCY_BUCKETS
+)
+LLM_TTFT = Histogram(
+    "helpdesk_llm_ttft_seconds", "LLM time to first token", ["provider"], buckets=LATENCY_BUCKETS
+)
+LLM_DURATION = Histogram(
+    "helpdesk_llm_duration_seconds", "LLM full completion duration", ["provider"], buckets=LATENCY_BUCKETS
+)
+LLM_TOKENS = Counter("helpdesk_llm_tokens", "LLM tokens used", ["provider", "kind"])
+TTS_TTFB = Histogram(
+    "helpdesk_tts_ttfb_seconds", "TTS time to first audio byte", ["provider"], buckets=LATENCY_BUCKETS
+)
+EOU_DELAY = Histogram(
+    "helpdesk_end_of_utterance_delay_seconds",
+    "Time from end of user speech to end-of-turn decision",
+    buckets=LATENCY_BUCKETS,
+)
+TRANSCRIPTION_DELAY = Histogram(
+    "helpdesk_transcription_delay_seconds",
+    "Time from end of user speech to final transcript",
+    buckets=LATENCY_BUCKETS,
+)
+VOICE_TO_VOICE = Histogram(
+    "helpdesk_voice_to_voice_seconds",
+    "End-of-utterance delay + LLM TTFT + TTS TTFB for one agent reply",
+    buckets=LATENCY_BUCKETS,
+)
+DB_CALL_DURATION = Histogram(
+    "helpdesk_db_call_seconds", "Duration of function-tool database calls", ["operation"], buckets=DB_BUCKETS
+)
+ACTIVE_SESSIONS = Gauge(
+    "helpdesk_active_sessions", "Agent sessions currently running", multiprocess_mode="livesum"
+)
+PROVIDER_FAILURES = Counter(
+    "helpdesk_provider_failures", "Failed or too-slow STT/LLM/TTS provider calls", ["provider"]
+)
+# Breaker state is shared by the host's job processes; 1 while any live one sees the circuit open
+PROVIDER_CIRCUIT_OPEN = Gauge(
+    "helpdesk_provider_circuit_open",
+    "Whether a provider is being skipped because its circuit is open",
+    ["provider"],
+    multiprocess_mode="livemax",
+)
+ADMISSION_DECISIONS = Counter(
+    "helpdesk_admission_decisions", "Token requests admitted, queued, rejected or rate limited", ["decision"]
+)
+RESPONSE_CACHE_LOOKUPS = Counter(
+    "helpdesk_response_cache_lookups", "LLM turns answered from the response cache, or why not", ["result"]
+)
+CONFIRMATION_EMAILS = Counter(
+    "helpdesk_confirmation_emails", "Confirmation email delivery attempts that were sent, retried or given up", ["outcome"]
+)
+TICKETS_ARCHIVED = Counter("helpdesk_tickets_archived", "Tickets moved out of the hot table by the retention job")
+
+def _provider(m) -> str:
+    return getattr(m, "label", None) or "unknown"
+
+class TurnLatencyTracker:
+    """Joins per-stage metrics sharing a speech_id into one voice-to-voice sample"""
+
+    def __init__(self, max_pending: int = 32):
+        self.max_pending = max_pending
+        self._pending: OrderedDict[str, dict] = OrderedDict()
+
+    def add(self, speech_id: str, stage: str, value: float):
+        stages = self._pending.setdefault(speech_id, {})
+        stages[stage] = value
+        if len(stages) == 3:
+            VOICE_TO_VOICE.observe(sum(stages.values()))
+            del self._pending[speech_id]
+        while len(self._pending) > self.max_pending:
+            self._pending.popitem(last=False)
+
+def record_metrics(m, tracker: TurnLatencyTracker = None):
+    """Turn one MetricsCollectedEvent payload into histogram observations"""
+    # Dispatch on the payload's type tag so the API server can import this module
+    # (for render_metrics) without loading livekit.agents
+    kind = getattr(m, "type", None)
+    speech_id = getattr(m, "speech_id", None)
+    if kind == "stt_metrics":
+        STT_DURATION.labels(_provider(m)).observe(m.duration)
+    elif kind == "llm_metrics":
+        if m.cancelled:
+            return
+        LLM_TTFT.labels(_provider(m)).observe(m.ttft)
+        LLM_DURATION.labels(_provider(m)).observe(m.duration)
+        LLM_TOKENS.labels(_provider(m), "prompt").inc(m.prompt_tokens)
+        LLM_TOKENS.labels(_provider(m), "completion").inc(m.completion_tokens)
+        if tracker and speech_id:
+            tracker.add(speech_id, "llm_ttft", m.ttft)
+    elif kind == "tts_metrics":
+        if m.cancelled or m.ttfb < 0:
+            return
+        TTS_TTFB.labels(_provider(m)).observe(m.ttfb)
+        if tracker and speech_id:
+            tracker.add(speech_id, "tts_ttfb", m.ttfb)
+    elif kind == "eou_metrics":
+        EOU_DELAY.observe(m.end_of_utterance_delay)
+        TRANSCRIPTION_DELAY.observe(m.transcription_delay)
+        if tracker and speech_id:
+            tracker.add(speech_id, "eou_delay", m.end_of_utterance_delay)
+
+@contextmanager
+def observe_db_call(operation: str):
+    """Time a database call made from a function tool"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        DB_CALL_DURATION.labels(operation).observe(time.perf_counter() - started)
+
+# Per-process files of the live* gauge modes, e.g. gauge_livesum_4242.db
+LIVE_GAUGE_FILE = re.compile(r"gauge_live[a-z]+_(\d+)\.db$")
+
+def mark_process_dead(pid: Optional[int] = None):
+    """Drop a finished process's live gauges (active sessions, open circuits) in multiprocess mode"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid or os.getpid())
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def sweep_dead_processes(path: str):
+    """Remove live gauges left behind by processes that died without marking themselves dead"""
+    for name in os.listdir(path):
+        match = LIVE_GAUGE_FILE.match(name)
+        if match and not _alive(int(match.group(1))):
+            multiprocess.mark_process_dead(int(match.group(1)), path)
+
+def render_metrics() -> tuple[bytes, str]:
+    """Exposition payload; aggregates every process when PROMETHEUS_MULTIPROC_DIR is set"""
+    path = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if path:
+        # Job processes killed mid-call never reach their shutdown callbacks
+        sweep_dead_processes(path)
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -1,3 +1,5 @@
+import asyncio
+import hashlib
 import logging
 import os
 import pathlib
@@ -6,32 +8,210 @@ from livekit.agents import (
     Agent,
     AgentFalseInterruptionEvent,
     AgentSession,
+    ChatContext,
     JobContext,
     JobProcess,
     MetricsCollectedEvent,
+    ModelSettings,
     RoomInputOptions,
     RunContext,
     WorkerOptions,
     cli,
+    get_job_context,
+    llm,
     metrics,
+    stt,
+    tts,
+    utils,
 )
 from livekit.agents.llm import function_tool
 from livekit.agents.voice.events import CloseEvent, ErrorEvent
 from livekit.agents.utils.audio import audio_frames_from_file
 from livekit.plugins import cartesia, deepgram, noise_cancellation, openai, silero
 from livekit.plugins.turn_detector.multilingual import MultilingualModel
-from prompt import SYSTEM_PROMPT
-from crud import create_ticket, edit_ticket
-from db import SessionLocal
-from typing import Optional
+from livekit import rtc
+from config import config
+from admission import get_load_reporter
+from call_archive import get_call_archive
+from agent_logging import Sensitive, TurnSampler, setup_logging
+from phrase_cache import get_phrase_cache
+from resilience import build_llm, build_stt, build_tts
+from response_cache import get_response_cache, last_user_utterance, normalize_utterance, refers_back
+from prompt import FIXED_PHRASES, GREETING, SYSTEM_PROMPT, TECHNICAL_DIFFICULTIES, price_confirmation, resume_greeting
+from idempotency import get_ticket_deduplicator, idempotency_key
+from issues import match_issue
+from latency_metrics import ACTIVE_SESSIONS, TurnLatencyTracker, mark_process_dead, observe_db_call, record_metrics
+from async_db import async_engine
+from db import SessionLocal, engine
+from draft_store import get_draft_store
+from email_outbox import recipient_address
+from ticket_draft import ChatCompactor, TicketDraft
+from token_service import session_id_from_room
+from ticket_writer import get_ticket_writer
+from typing import AsyncIterable, Optional
 
 logger = logging.getLogger("agent")
+metrics_logger = logging.getLogger("agent.metrics")
+
+TTS_VOICE = "6f84f4b8-58a2-430c-8c79-688dad597532"
+PHRASE_LANGUAGE = "en"
+# Cached LLM replies are only reused under the prompt that produced them
+PROMPT_VERSION = hashlib.sha256(SYSTEM_PROMPT.encode()).hexdigest()[:12]
+
+def cached_phrase_audio(text: str):
+    """Cached frames for a fixed phrase, or NOT_GIVEN to fall back to live TTS"""
+    audio = get_phrase_cache().get(TTS_VOICE, text, PHRASE_LANGUAGE)
+    return audio.frames() if audio else NOT_GIVEN
 
 class Assistant(Agent):
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        room_name: str = "",
+        keep_turns: int = config.CONTEXT_KEEP_TURNS,
+        session_id: Optional[str] = None,
+        draft: Optional[TicketDraft] = None,
+    ) -> None:
+        # A restored draft starts the conversation as the summary the caller already gave
+        chat_ctx = ChatContext.empty()
+        if draft is not None and not draft.is_empty():
+            chat_ctx.add_message(role="system", content=f"Restored from the caller's previous connection.\n{draft.summary()}")
         super().__init__(
             instructions=SYSTEM_PROMPT,
+            chat_ctx=chat_ctx,
+        )
+        self.room_name = room_name
+        self.session_id = session_id
+        self.draft = draft or TicketDraft()
+        self.compactor = ChatCompactor(self.draft, keep_turns)
+
+    async def checkpoint(self):
+        """Save the draft so a reconnect of this session can pick up where it left off"""
+        if not self.session_id:
+            return
+        try:
+            await get_draft_store().put(self.session_id, self.draft)
+        except Exception as e:
+            logger.warning("Could not checkpoint ticket draft: %s", e)
+
+    def cache_state(self, chat_ctx: ChatContext) -> Optional[str]:
+        """What a cached reply must have been given under: the prompt, which ticket details are
+        still missing and the issue (with its price) the call is about.
+
+        None when the caller refers back to something said earlier that names no known
+        issue, since the reply then depends on turns the state does not capture.
+        """
+        stage = "created" if self.draft.ticket_id is not None else ",".join(self.draft.missing())
+        topic = None
+        if self.draft.issue is not None:
+            topic = f"{self.draft.issue}={self.draft.price}"
+        else:
+            earlier = [
+                item.text_content or "" for item in chat_ctx.items[:-1]
+                if item.type == "message" and item.role == "user"
+            ]
+            for text in reversed(earlier):
+                if issue := match_issue(text):
+                    topic = f"{issue.name}={issue.price}"
+                    break
+            else:
+                utterance = last_user_utterance(chat_ctx)
+                if earlier and utterance and refers_back(normalize_utterance(utterance)):
+                    return None
+        return f"{PROMPT_VERSION}:{stage}:{topic or '-'}"
+
+    async def llm_node(self, chat_ctx: ChatContext, tools: list, model_settings: ModelSettings):
+        """Send the ticket draft in place of older turns so prompt size per turn stays bounded,
+        answering recurring questions from the response cache when it has the reply"""
+        chat_ctx = self.compactor.compact(chat_ctx)
+        cache = get_response_cache()
+        if cache is None:
+            async for chunk in Agent.default.llm_node(self, chat_ctx, tools, model_settings):
+                yield chunk
+            return
+        async for chunk in cache.serve(
+            self.cache_state(chat_ctx),
+            chat_ctx,
+            self.session_id or self.room_name,
+            lambda: Agent.default.llm_node(self, chat_ctx, tools, model_settings),
+        ):
+            yield chunk
+
+    async def tts_node(
+        self, text: AsyncIterable[str], model_settings: ModelSettings
+    ) -> AsyncIterable[rtc.AudioFrame]:
+        """Replay cached audio when a reply starts with a fixed phrase, else use live TTS"""
+        cache = get_phrase_cache()
+        text_iter = text.__aiter__()
+        buffered = ""
+        phrase = None
+        async for chunk in text_iter:
+            buffered += chunk
+            spoken = buffered.lstrip()
+            phrase = next((p for p in cache.phrases if spoken.startswith(p)), None)
+            if phrase or not any(p.startswith(spoken) for p in cache.phrases):
+                break
+
+        audio = await cache.fetch(TTS_VOICE, phrase, PHRASE_LANGUAGE) if phrase else None
+        if audio is not None:
+            async for frame in audio.frames():
+                yield frame
+            buffered = buffered.lstrip()[len(phrase):]
+
+        async def remaining_text():
+            if buffered.strip():
+                yield buffered
+            async for chunk in text_iter:
+                yield chunk
+
+        async for frame in Agent.default.tts_node(self, remaining_text(), model_settings):
+            yield frame
+
+    @function_tool
+    async def lookup_issue(self, context: RunContext, description: str):
+        """Use this tool to map the caller's problem to a supported issue and its exact price.
+
+        Args:
+            description: The caller's description of the problem (IN ENGLISH)
+        """
+        issue = match_issue(description)
+        if issue is None:
+            return "unsupported: offer the four supported services instead"
+        return f"issue: {issue.name}; price: {issue.price:g}; say: {price_confirmation(issue.name)}"
+
+    @function_tool
+    async def update_ticket_draft(
+        self,
+        context: RunContext,
+        name: Optional[str] = None,
+        email: Optional[str] = None,
+        phone: Optional[str] = None,
+        address: Optional[str] = None,
+        issue: Optional[str] = None,
+    ):
+        """Use this tool to record details the caller just gave or corrected, before the ticket exists.
+
+        Call it in the same response as your spoken reply; it returns nothing.
+
+        Args:
+            name: Customer's full name (MUST BE IN ENGLISH, optional)
+            email: Customer's email address (optional)
+            phone: Customer's phone number (optional)
+            address: Customer's address (MUST BE IN ENGLISH, optional)
+            issue: The caller's problem (IN ENGLISH, optional); mapped to a supported issue and price
+        """
+        matched = match_issue(issue) if issue else None
+        changed = self.draft.update(
+            name=name,
+            email=email,
+            phone=phone,
+            address=address,
+            issue=matched.name if matched else None,
+            price=matched.price if matched else None,
         )
+        if changed:
+            logger.info("Ticket draft updated: %s", ", ".join(changed))
+            await self.checkpoint()
+        # Returning None asks for no follow-up LLM turn
 
     @function_tool
     async def create_ticket(
@@ -58,36 +238,48 @@ class Assistant(Agent):
             price: Service fee for the issue
         """
 
-        logger.info(f"Creating ticket for {name} with issue: {issue}")
-        logger.info(f"Ticket details - Name: {name}, Address: {address}, Issue: {issue}")
+        logger.info(
+            "Creating ticket for %s (%s, %s) at %s with issue: %s",
+            Sensitive(name), email, phone, Sensitive(address), issue,
+        )
 
-        db = SessionLocal()
         try:
             if not all([name, email, phone, address, issue]):
                 raise ValueError("All required fields must be provided")
+
+            if recipient_address(email) is None:
+                raise ValueError("The email address is not valid, ask the customer to spell it again")
             
             if price <= 0:
                 raise ValueError("Price must be greater than 0")
 
-            ticket = create_ticket(
-                db=db,
-                name=name,
-                email=email,
-                phone=phone,
-                address=address,
-                issue=issue,
-                price=price
+            key = idempotency_key(self.room_name, email, phone, issue)
+            with observe_db_call("create_ticket"):
+                ticket_id, created = await get_ticket_deduplicator().create_once(
+                    key,
+                    lambda: get_ticket_writer().create_ticket(
+                        idempotency_key=key,
+                        room=self.room_name,
+                        name=name,
+                        email=email,
+                        phone=phone,
+                        address=address,
+                        issue=issue,
+                        price=price
+                    ),
+                )
+            if created:
+                logger.info("Ticket %s created successfully", ticket_id)
+            else:
+                logger.info("Duplicate create_ticket in room %s, returning existing ticket %s", self.room_name, ticket_id)
+            self.draft.update(
+                name=name, email=email, phone=phone, address=address, issue=issue, price=price, ticket_id=ticket_id
             )
-            logger.info(f"Ticket {ticket.id} created successfully")
-            return f"Ticket created successfully with ID: {ticket.id}"
+            await self.checkpoint()
+            return f"Ticket created successfully with ID: {ticket_id}"
         except Exception as e:
-            logger.error(f"Error creating ticket: {e}")
+            logger.error("Error creating ticket: %s", e)
             return f"Error creating ticket: {str(e)}"
-        finally:
-            try:
-                db.close()
-            except Exception as close_error:
-                logger.error(f"Error closing database connection: {close_error}")
     
     @function_tool
     async def edit_ticket(
@@ -116,124 +308,225 @@ class Assistant(Agent):
             price: Service fee for the issue (optional)
         """
 
-        logger.info(f"Editing ticket {ticket_id}")
-        if name != NOT_GIVEN:
-            logger.info(f"Updating name to: {name}")
-        if address != NOT_GIVEN:
-            logger.info(f"Updating address to: {address}")
-        if issue != NOT_GIVEN:
-            logger.info(f"Updating issue to: {issue}")
+        # Omitted arguments arrive as NOT_GIVEN; only the fields the model passed are written
+        updates = {
+            field: value
+            for field, value in {
+                "name": name,
+                "email": email,
+                "phone": phone,
+                "address": address,
+                "issue": issue,
+                "price": price,
+            }.items()
+            if utils.is_given(value) and value is not None
+        }
+        logger.info(
+            "Editing ticket %s: %s",
+            ticket_id,
+            " ".join(f"{field}={Sensitive(value) if field in ('name', 'address') else value}" for field, value in updates.items()),
+        )
 
-        db = SessionLocal()
         try:
-            if ticket_id is None or ticket_id <= 0:
+            if not utils.is_given(ticket_id) or ticket_id is None or ticket_id <= 0:
                 raise ValueError("Valid ticket ID is required")
 
-            ticket = edit_ticket(
-                db=db,
-                ticket_id=ticket_id,
-                name=name,
-                email=email,
-                phone=phone,
-                address=address,
-                issue=issue,
-                price=price
-            )
+            with observe_db_call("edit_ticket"):
+                ticket = await get_ticket_writer().edit_ticket(ticket_id, **updates)
 
             if ticket:
-                logger.info(f"Ticket {ticket_id} updated successfully")
+                logger.info("Ticket %s updated successfully", ticket_id)
+                if self.draft.ticket_id in (None, ticket_id):
+                    self.draft.update(ticket_id=ticket_id, **updates)
+                    await self.checkpoint()
                 return f"Ticket {ticket_id} updated successfully"
             else:
-                logger.warning(f"Ticket {ticket_id} not found")
+                logger.warning("Ticket %s not found", ticket_id)
                 return f"Ticket {ticket_id} not found"
                 
         except ValueError as ve:
-            logger.error(f"Validation error editing ticket: {ve}")
+            logger.error("Validation error editing ticket: %s", ve)
             return f"There's an issue with the ticket information: {str(ve)}"
             
         except Exception as e:
-            logger.error(f"Error editing ticket {ticket_id}: {e}")
+            logger.error("Error editing ticket %s: %s", ticket_id, e)
             return f"Error editing ticket: {str(e)}"
-        finally:
-            try:
-                db.close()
-            except Exception as close_error:
-                logger.error(f"Error closing database connection: {close_error}")
+
+def job_log_context() -> dict:
+    """The current job's log fields (its room), to tag agent log records with"""
+    try:
+        return dict(get_job_context().log_context_fields)
+    except RuntimeError:
+        return {}
 
 def prewarm(proc: JobProcess):
+    setup_logging(context=job_log_context)
+    # Job processes may inherit pooled connections from the parent; drop them
+    # without closing so this process opens its own.
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
     proc.userdata["vad"] = silero.VAD.load()
-
+    # Build provider clients and the noise-cancellation filter before a job is
+    # assigned so the first greeting doesn't wait on client setup.
+    # Each provider gets a fallback chain whose circuit breakers are shared by every
+    # job process on the host, so one caller's failures steer the others away too.
+    fallback = config.PROVIDER_FALLBACK
+    proc.userdata["llm"] = build_llm(
+        openai.LLM(model="gpt-4o-mini"),
+        [openai.LLM(model=config.LLM_FALLBACK_MODEL)] if fallback and config.LLM_FALLBACK_MODEL else [],
+    )
+    proc.userdata["stt"] = build_stt(
+        deepgram.STT(model="nova-3", language="en-US"),
+        [openai.STT(language="en")] if fallback else [],
+        vad=proc.userdata["vad"],
+    )
+    # Cached phrases are keyed by the Cartesia voice, so only Cartesia synthesizes them
+    proc.userdata["phrase_tts"] = cartesia.TTS(voice=TTS_VOICE)
+    proc.userdata["tts"] = build_tts(
+        proc.userdata["phrase_tts"],
+        [openai.TTS(voice="ash")] if fallback else [],
+    )
+    proc.userdata["noise_cancellation"] = noise_cancellation.BVC()
+    response_cache = get_response_cache()
+    if response_cache is not None:
+        try:
+            response_cache.warm()
+        except Exception as e:
+            logger.warning("Could not load the response cache: %s", e)
+    phrase_cache = get_phrase_cache()
+    phrase_cache.register_phrases(FIXED_PHRASES)
+    loaded = phrase_cache.load(TTS_VOICE, FIXED_PHRASES, PHRASE_LANGUAGE)
+    logger.info("Loaded %d/%d cached phrases", loaded, len(FIXED_PHRASES))
+
+def job_count_load(worker) -> float:
+    """Worker load as the share of AGENT_MAX_JOBS concurrent calls in use"""
+    return min(len(worker.active_jobs) / config.AGENT_MAX_JOBS, 1.0)
+
+def worker_options(index: int = 0) -> WorkerOptions:
+    """Settings for agent worker ``index``: job-process pool size, load threshold, drain timeout and health port"""
+    options = dict(
+        entrypoint_fnc=entrypoint,
+        prewarm_fnc=prewarm,
+        num_idle_processes=config.AGENT_NUM_IDLE_PROCESSES,
+        load_threshold=config.AGENT_LOAD_THRESHOLD,
+        drain_timeout=config.AGENT_DRAIN_TIMEOUT,
+        # Workers on one host each need their own health-check port
+        port=config.AGENT_HEALTH_PORT + index if config.AGENT_HEALTH_PORT else 0,
+    )
+    # Without a job cap the worker reports its CPU usage as load
+    if config.AGENT_MAX_JOBS > 0:
+        options["load_fnc"] = job_count_load
+    return WorkerOptions(**options)
+
+async def restore_draft(session_id: str) -> Optional[TicketDraft]:
+    """The session's saved draft, or None to start a fresh one when there is none or the store fails"""
+    try:
+        return await get_draft_store().get(session_id)
+    except Exception as e:
+        logger.warning("Could not restore ticket draft, starting a new one: %s", e)
+        return None
 
 async def entrypoint(ctx: JobContext):
-    print("Entrypoint called")
+    logger.info("Entrypoint called for room %s", ctx.room.name)
     ctx.log_context_fields = {
         "room": ctx.room.name,
     }
 
+    session_id = session_id_from_room(ctx.room.name)
+    restored = await restore_draft(session_id) if session_id else None
+    if restored is not None:
+        logger.info("Restored ticket draft for session %s", session_id)
+
     session = AgentSession(
-        llm=openai.LLM(model="gpt-4o-mini"),
-        stt=deepgram.STT(model="nova-3", language="en-US"),
-        tts=cartesia.TTS(voice="6f84f4b8-58a2-430c-8c79-688dad597532"),
+        llm=ctx.proc.userdata["llm"],
+        stt=ctx.proc.userdata["stt"],
+        tts=ctx.proc.userdata["tts"],
+        # The turn-detector model itself is loaded once in the worker's shared
+        # inference process; this only binds it to the job's executor.
         turn_detection=MultilingualModel(),
         vad=ctx.proc.userdata["vad"],
         preemptive_generation=True,
     )
 
     error_audio_path = os.path.join(pathlib.Path(__file__).parent.absolute(), "error_message.ogg")
+    error_audio = None
+
+    async def warm_phrase_cache():
+        # Decode the fallback clip once and synthesize any fixed phrase that isn't on
+        # disk yet, so later calls (and later processes) replay them without TTS.
+        nonlocal error_audio
+        phrase_cache = get_phrase_cache()
+        try:
+            error_audio = await phrase_cache.load_file(error_audio_path)
+        except Exception as e:
+            logger.warning("Could not decode %s: %s", error_audio_path, e)
+        await phrase_cache.synthesize_missing(
+            ctx.proc.userdata["phrase_tts"], TTS_VOICE, FIXED_PHRASES, PHRASE_LANGUAGE
+        )
+
+    warm_task = asyncio.create_task(warm_phrase_cache())
 
     @session.on("error")
     def on_error(ev: ErrorEvent):
-        logger.error(f"Agent error occurred: {ev.error} from {ev.source}")
+        logger.error("Agent error occurred: %s from %s", ev.error, ev.source)
         
         if ev.error.recoverable:
             logger.info("Error is recoverable, continuing session")
             return
 
-        logger.warning(f"Session encountered unrecoverable error: {ev.error}")
+        logger.warning("Session encountered unrecoverable error: %s", ev.error)
 
         try:
-            if os.path.exists(error_audio_path):
-                session.say(
-                    "I'm experiencing technical difficulties. Please try reconnecting in a moment.",
-                    audio=audio_frames_from_file(error_audio_path),
-                    allow_interruptions=False,
-                )
+            if error_audio is not None:
+                audio = error_audio.frames()
+            elif os.path.exists(error_audio_path):
+                audio = audio_frames_from_file(error_audio_path)
             else:
-                session.say(
-                    "I'm experiencing technical difficulties. Please try reconnecting in a moment.",
-                    allow_interruptions=False,
-                )
+                audio = cached_phrase_audio(TECHNICAL_DIFFICULTIES)
+            session.say(
+                TECHNICAL_DIFFICULTIES,
+                audio=audio,
+                allow_interruptions=False,
+            )
         except Exception as say_error:
-            logger.error(f"Could not inform user about error: {say_error}")
+            logger.error("Could not inform user about error: %s", say_error)
 
-        if isinstance(ev.source, (openai.LLM, cartesia.TTS)):
+        # Sources are the fallback chains when PROVIDER_FALLBACK is on; by now every
+        # provider in the chain has failed or had its circuit opened.
+        if isinstance(ev.source, (llm.LLM, tts.TTS)):
             logger.info("Attempting to recover from LLM/TTS error")
             ev.error.recoverable = True
             return
 
-        if isinstance(ev.source, deepgram.STT):
+        if isinstance(ev.source, stt.STT):
             logger.info("Attempting to recover from STT error by resetting agent")
             try:
-                session.update_agent(session.current_agent)
+                # A fresh agent carrying the same draft, so nothing the caller said is lost
+                current = session.current_agent
+                session.update_agent(Assistant(
+                    room_name=ctx.room.name,
+                    session_id=session_id,
+                    draft=getattr(current, "draft", None),
+                ))
                 ev.error.recoverable = True
                 return
             except Exception as reset_error:
-                logger.error(f"Failed to reset agent: {reset_error}")
+                logger.error("Failed to reset agent: %s", reset_error)
 
         logger.error("Error is unrecoverable, session will close")
 
     @session.on("close")
     def on_close(ev: CloseEvent):
-        logger.info(f"Session is closing. Reason: {ev.reason if hasattr(ev, 'reason') else 'Unknown'}")
+        logger.info("Session is closing. Reason: %s", getattr(ev, "reason", "Unknown"))
         
         try:
             db = SessionLocal()
             db.close()
             logger.info("Database connections cleaned up")
         except Exception as cleanup_error:
-            logger.error(f"Error during cleanup: {cleanup_error}")
+            logger.error("Error during cleanup: %s", cleanup_error)
 
-        logger.info(f"Session ended for room: {ctx.room.name}")
+        logger.info("Session ended for room: %s", ctx.room.name)
 
     @session.on("agent_false_interruption")
     def _on_agent_false_interruption(ev: AgentFalseInterruptionEvent):
@@ -241,33 +534,75 @@ async def entrypoint(ctx: JobContext):
         try:
             session.generate_reply(instructions=ev.extra_instructions or None)
         except Exception as resume_error:
-            logger.error(f"Failed to resume after false interruption: {resume_error}")
-
-
+            logger.error("Failed to resume after false interruption: %s", resume_error)
 
     usage_collector = metrics.UsageCollector()
+    turn_latency = TurnLatencyTracker()
+    metrics_sampler = TurnSampler(config.LOG_METRICS_SAMPLE_RATE)
+    ACTIVE_SESSIONS.inc()
+    # Published to the admission store so /api/token sees this call's load
+    load_key = await get_load_reporter().session_started(session_id) if config.ADMISSION_CONTROL else None
 
     @session.on("metrics_collected")
     def _on_metrics_collected(ev: MetricsCollectedEvent):
-        metrics.log_metrics(ev.metrics)
+        if metrics_sampler.sample(getattr(ev.metrics, "speech_id", None)):
+            metrics.log_metrics(ev.metrics, logger=metrics_logger)
         usage_collector.collect(ev.metrics)
+        record_metrics(ev.metrics, turn_latency)
 
     async def log_usage():
         summary = usage_collector.get_summary()
-        logger.info(f"Usage: {summary}")
+        logger.info("Usage: %s", summary)
+        ACTIVE_SESSIONS.dec()
+        if load_key is not None:
+            await get_load_reporter().session_ended(load_key)
 
     ctx.add_shutdown_callback(log_usage)
 
+    # Transcript, tool calls and metrics are buffered per call and written to the
+    # archive by a background thread once the call ends.
+    archive = get_call_archive()
+    if archive is not None:
+        recorder = archive.recorder(session_id, ctx.room.name)
+        recorder.attach(session)
+
+        async def archive_call():
+            try:
+                ticket_id = session.current_agent.draft.ticket_id
+            except (RuntimeError, AttributeError):
+                ticket_id = None
+            recorder.close(ticket_id=ticket_id)
+            # Job processes exit after one call, so wait (off the loop) for the file
+            await asyncio.to_thread(archive.flush, 10)
+
+        ctx.add_shutdown_callback(archive_call)
+
+    async def stop_warm_task():
+        warm_task.cancel()
+
+    ctx.add_shutdown_callback(stop_warm_task)
+
+    async def drop_live_gauges():
+        # The job process exits after this call; its active-session and circuit gauges go with it
+        mark_process_dead()
+
+    ctx.add_shutdown_callback(drop_live_gauges)
+
     await session.start(
-        agent=Assistant(),
+        agent=Assistant(room_name=ctx.room.name, session_id=session_id, draft=restored),
         room=ctx.room,
         room_input_options=RoomInputOptions(
-            noise_cancellation=noise_cancellation.BVC(),
+            noise_cancellation=ctx.proc.userdata["noise_cancellation"],
         ),
     )
 
     await ctx.connect()
 
+    if restored is not None:
+        session.say(resume_greeting(restored))
+    else:
+        session.say(GREETING, audio=cached_phrase_audio(GREETING))
+
 
 if __name__ == "__main__":
-    cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm))
+    cli.run_app(worker_options())
@@ -1,29 +1,54 @@
-import asyncio
+import importlib.util
+import logging
 import uvicorn
 import sys
 import os
-from multiprocessing import Process
-from livekit.agents import WorkerOptions, cli
-from livekit_agent import entrypoint, prewarm
-from api_server import app
+import shutil
 from config import config
 
-def run_api_server():
-    """Run the FastAPI server"""
-    print("Starting FastAPI server on http://localhost:8000")
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+# prometheus_client picks its storage mode at import time, so point every process
+# at the shared metrics directory before anything imports it.
+if __name__ == "__main__" and config.METRICS_MULTIPROC_DIR:
+    shutil.rmtree(config.METRICS_MULTIPROC_DIR, ignore_errors=True)
+    os.makedirs(config.METRICS_MULTIPROC_DIR, exist_ok=True)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = os.path.abspath(config.METRICS_MULTIPROC_DIR)
 
-def run_livekit_agent():
-    """Run the LiveKit agent with proper CLI simulation"""
-    print("Starting LiveKit Agent...")
+# The agent (livekit.agents and every provider plugin) is only imported in agent
+# workers; API workers and the supervisor never load it.
+from db import engine
+from migrate import run_migrations
+from supervisor import ChildSpec, Supervisor
+
+def run_api_server(sock):
+    """Run one FastAPI worker on the listening socket shared by every API worker"""
+    # An import string (rather than the app object) lets each worker load its own app
+    server_config = uvicorn.Config("api_server:app", host=config.API_HOST, port=config.API_PORT)
+    uvicorn.Server(server_config).run(sockets=[sock])
+
+def run_email_dispatcher():
+    """Send the confirmation emails queued in the outbox"""
+    import email_outbox
+
+    email_outbox.run_email_dispatcher()
+
+def run_ticket_retention():
+    """Move tickets past the retention age into the Parquet archive"""
+    import ticket_archive
+
+    ticket_archive.run_ticket_retention()
+
+def run_livekit_agent(index: int):
+    """Run LiveKit agent worker ``index`` (production ``start`` mode unless AGENT_MODE says otherwise)"""
+    from livekit.agents import cli
+    from livekit_agent import worker_options
+
+    print(f"Starting LiveKit Agent in {config.AGENT_MODE} mode...")
     
     original_argv = sys.argv.copy()
-    sys.argv = ['livekit-agent', 'dev']
+    sys.argv = ['livekit-agent', config.AGENT_MODE]
     
     try:
-        cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm))
-    except Exception as e:
-        print(f"LiveKit Agent error: {e}")
+        cli.run_app(worker_options(index))
     finally:
         sys.argv = original_argv
 
@@ -41,34 +66,51 @@ if __name__ == "__main__":
     print("DeskHelp Bot - Starting Services")
     print("=" * 50)
     
-    api_process = Process(target=run_api_server)
-    agent_process = Process(target=run_livekit_agent)
+    run_migrations()
+    # Services are forked from this process; none may inherit the migration's pooled connection
+    engine.dispose()
     
-    try:
-        api_process.start()
-        agent_process.start()
-        
-        print("Both services started successfully!")
-        print("FastAPI: http://localhost:8000")
-        print("LiveKit Agent: Connected to your LiveKit instance")
-        print("\nPress Ctrl+C to stop all services")
-        
-        # Wait for both processes
-        api_process.join()
-        agent_process.join()
-        
-    except KeyboardInterrupt:
-        print("\nShutting down services...")
-        api_process.terminate()
-        agent_process.terminate()
-        
-        # Wait for clean shutdown
-        api_process.join(timeout=5)
-        agent_process.join(timeout=5)
-        
-        print("All services stopped cleanly")
-    except Exception as e:
-        print(f"Error: {e}")
-        api_process.terminate()
-        agent_process.terminate()
-        sys.exit(1)
\ No newline at end of file
+    supervisor_handler = logging.StreamHandler()
+    supervisor_handler.setFormatter(logging.Formatter("%(asctime)s supervisor: %(message)s"))
+    logging.getLogger("supervisor").addHandler(supervisor_handler)
+    logging.getLogger("supervisor").setLevel(logging.INFO)
+    
+    # Bind once here so every API worker (and its restarts) accepts on the same socket
+    api_socket = uvicorn.Config("api_server:app", host=config.API_HOST, port=config.API_PORT).bind_socket()
+    
+    children = [
+        ChildSpec(f"api-{i}", run_api_server, args=(api_socket,))
+        for i in range(config.API_WORKERS)
+    ] + [
+        # Draining agents finish in-flight calls, so give them the full drain timeout
+        ChildSpec(f"agent-{i}", run_livekit_agent, args=(i,), stop_timeout=config.AGENT_DRAIN_TIMEOUT + 10)
+        for i in range(config.AGENT_WORKERS)
+    ]
+    send_emails = bool(config.SMTP_HOST) and importlib.util.find_spec("aiosmtplib") is not None
+    if send_emails:
+        # Emails sent but not yet marked when it stops go out again, so a short drain is enough
+        children.append(ChildSpec("email-dispatcher", run_email_dispatcher, stop_timeout=config.SMTP_TIMEOUT + 5))
+    archive_tickets = config.TICKET_RETENTION_DAYS > 0 and importlib.util.find_spec("pyarrow") is not None
+    if archive_tickets:
+        # SIGTERM stops it between batches; a batch killed midway rolls back and its tickets stay hot
+        children.append(ChildSpec("ticket-retention", run_ticket_retention))
+    
+    print(f"FastAPI: http://localhost:{config.API_PORT} ({config.API_WORKERS} worker(s))")
+    print(f"LiveKit Agent: {config.AGENT_WORKERS} worker(s), {config.AGENT_NUM_IDLE_PROCESSES} idle job process(es) each")
+    if send_emails:
+        print(f"Confirmation emails: via {config.SMTP_HOST}:{config.SMTP_PORT}")
+    elif config.SMTP_HOST:
+        print("Confirmation emails: aiosmtplib is not installed, emails wait in the outbox")
+    elif config.EMAIL_CONFIRMATIONS:
+        print("Confirmation emails: SMTP_HOST not set, emails wait in the outbox")
+    if archive_tickets:
+        print(f"Ticket retention: tickets older than {config.TICKET_RETENTION_DAYS:g} days move to {config.TICKET_ARCHIVE_DIR}")
+    elif config.TICKET_RETENTION_DAYS > 0:
+        print("Ticket retention: pyarrow is not installed, every ticket stays in the database")
+    print("\nPress Ctrl+C (or send SIGTERM) to drain and stop all services")
+    
+    Supervisor(
+        children,
+        backoff_initial=config.SUPERVISOR_BACKOFF_INITIAL,
+        backoff_max=config.SUPERVISOR_BACKOFF_MAX,
+    ).run()
\ No newline at end of file
@@ -0,0 +1,58 @@
+from sqlalchemy import func, inspect, select, text
+from sqlalchemy.orm import Session
+from crud import rebuild_ticket_stats
+from db import engine
+from models import Base, SupportTicket, TicketArchiveFile, TicketHourlyStats
+
+def sqlite_ticket_autoincrement(bind=engine):
+    """Make SQLite ticket IDs AUTOINCREMENT and keep them above every archived ID.
+
+    A plain INTEGER PRIMARY KEY hands out max(id) + 1, so IDs of tickets the retention
+    job archived came back once the hot table's newest tickets were gone. Tables
+    created before ``sqlite_autoincrement`` are rebuilt once, and the ID sequence is
+    moved past the highest archived ID in case one was already reused.
+    """
+    if bind.dialect.name != "sqlite":
+        return
+    table = SupportTicket.__table__
+    with bind.begin() as conn:
+        sql = conn.scalar(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": table.name})
+        if "AUTOINCREMENT" not in sql.upper():
+            columns = ", ".join(column.name for column in table.columns)
+            conn.execute(text(f"ALTER TABLE {table.name} RENAME TO {table.name}_old"))
+            # Indexes keep their names when the table is renamed
+            for index in table.indexes:
+                conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+            table.create(conn)
+            conn.execute(text(f"INSERT INTO {table.name} ({columns}) SELECT {columns} FROM {table.name}_old"))
+            conn.execute(text(f"DROP TABLE {table.name}_old"))
+        high_water = conn.scalar(select(func.max(TicketArchiveFile.last_id)))
+        if high_water is not None:
+            updated = conn.execute(
+                text("UPDATE sqlite_sequence SET seq = max(seq, :seq) WHERE name = :name"),
+                {"seq": high_water, "name": table.name},
+            )
+            if not updated.rowcount:
+                conn.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)"), {"name": table.name, "seq": high_water})
+
+def run_migrations(bind=engine):
+    """Create any missing tables.
+
+    Run once per deploy (main.py does this before starting services) instead of on
+    every process spawn.
+    """
+    stats_missing = not inspect(bind).has_table(TicketHourlyStats.__tablename__)
+    Base.metadata.create_all(bind=bind)
+    # create_all skips existing tables entirely, so add indexes introduced later
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
+    sqlite_ticket_autoincrement(bind)
+    # Tickets written before the stats table existed still need counting once
+    if stats_missing:
+        with Session(bind) as db:
+            rebuild_ticket_stats(db)
+
+if __name__ == "__main__":
+    run_migrations()
+    print("Database schema is up to date")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float
+from sqlalchemy import Column, Integer, String, DateTime, Float, Index, Text
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime, timezone
 
@@ -9,12 +9,88 @@ class SupportTicket(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), nullable=False)
-    email = Column(String(255), nullable=False)
-    phone = Column(String(20), nullable=False)
+    email = Column(String(255), nullable=False, index=True)
+    phone = Column(String(20), nullable=False, index=True)
     address = Column(String(500), nullable=False)
-    issue = Column(String(100), nullable=False)
+    issue = Column(String(100), nullable=False, index=True)
     price = Column(Float, nullable=False)
-    created_at = Column(DateTime, default=datetime.now(timezone.utc))
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    
+    __table_args__ = (
+        # Serves created_at range scans and (created_at, id) keyset pagination
+        Index("ix_support_tickets_created_at_id", "created_at", "id"),
+        # Never hand out an ID again once its ticket has been archived and deleted
+        {"sqlite_autoincrement": True},
+    )
+    
+    def __repr__(self):
+        return f"<SupportTicket(id={self.id}, name='{self.name}', issue='{self.issue}')>"
+
+class TicketIdempotencyKey(Base):
+    __tablename__ = "ticket_idempotency_keys"
+    
+    # sha256 of (room, email, phone, issue); a repeated create_ticket maps to the same row
+    key = Column(String(64), primary_key=True)
+    room = Column(String(255), nullable=False, index=True)
+    ticket_id = Column(Integer, nullable=False, index=True)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    
+    def __repr__(self):
+        return f"<TicketIdempotencyKey(room='{self.room}', ticket_id={self.ticket_id})>"
+
+class TicketHourlyStats(Base):
+    __tablename__ = "ticket_hourly_stats"
+    
+    # One row per (UTC hour of created_at, issue), kept in step by every ticket write
+    hour = Column(DateTime, primary_key=True)
+    issue = Column(String(100), primary_key=True)
+    tickets = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)
+    
+    def __repr__(self):
+        return f"<TicketHourlyStats(hour={self.hour}, issue='{self.issue}', tickets={self.tickets})>"
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+    
+    # Written in the same transaction as its ticket; the email dispatcher sends and marks it
+    id = Column(Integer, primary_key=True)
+    ticket_id = Column(Integer, nullable=False, index=True)
+    recipient = Column(String(255), nullable=False)
+    subject = Column(String(255), nullable=False)
+    body = Column(Text, nullable=False)
+    status = Column(String(10), nullable=False, default="pending")  # "pending", "sent" or "failed"
+    attempts = Column(Integer, nullable=False, default=0)
+    # When the row is next due; claiming a row pushes it out by the lease, so a
+    # dispatcher that dies mid-send leaves it to be sent again
+    next_attempt_at = Column(DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    sent_at = Column(DateTime, nullable=True)
+    last_error = Column(String(500), nullable=True)
+    
+    __table_args__ = (
+        # Serves the dispatcher's "pending and due" claim query
+        Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+    
+    def __repr__(self):
+        return f"<EmailOutbox(id={self.id}, ticket_id={self.ticket_id}, status='{self.status}')>"
+
+class TicketArchiveFile(Base):
+    __tablename__ = "ticket_archive_files"
+    
+    # One Parquet file of tickets moved out of support_tickets by the retention job;
+    # get_ticket finds an archived ticket through the file's ID range
+    path = Column(String(500), primary_key=True)  # relative to TICKET_ARCHIVE_DIR
+    month = Column(String(7), nullable=False, index=True)  # UTC "YYYY-MM" of the tickets' created_at
+    first_id = Column(Integer, nullable=False)
+    last_id = Column(Integer, nullable=False)
+    tickets = Column(Integer, nullable=False)
+    archived_at = Column(DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    
+    __table_args__ = (
+        Index("ix_ticket_archive_files_first_id_last_id", "first_id", "last_id"),
+    )
     
     def __repr__(self):
-        return f"<SupportTicket(id={self.id}, name='{self.name}', issue='{self.issue}')>"
\ No newline at end of file
+        return f"<TicketArchiveFile(path='{self.path}', tickets={self.tickets})>"
@@ -0,0 +1,185 @@
+import asyncio
+import hashlib
+import logging
+import os
+import struct
+from collections import OrderedDict
+from typing import AsyncIterator, Iterable, Optional
+from livekit import rtc
+from livekit.agents.utils.audio import audio_frames_from_file
+from config import config
+
+logger = logging.getLogger("agent")
+
+_HEADER = struct.Struct("<4sII")
+_MAGIC = b"LKPC"
+_FRAME_MS = 20
+
+class CachedAudio:
+    """16-bit PCM for one utterance, replayable any number of times"""
+
+    __slots__ = ("pcm", "sample_rate", "num_channels")
+
+    def __init__(self, pcm: bytes, sample_rate: int, num_channels: int):
+        self.pcm = pcm
+        self.sample_rate = sample_rate
+        self.num_channels = num_channels
+
+    @classmethod
+    def from_frames(cls, frames: list[rtc.AudioFrame]) -> "CachedAudio":
+        first = frames[0]
+        return cls(b"".join(bytes(frame.data) for frame in frames), first.sample_rate, first.num_channels)
+
+    async def frames(self) -> AsyncIterator[rtc.AudioFrame]:
+        bytes_per_sample = 2 * self.num_channels
+        chunk = self.sample_rate * _FRAME_MS // 1000 * bytes_per_sample
+        for offset in range(0, len(self.pcm), chunk):
+            data = self.pcm[offset:offset + chunk]
+            yield rtc.AudioFrame(
+                data=data,
+                sample_rate=self.sample_rate,
+                num_channels=self.num_channels,
+                samples_per_channel=len(data) // bytes_per_sample,
+            )
+
+class PhraseAudioCache:
+    """Synthesized audio for fixed agent phrases, keyed by (voice, text, language).
+
+    Entries live in an LRU-bounded in-memory map backed by one PCM file per phrase
+    on disk, so a process only pays for TTS the first time a phrase is ever spoken.
+    ``get`` only looks in memory; coroutines reach the files through ``fetch`` and
+    ``store``, which do the disk I/O in a thread, and prewarm through ``load``.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = config.PHRASE_CACHE_DIR,
+        max_entries: int = config.PHRASE_CACHE_MAX_ENTRIES,
+    ):
+        self.directory = directory
+        self.max_entries = max(1, max_entries)
+        self._entries: OrderedDict[str, CachedAudio] = OrderedDict()
+        self._phrases: set[str] = set()
+
+    @staticmethod
+    def key(voice: str, text: str, language: str) -> str:
+        return hashlib.sha256(f"{voice}\0{language}\0{text}".encode()).hexdigest()
+
+    def _path(self, key: str) -> Optional[str]:
+        return os.path.join(self.directory, f"{key}.pcm") if self.directory else None
+
+    def register_phrases(self, phrases: Iterable[str]):
+        """Mark texts that tts_node may replace with cached audio"""
+        self._phrases.update(phrases)
+
+    @property
+    def phrases(self) -> set[str]:
+        return self._phrases
+
+    def get(self, voice: str, text: str, language: str) -> Optional[CachedAudio]:
+        """The phrase's audio if it is in memory; never touches the disk"""
+        key = self.key(voice, text, language)
+        audio = self._entries.get(key)
+        if audio is not None:
+            self._entries.move_to_end(key)
+        return audio
+
+    def _remember_read(self, key: str, audio: Optional[CachedAudio]) -> Optional[CachedAudio]:
+        if audio is not None:
+            self._remember(key, audio)
+        return audio
+
+    async def fetch(self, voice: str, text: str, language: str) -> Optional[CachedAudio]:
+        """Like ``get``, falling back to the phrase's file, read off the event loop"""
+        audio = self.get(voice, text, language)
+        if audio is None:
+            key = self.key(voice, text, language)
+            audio = self._remember_read(key, await asyncio.to_thread(self._read, key))
+        return audio
+
+    async def store(self, voice: str, text: str, language: str, audio: CachedAudio):
+        """Cache a phrase's audio in memory and write its file off the event loop"""
+        key = self.key(voice, text, language)
+        self._remember(key, audio)
+        await asyncio.to_thread(self._write, key, audio)
+
+    def load(self, voice: str, phrases: Iterable[str], language: str) -> int:
+        """Load already-synthesized phrases from disk, blocking; returns how many were found"""
+        found = 0
+        for text in phrases:
+            key = self.key(voice, text, language)
+            found += (self.get(voice, text, language) or self._remember_read(key, self._read(key))) is not None
+        return found
+
+    async def synthesize_missing(self, tts, voice: str, phrases: Iterable[str], language: str):
+        """Synthesize and store every phrase not cached yet"""
+        for text in phrases:
+            if await self.fetch(voice, text, language) is not None:
+                continue
+            try:
+                frames = []
+                async with tts.synthesize(text) as stream:
+                    async for ev in stream:
+                        frames.append(ev.frame)
+                if frames:
+                    await self.store(voice, text, language, CachedAudio.from_frames(frames))
+            except Exception as e:
+                logger.warning("Could not pre-synthesize phrase %r: %s", text, e)
+
+    async def load_file(self, path: str) -> Optional[CachedAudio]:
+        """Decode an audio file once and cache its PCM, keyed by path and mtime"""
+        try:
+            mtime = str(await asyncio.to_thread(os.path.getmtime, path))
+        except OSError:
+            return None
+        audio = await self.fetch("file", path, mtime)
+        if audio is None:
+            frames = [frame async for frame in audio_frames_from_file(path)]
+            if not frames:
+                return None
+            audio = CachedAudio.from_frames(frames)
+            await self.store("file", path, mtime, audio)
+        return audio
+
+    def _remember(self, key: str, audio: CachedAudio):
+        self._entries[key] = audio
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _read(self, key: str) -> Optional[CachedAudio]:
+        path = self._path(key)
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                magic, sample_rate, num_channels = _HEADER.unpack(f.read(_HEADER.size))
+                if magic != _MAGIC:
+                    return None
+                return CachedAudio(f.read(), sample_rate, num_channels)
+        except Exception as e:
+            logger.warning("Ignoring unreadable phrase cache file %s: %s", path, e)
+            return None
+
+    def _write(self, key: str, audio: CachedAudio):
+        path = self._path(key)
+        if not path:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(_HEADER.pack(_MAGIC, audio.sample_rate, audio.num_channels))
+                f.write(audio.pcm)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning("Could not persist phrase cache file %s: %s", path, e)
+
+_cache: Optional[PhraseAudioCache] = None
+
+def get_phrase_cache() -> PhraseAudioCache:
+    """Process-wide phrase cache"""
+    global _cache
+    if _cache is None:
+        _cache = PhraseAudioCache()
+    return _cache
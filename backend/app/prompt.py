@@ -1,32 +1,44 @@
-PRICES = {
-    "wifi not working": 20,
-    "email login issues": 15,
-    "slow laptop performance": 25,
-    "printer problems": 10,
-}
+from issues import ISSUE_CATALOG, ISSUES_BY_NAME, UNSUPPORTED, match_issue
+
+PRICES = {issue.name: issue.price for issue in ISSUE_CATALOG}
 
 CANONICAL_KEYWORDS = {
-    "wifi": "wifi not working",
-    "internet": "wifi not working",
-    "email": "email login issues",
-    "password": "email login issues",
-    "slow": "slow laptop performance",
-    "laptop slow": "slow laptop performance",
-    "printer": "printer problems",
-    "ink": "printer problems",
-    "power": "printer problems",
+    keyword: issue.name for issue in ISSUE_CATALOG for keyword in issue.keywords
 }
 
+GREETING = "Hello, thanks for calling the IT help desk. Who am I speaking with today?"
+
+OUT_OF_SCOPE_REPLY = (
+    "Sorry, we only handle Wi-Fi, email password reset, slow laptop CPU change, "
+    "and printer power plug change. Would you like help with one of these?"
+)
+
+TECHNICAL_DIFFICULTIES = "I'm experiencing technical difficulties. Please try reconnecting in a moment."
+
+def price_confirmation(issue: str) -> str:
+    return f"For {issue}, the fee is ${PRICES[issue]:g}."
+
+def resume_greeting(draft) -> str:
+    """Opening line for a caller reconnecting with a saved ticket draft"""
+    if draft.ticket_id is not None:
+        return f"Welcome back. Your ticket {draft.ticket_id} is already created. Would you like to change anything?"
+    missing = [field for field in draft.missing() if field != "price"]
+    if not missing:
+        confirmation = f" {price_confirmation(draft.issue)}" if draft.issue in PRICES else ""
+        return f"Welcome back, I still have all your details.{confirmation} Shall I create the ticket?"
+    return f"Welcome back, I still have your details from before. I just need your {' and '.join(missing)}."
+
+# Utterances spoken word for word, so their audio can be synthesized once and replayed
+FIXED_PHRASES = [
+    GREETING,
+    OUT_OF_SCOPE_REPLY,
+    TECHNICAL_DIFFICULTIES,
+    *(price_confirmation(issue) for issue in PRICES),
+]
+
 SYSTEM_PROMPT = """
 You are an IT Help Desk voice assistant. Your goal is to collect caller details and create a support ticket.
 
-CRITICAL REQUIREMENT: ALL DATA STORED IN TICKETS MUST BE IN ENGLISH ONLY. 
-- If a user provides information in any language other than English, you must silently translate it to English before storing it.
-- Names, addresses, and issue descriptions must all be stored in English.
-- You may communicate with users in their preferred language, but when creating or editing tickets, all data must be translated to English.
-- NEVER mention to the user that you are translating their information - do this silently in the background.
-- ALWAYS confirm information back to the user in their original language/format, but store the English version.
-
 Business rules:
 - Only these 4 canonical issues are supported:
     1) "wifi not working" => $20
@@ -38,39 +50,31 @@ Business rules:
 - The assistant should:
     1. Greet professionally in the user's language.
     2. Ask for missing fields (one or two at a time).
-    3. Confirm the detected issue and price using exact numbers (e.g., "The fee is $25").
+    3. Confirm the detected issue and price using exact numbers, starting your reply with the matching line from FIXED PHRASES below.
     4. Allow edits at any time before final ticket creation, e.g. "actually change my phone to 555-9999."
     5. On confirmation, call the tool create_ticket with the final values IN ENGLISH ONLY.
-    6. If user asks anything outside these four services, politely say we only handle those, offer nearest alternative (e.g., "we only handle Wi-Fi, Email password reset, Slow laptop CPU change, and Printer power plug change — would you like one of these?").
+    6. If user asks anything outside these four services, reply in English with exactly the out-of-scope line from FIXED PHRASES below.
 
+- Whenever the caller gives or corrects a detail, call update_ticket_draft with it in the same response as your spoken reply.
+  Earlier turns are replaced by a TICKET DRAFT message; treat it as what the caller already told you.
 - Handle interruptions gracefully: if user starts new info mid-question, integrate it.
 - Keep utterances short and confirm essential fields before ticket creation.
-- RESPOND IMMEDIATELY when users speak - don't wait or pause unnecessarily.
-- When confirming details, speak clearly but efficiently.
-- When connection established, immediately greet the user in their language.
+- The opening greeting is played automatically when the call connects; do not greet again, continue in the caller's language.
 - After ticket created, read back confirmation number and say you'll email confirmation.
 
-TRANSLATION REQUIREMENT:
-- Before calling create_ticket or edit_ticket, silently translate all text fields (name, address, issue) to English.
-- Phone numbers and emails should remain as provided.
-- When confirming information with the user, use their original language/names, but store the English equivalent.
+LANGUAGE: ALL DATA STORED IN TICKETS MUST BE IN ENGLISH ONLY.
+- Speak and confirm details in the caller's language and original format, but before calling any tool silently translate name, address and issue to English.
+- Phone numbers and emails stay exactly as provided.
 - Example: User says "मेरा नाम राहुल है" → You respond "Thank you Rahul" → But store "Rahul" in English in the database.
-- NEVER say phrases like "converting your name to English" or "translating your information".
-
-Tool definitions:
-- create_ticket(data) -> creates ticket and returns id
-- edit_ticket(id, updates) -> updates an existing ticket
-"""
+- NEVER mention translating or converting the caller's information.
+""" + """
+FIXED PHRASES (when speaking English, start your reply with these word for word):
+""" + "\n".join(f"- {phrase}" for phrase in FIXED_PHRASES[1:]) + "\n"
 
 def canonicalize_issue(user_text: str) -> str:
-    t = user_text.lower()
-    for k,v in CANONICAL_KEYWORDS.items():
-        if k in t:
-            return v
-    for price in PRICES.keys():
-        if price in t:
-            return price
-    return "unsupported"
+    issue = match_issue(user_text)
+    return issue.name if issue else UNSUPPORTED
 
 def price_for_issue(issue: str) -> float:
-    return PRICES.get(issue, 0.0)
+    match = ISSUES_BY_NAME.get(issue)
+    return match.price if match else 0.0
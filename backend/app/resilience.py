@@ -0,0 +1,522 @@
+import asyncio
+import dataclasses
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+from livekit.agents import (
+    DEFAULT_API_CONNECT_OPTIONS,
+    APIConnectionError,
+    APIConnectOptions,
+    APIError,
+    llm,
+    metrics,
+    stt,
+    tts,
+    utils,
+)
+from config import config
+from latency_metrics import PROVIDER_CIRCUIT_OPEN, PROVIDER_FAILURES
+
+logger = logging.getLogger("agent")
+
+# Hedging and fallback replace per-provider retries
+HEDGED_API_CONNECT_OPTIONS = APIConnectOptions(max_retry=0, timeout=DEFAULT_API_CONNECT_OPTIONS.timeout)
+
+class BreakerStore:
+    """Circuit breaker state in a local SQLite file, shared by every job process on the machine.
+
+    Each call runs in its own job process, so breakers kept in memory would start
+    closed for every caller and never see another call's failures. Transitions run
+    in ``BEGIN IMMEDIATE`` transactions, so concurrent processes lose no failures.
+    Store calls go through ``submit``, one at a time on a background thread, so a
+    busy file never blocks the event loop that plays the caller's audio.
+    """
+
+    def __init__(self, path: str = config.BREAKER_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="breaker-store")
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS breakers "
+                "(name TEXT PRIMARY KEY, state TEXT NOT NULL, failures INTEGER NOT NULL, opened_at REAL NOT NULL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def _row(self, conn: sqlite3.Connection, name: str) -> tuple[str, int, float]:
+        row = conn.execute("SELECT state, failures, opened_at FROM breakers WHERE name = ?", (name,)).fetchone()
+        return tuple(row) if row else (CircuitBreaker.CLOSED, 0, 0.0)
+
+    def read(self, name: str) -> tuple[str, int, float]:
+        """A breaker's (state, consecutive failures, opened_at)"""
+        with self._lock:
+            return self._row(self._connect(), name)
+
+    def update(self, name: str, transition) -> tuple[str, int, float]:
+        """Replace a breaker's row with ``transition(state, failures, opened_at)`` atomically"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._row(conn, name)
+                new = transition(*row)
+                if new != row:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO breakers (name, state, failures, opened_at) VALUES (?, ?, ?, ?)",
+                        (name, *new),
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return new
+
+    def submit(self, fn, *args) -> Future:
+        """Run ``fn(*args)`` on the store's thread, after every call submitted before it"""
+        return self._executor.submit(fn, *args)
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker for one provider, shared through a BreakerStore.
+
+    Closed, requests go through. After ``failure_threshold`` consecutive failures
+    (errors, or calls slower than the provider's latency budget) in any job process
+    it opens and the provider is skipped for ``recovery_timeout`` seconds. It then
+    half-opens: the next requests probe the provider, and the first outcome closes
+    or re-opens the circuit. If the store cannot be read, requests go through.
+
+    Checks read an in-memory copy of the shared state, re-read in the background
+    once it is ``refresh_interval`` seconds old; outcomes are written in the
+    background and the copy is updated from the result.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        store: Optional[BreakerStore] = None,
+        failure_threshold: int = config.BREAKER_FAILURE_THRESHOLD,
+        recovery_timeout: float = config.BREAKER_RECOVERY_SECONDS,
+        refresh_interval: float = config.BREAKER_REFRESH_SECONDS,
+        clock=time.time,
+    ):
+        self.name = name
+        self.store = store or get_breaker_store()
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_timeout = recovery_timeout
+        self.refresh_interval = refresh_interval
+        self._clock = clock
+        self._snapshot: tuple[str, int, float] = (self.CLOSED, 0, 0.0)
+        self._read_at = -math.inf
+        self._refreshing = False
+        # Read the shared state now, before the session's first request
+        self._refresh_soon()
+
+    def _observed(self, state: str) -> str:
+        PROVIDER_CIRCUIT_OPEN.labels(self.name).set(1 if state == self.OPEN else 0)
+        return state
+
+    def _due(self, state: str, opened_at: float) -> bool:
+        return state == self.OPEN and self._clock() - opened_at >= self.recovery_timeout
+
+    def _refresh_soon(self):
+        if not self._refreshing:
+            self._refreshing = True
+            self.store.submit(self._refresh)
+
+    def _refresh(self):
+        try:
+            self._snapshot = self.store.read(self.name)
+        except sqlite3.Error as e:
+            logger.warning("Breaker store unavailable, allowing %s: %s", self.name, e)
+            self._snapshot = (self.CLOSED, 0, 0.0)
+        self._read_at = self._clock()
+        self._refreshing = False
+        self._observed(self._snapshot[0])
+
+    def _write(self, transition):
+        try:
+            self._snapshot = self.store.update(self.name, transition)
+        except sqlite3.Error as e:
+            logger.warning("Breaker store unavailable, not recording an outcome for %s: %s", self.name, e)
+            return
+        self._read_at = self._clock()
+        self._observed(self._snapshot[0])
+
+    def _half_open(self, state: str, failures: int, opened_at: float) -> tuple[str, int, float]:
+        if self._due(state, opened_at):
+            logger.info("Circuit for %s half-open, probing", self.name)
+            state = self.HALF_OPEN
+        return state, failures, opened_at
+
+    @property
+    def state(self) -> str:
+        """The circuit's state as last read or written, without waiting on the store"""
+        if self._clock() - self._read_at >= self.refresh_interval:
+            self._refresh_soon()
+        state, failures, opened_at = self._snapshot
+        if self._due(state, opened_at):
+            # Probe now; the store records the transition unless another process already did
+            self._snapshot = state, failures, opened_at = self.HALF_OPEN, failures, opened_at
+            self.store.submit(self._write, self._half_open)
+        return self._observed(state)
+
+    def allow(self) -> bool:
+        """Whether a request may go to this provider now"""
+        return self.state != self.OPEN
+
+    def _close(self, state: str, failures: int, opened_at: float) -> tuple[str, int, float]:
+        # A success that started before the circuit opened says nothing about recovery
+        if state == self.OPEN:
+            return state, failures, opened_at
+        if state == self.HALF_OPEN:
+            logger.info("Circuit for %s closed", self.name)
+        return self.CLOSED, 0, opened_at
+
+    def _fail(self, state: str, failures: int, opened_at: float) -> tuple[str, int, float]:
+        state = self._half_open(state, failures, opened_at)[0]
+        if state == self.OPEN:
+            return state, failures, opened_at
+        failures += 1
+        if state == self.HALF_OPEN:
+            logger.warning("Circuit for %s re-opened, probe failed", self.name)
+        elif failures >= self.failure_threshold:
+            logger.warning(
+                "Circuit for %s open after %d failures, skipping it for %gs",
+                self.name, failures, self.recovery_timeout,
+            )
+        else:
+            return state, failures, opened_at
+        return self.OPEN, failures, self._clock()
+
+    def record_success(self):
+        # Nearly every call succeeds on a closed circuit; that needs no write
+        if self._snapshot[:2] != (self.CLOSED, 0):
+            self.store.submit(self._write, self._close)
+
+    def record_failure(self):
+        PROVIDER_FAILURES.labels(self.name).inc()
+        self.store.submit(self._write, self._fail)
+
+_store: Optional[BreakerStore] = None
+_breakers: dict[str, CircuitBreaker] = {}
+
+def get_breaker_store() -> BreakerStore:
+    """Process-wide breaker store at BREAKER_STORE_PATH"""
+    global _store
+    if _store is None:
+        _store = BreakerStore()
+    return _store
+
+def provider_name(instance) -> str:
+    """Breaker key for a provider client, e.g. "openai/gpt-4o-mini" """
+    return f"{instance.provider}/{instance.model}"
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Breaker for a provider; its state is shared by every job process on the host"""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        breaker = _breakers[name] = CircuitBreaker(name)
+    return breaker
+
+class CircuitOpenError(APIConnectionError):
+    """Raised instead of calling a provider whose circuit is open, so a fallback chain moves on"""
+
+class _Gated:
+    """Shared parts of the breaker-gated provider wrappers below"""
+
+    def _wrap(self, instance, breaker: CircuitBreaker):
+        self.instance = instance
+        self.breaker = breaker
+        self._label = instance.label
+        instance.on("metrics_collected", self._on_metrics_collected)
+
+    @property
+    def model(self) -> str:
+        return self.instance.model
+
+    @property
+    def provider(self) -> str:
+        return self.instance.provider
+
+    def _check(self):
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"circuit open for {self.breaker.name}", retryable=False)
+
+    def _on_metrics_collected(self, *args, **kwargs):
+        self.emit("metrics_collected", *args, **kwargs)
+
+    def prewarm(self):
+        self.instance.prewarm()
+
+    async def aclose(self):
+        self.instance.off("metrics_collected", self._on_metrics_collected)
+
+class _GatedLLM(_Gated, llm.LLM):
+    """An LLM that fails at once while its provider's circuit is open"""
+
+    def __init__(self, instance: llm.LLM, breaker: CircuitBreaker):
+        super().__init__()
+        self._wrap(instance, breaker)
+
+    def chat(self, **kwargs) -> llm.LLMStream:
+        self._check()
+        return self.instance.chat(**kwargs)
+
+class _GatedSTT(_Gated, stt.STT):
+    """An STT that fails at once while its provider's circuit is open"""
+
+    def __init__(self, instance: stt.STT, breaker: CircuitBreaker):
+        super().__init__(capabilities=instance.capabilities)
+        self._wrap(instance, breaker)
+
+    async def recognize(self, buffer, **kwargs) -> stt.SpeechEvent:
+        self._check()
+        return await self.instance.recognize(buffer, **kwargs)
+
+    async def _recognize_impl(self, buffer, **kwargs) -> stt.SpeechEvent:
+        return await self.recognize(buffer, **kwargs)
+
+    def stream(self, **kwargs) -> stt.RecognizeStream:
+        self._check()
+        return self.instance.stream(**kwargs)
+
+class _GatedTTS(_Gated, tts.TTS):
+    """A TTS that fails at once while its provider's circuit is open"""
+
+    def __init__(self, instance: tts.TTS, breaker: CircuitBreaker):
+        super().__init__(
+            capabilities=instance.capabilities, sample_rate=instance.sample_rate, num_channels=instance.num_channels
+        )
+        self._wrap(instance, breaker)
+
+    def synthesize(self, text: str, **kwargs) -> tts.ChunkedStream:
+        self._check()
+        return self.instance.synthesize(text, **kwargs)
+
+    def stream(self, **kwargs) -> tts.SynthesizeStream:
+        self._check()
+        return self.instance.stream(**kwargs)
+
+def watch_outcomes(instance, breaker: CircuitBreaker, budget: Optional[float] = None):
+    """Record a provider's failed calls, and with ``budget`` its over-budget first token/byte, on its breaker"""
+
+    def on_error(ev):
+        # Errors that will be retried are not the call's outcome yet
+        if not ev.recoverable:
+            breaker.record_failure()
+
+    def on_metrics(m):
+        if isinstance(m, metrics.STTMetrics):
+            breaker.record_success()
+            return
+        if isinstance(m, metrics.LLMMetrics):
+            latency = m.ttft
+        elif isinstance(m, metrics.TTSMetrics):
+            latency = m.ttfb
+        else:
+            return
+        if m.cancelled or latency < 0:
+            return
+        if budget and latency > budget:
+            logger.warning("%s slow: first response after %.2fs", breaker.name, latency)
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
+    instance.on("error", on_error)
+    instance.on("metrics_collected", on_metrics)
+
+def with_breakers(instances: list, budget: Optional[float] = None) -> list:
+    """The instances for a FallbackAdapter, each gated by and reporting to its provider's breaker"""
+    gated = []
+    for instance in instances:
+        breaker = get_breaker(provider_name(instance))
+        watch_outcomes(instance, breaker, budget)
+        if isinstance(instance, llm.LLM):
+            gated.append(_GatedLLM(instance, breaker))
+        elif isinstance(instance, stt.STT):
+            gated.append(_GatedSTT(instance, breaker))
+        else:
+            gated.append(_GatedTTS(instance, breaker))
+    return gated
+
+class HedgedTTS(tts.TTS):
+    """Non-streaming TTS that races the next provider when the current one is slow to start.
+
+    Providers are tried in order, skipping those whose breaker is open. If no audio
+    has arrived ``hedge_after`` seconds after a request starts, the next provider
+    gets the same text; the first to produce audio is played and the others are
+    cancelled. A provider that errors hands over to the next one at once. The
+    session wraps it in a StreamAdapter, so each sentence is hedged separately.
+    """
+
+    def __init__(self, instances: list[tts.TTS], hedge_after: float):
+        if not instances:
+            raise ValueError("at least one TTS instance must be provided")
+        if len({(t.sample_rate, t.num_channels) for t in instances}) != 1:
+            raise ValueError("hedged TTS instances must share a sample rate and channel count")
+        super().__init__(
+            capabilities=tts.TTSCapabilities(streaming=False),
+            sample_rate=instances[0].sample_rate,
+            num_channels=instances[0].num_channels,
+        )
+        self.instances = instances
+        self.hedge_after = hedge_after
+        self.hedges = 0
+        for instance in instances:
+            instance.on("metrics_collected", self._on_metrics_collected)
+
+    @property
+    def model(self) -> str:
+        return self.instances[0].model
+
+    @property
+    def provider(self) -> str:
+        return self.instances[0].provider
+
+    def _on_metrics_collected(self, *args, **kwargs):
+        self.emit("metrics_collected", *args, **kwargs)
+
+    def synthesize(
+        self, text: str, *, conn_options: APIConnectOptions = HEDGED_API_CONNECT_OPTIONS
+    ) -> "HedgedChunkedStream":
+        return HedgedChunkedStream(tts=self, input_text=text, conn_options=conn_options)
+
+    async def aclose(self):
+        for instance in self.instances:
+            instance.off("metrics_collected", self._on_metrics_collected)
+
+class _Attempt:
+    """One provider's synthesis of the text, buffering frames until it wins or is cancelled"""
+
+    def __init__(self, instance: tts.TTS, text: str, conn_options: APIConnectOptions):
+        self.instance = instance
+        self.breaker = get_breaker(provider_name(instance))
+        self.started = time.perf_counter()
+        self.first_audio = asyncio.get_running_loop().create_future()
+        self.frames: asyncio.Queue = asyncio.Queue()
+        self.task = asyncio.create_task(self._run(text, conn_options))
+
+    async def _run(self, text: str, conn_options: APIConnectOptions):
+        try:
+            async with self.instance.synthesize(text, conn_options=conn_options) as stream:
+                async for audio in stream:
+                    if not self.first_audio.done():
+                        self.first_audio.set_result(time.perf_counter() - self.started)
+                    self.frames.put_nowait(audio.frame)
+            if not self.first_audio.done():
+                raise APIError(f"no audio from {self.breaker.name}")
+            self.frames.put_nowait(None)
+        except Exception as e:
+            if self.first_audio.done():
+                self.frames.put_nowait(e)
+            else:
+                self.first_audio.set_exception(e)
+
+class HedgedChunkedStream(tts.ChunkedStream):
+    def __init__(self, *, tts: HedgedTTS, input_text: str, conn_options: APIConnectOptions):
+        super().__init__(tts=tts, input_text=input_text, conn_options=conn_options)
+        self._hedged = tts
+
+    async def _metrics_monitor_task(self, event_aiter):
+        # The providers report their own metrics, forwarded by HedgedTTS
+        async for _ in event_aiter:
+            pass
+
+    async def _race(self) -> _Attempt:
+        hedged = self._hedged
+        waiting = [t for t in hedged.instances if get_breaker(provider_name(t)).allow()] or list(hedged.instances)
+        attempt_options = dataclasses.replace(self._conn_options, max_retry=0)
+        attempts: list[_Attempt] = []
+        hedge_due = True
+        while True:
+            racing = [a for a in attempts if not a.first_audio.done()]
+            if waiting and (hedge_due or not racing):
+                if racing:
+                    hedged.hedges += 1
+                    logger.info("%s slow to start, hedging with %s", racing[-1].breaker.name, provider_name(waiting[0]))
+                attempts.append(_Attempt(waiting.pop(0), self._input_text, attempt_options))
+                racing.append(attempts[-1])
+            if not racing:
+                raise APIConnectionError(f"all TTS providers failed: {[a.breaker.name for a in attempts]}")
+
+            done, _ = await asyncio.wait(
+                [a.first_audio for a in racing],
+                timeout=hedged.hedge_after if waiting else None,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            hedge_due = not done
+            for attempt in racing:
+                if attempt.first_audio.done() and attempt.first_audio.exception() is not None:
+                    logger.warning("%s failed: %s", attempt.breaker.name, attempt.first_audio.exception())
+                    attempt.breaker.record_failure()
+            winners = [a for a in racing if a.first_audio.done() and a.first_audio.exception() is None]
+            if winners:
+                winner = winners[0]
+                for attempt in attempts:
+                    if attempt is not winner and not attempt.first_audio.done():
+                        attempt.task.cancel()
+                        attempt.breaker.record_failure()
+                if winner.first_audio.result() <= hedged.hedge_after:
+                    winner.breaker.record_success()
+                else:
+                    winner.breaker.record_failure()
+                return winner
+
+    async def _run(self, output_emitter: tts.AudioEmitter):
+        output_emitter.initialize(
+            request_id=utils.shortuuid(),
+            sample_rate=self._hedged.sample_rate,
+            num_channels=self._hedged.num_channels,
+            mime_type="audio/pcm",
+        )
+        winner = await self._race()
+        try:
+            while (frame := await winner.frames.get()) is not None:
+                if isinstance(frame, Exception):
+                    # Audio already reached the caller; a second voice mid-sentence is worse
+                    winner.breaker.record_failure()
+                    raise APIConnectionError(f"{winner.breaker.name} failed mid-sentence") from frame
+                output_emitter.push_frame(frame)
+        finally:
+            winner.task.cancel()
+
+def build_llm(primary: llm.LLM, fallbacks: list[llm.LLM]) -> llm.LLM:
+    """The primary LLM, or a breaker-backed fallback chain when fallbacks are configured"""
+    if not fallbacks:
+        return primary
+    instances = [primary, *fallbacks]
+    return llm.FallbackAdapter(
+        with_breakers(instances, budget=config.LLM_SLOW_TTFT_SECONDS), attempt_timeout=config.LLM_ATTEMPT_TIMEOUT
+    )
+
+def build_stt(primary: stt.STT, fallbacks: list[stt.STT], vad) -> stt.STT:
+    """The primary STT, or a breaker-backed fallback chain; non-streaming fallbacks use the VAD"""
+    if not fallbacks:
+        return primary
+    instances = [primary, *fallbacks]
+    return stt.FallbackAdapter(with_breakers(instances), vad=vad)
+
+def build_tts(primary: tts.TTS, fallbacks: list[tts.TTS]) -> tts.TTS:
+    """The primary TTS, a hedged chain when TTS_HEDGE_MS is set, else a breaker-backed fallback chain"""
+    if not fallbacks:
+        return primary
+    instances = [primary, *fallbacks]
+    if config.TTS_HEDGE_MS > 0:
+        return HedgedTTS(instances, hedge_after=config.TTS_HEDGE_MS / 1000)
+    return tts.FallbackAdapter(with_breakers(instances, budget=config.TTS_SLOW_TTFB_SECONDS), max_retry_per_tts=0)
@@ -0,0 +1,301 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import zlib
+from dataclasses import dataclass
+from typing import AsyncIterable, Callable, Optional
+import numpy as np
+from livekit.agents import llm
+from config import config
+from latency_metrics import RESPONSE_CACHE_LOOKUPS
+from ticket_draft import EMAIL_PATTERN, PHONE_PATTERN
+
+logger = logging.getLogger("agent")
+
+# Dropped before matching; they don't change what the caller is asking
+FILLER_WORDS = frozenset({"um", "uh", "uhm", "hmm", "er", "ah", "oh", "hi", "hey", "hello", "ok", "okay", "so", "well", "please"})
+# Answers to the agent's last question; their reply depends on what was asked
+CONTEXTUAL_WORDS = frozenset({
+    "yes", "yeah", "yep", "no", "nope", "sure", "correct", "right", "that", "thats", "it", "its", "is",
+    "fine", "go", "ahead", "do", "sounds", "good", "great",
+})
+# Point back at something said earlier ("how much is it going to cost?")
+REFERRING_WORDS = frozenset({"it", "its", "that", "thats", "this", "these", "those", "they", "them", "one"})
+VECTOR_DIMS = 512
+
+def normalize_utterance(text: str) -> str:
+    """Lowercased words without punctuation or filler words"""
+    text = unicodedata.normalize("NFKC", text).lower().replace("'", "")
+    words = re.findall(r"\w+", text)
+    return " ".join(word for word in words if word not in FILLER_WORDS)
+
+def cacheable_utterance(normalized: str, min_words: int = config.RESPONSE_CACHE_MIN_WORDS) -> bool:
+    """Whether a reply to this could be reused: long enough, not just a yes/no, and no contact details"""
+    words = normalized.split()
+    if len(words) < min_words or all(word in CONTEXTUAL_WORDS for word in words):
+        return False
+    return sum(ch.isdigit() for ch in normalized) < 3
+
+def refers_back(normalized: str) -> bool:
+    return any(word in REFERRING_WORDS for word in normalized.split())
+
+def utterance_vector(normalized: str, dims: int = VECTOR_DIMS) -> np.ndarray:
+    """Unit-length hashed vector of the utterance's words and character trigrams"""
+    vector = np.zeros(dims, dtype=np.float32)
+    padded = f" {normalized} "
+    grams = normalized.split() + [padded[i:i + 3] for i in range(len(padded) - 2)]
+    for gram in grams:
+        h = zlib.crc32(gram.encode())
+        # The sign bit spreads hash collisions around zero instead of adding them up
+        vector[h % dims] += 1.0 if h & 0x80000000 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+def last_user_utterance(chat_ctx: llm.ChatContext) -> Optional[str]:
+    """The caller's message this request answers, or None when it follows a tool result"""
+    items = chat_ctx.items
+    if not items or items[-1].type != "message" or items[-1].role != "user":
+        return None
+    return items[-1].text_content
+
+@dataclass
+class CachedReply:
+    reply: str
+    kind: str  # "exact" or "similar"
+    similarity: float = 1.0
+
+class ResponseCache:
+    """Plain-text LLM replies keyed on the caller's normalized utterance and the agent state.
+
+    Kept in a SQLite file so every job process on the host shares it (each call runs
+    in its own process). A reply is only cached once ``min_sessions`` different calls
+    got the same reply for the same key, so replies carrying one caller's details
+    never reach another. Turns that made tool calls are never offered to the cache.
+
+    Lookups try the exact key, then (when ``similarity`` > 0) the nearest cached
+    utterance in the same state by cosine similarity of hashed n-gram vectors.
+    Entries expire after ``ttl`` seconds and the least recently used are evicted
+    past ``max_entries``.
+    """
+
+    def __init__(
+        self,
+        path: str = config.RESPONSE_CACHE_PATH,
+        ttl: float = config.RESPONSE_CACHE_TTL_SECONDS,
+        max_entries: int = config.RESPONSE_CACHE_MAX_ENTRIES,
+        min_sessions: int = config.RESPONSE_CACHE_MIN_SESSIONS,
+        similarity: float = config.RESPONSE_CACHE_SIMILARITY,
+        index_seconds: float = config.RESPONSE_CACHE_INDEX_SECONDS,
+        clock=time.time,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.min_sessions = max(1, min_sessions)
+        self.similarity = similarity
+        self.index_seconds = index_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pending: set[asyncio.Task] = set()
+        # Similarity index: one row per cached entry, reloaded every ``index_seconds``
+        self._index_keys: list[str] = []
+        self._index_states: np.ndarray = np.array([], dtype=object)
+        self._index_vectors = np.zeros((0, VECTOR_DIMS), dtype=np.float32)
+        self._index_loaded_at: Optional[float] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, state TEXT NOT NULL, utterance TEXT NOT NULL, reply TEXT NOT NULL, "
+                "vector BLOB NOT NULL, created_at REAL NOT NULL, used_at REAL NOT NULL, hits INTEGER NOT NULL);"
+                "CREATE INDEX IF NOT EXISTS ix_responses_used_at ON responses (used_at);"
+                "CREATE TABLE IF NOT EXISTS response_sightings "
+                "(key TEXT NOT NULL, reply_hash TEXT NOT NULL, session TEXT NOT NULL, seen_at REAL NOT NULL, "
+                "PRIMARY KEY (key, reply_hash, session));"
+            )
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def key(state: str, normalized: str) -> str:
+        return hashlib.sha256(f"{state}\n{normalized}".encode()).hexdigest()
+
+    def _load_index(self, conn: sqlite3.Connection, now: float):
+        rows = conn.execute(
+            "SELECT key, state, vector FROM responses WHERE created_at >= ?", (now - self.ttl,)
+        ).fetchall()
+        self._index_keys = [row[0] for row in rows]
+        self._index_states = np.array([row[1] for row in rows], dtype=object)
+        self._index_vectors = (
+            np.frombuffer(b"".join(row[2] for row in rows), dtype=np.float32).reshape(len(rows), VECTOR_DIMS)
+            if rows else np.zeros((0, VECTOR_DIMS), dtype=np.float32)
+        )
+        self._index_loaded_at = now
+
+    def _nearest(self, state: str, normalized: str) -> tuple[Optional[str], float]:
+        """Key and similarity of the closest indexed utterance in ``state``"""
+        if not self._index_keys:
+            return None, 0.0
+        scores = self._index_vectors @ utterance_vector(normalized)
+        scores[self._index_states != state] = -1.0
+        best = int(np.argmax(scores))
+        return self._index_keys[best], float(scores[best])
+
+    def _lookup(self, state: str, normalized: str) -> Optional[CachedReply]:
+        now = self._clock()
+        with self._lock:
+            conn = self._connect()
+            key, kind, score = self.key(state, normalized), "exact", 1.0
+            row = conn.execute(
+                "SELECT reply FROM responses WHERE key = ? AND created_at >= ?", (key, now - self.ttl)
+            ).fetchone()
+            if row is None and self.similarity > 0:
+                if self._index_loaded_at is None or now - self._index_loaded_at >= self.index_seconds:
+                    self._load_index(conn, now)
+                key, score = self._nearest(state, normalized)
+                if key is None or score < self.similarity:
+                    return None
+                kind = "similar"
+                row = conn.execute(
+                    "SELECT reply FROM responses WHERE key = ? AND created_at >= ?", (key, now - self.ttl)
+                ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE responses SET used_at = ?, hits = hits + 1 WHERE key = ?", (now, key))
+        return CachedReply(row[0], kind, score)
+
+    def _record(self, state: str, normalized: str, reply: str, session: str) -> bool:
+        now = self._clock()
+        key = self.key(state, normalized)
+        reply_hash = hashlib.sha256(" ".join(reply.lower().split()).encode()).hexdigest()
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO response_sightings (key, reply_hash, session, seen_at) VALUES (?, ?, ?, ?)",
+                    (key, reply_hash, session, now),
+                )
+                sessions = conn.execute(
+                    "SELECT COUNT(*) FROM response_sightings WHERE key = ? AND reply_hash = ? AND seen_at >= ?",
+                    (key, reply_hash, now - self.ttl),
+                ).fetchone()[0]
+                stored = sessions >= self.min_sessions
+                if stored:
+                    vector = utterance_vector(normalized)
+                    conn.execute(
+                        "INSERT INTO responses (key, state, utterance, reply, vector, created_at, used_at, hits) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, 0) ON CONFLICT (key) DO UPDATE SET "
+                        "reply = excluded.reply, created_at = excluded.created_at, used_at = excluded.used_at",
+                        (key, state, normalized, reply, vector.tobytes(), now, now),
+                    )
+                    self._evict(conn, now)
+                    if self._index_loaded_at is not None and key not in self._index_keys:
+                        self._index_keys.append(key)
+                        self._index_states = np.append(self._index_states, np.array([state], dtype=object))
+                        self._index_vectors = np.vstack([self._index_vectors, vector])
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return stored
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+        conn.execute("DELETE FROM response_sightings WHERE seen_at < ?", (now - self.ttl,))
+        conn.execute(
+            "DELETE FROM responses WHERE key IN "
+            "(SELECT key FROM responses ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def warm(self):
+        """Open the file and load the similarity index, e.g. in a prewarmed job process"""
+        with self._lock:
+            conn = self._connect()
+            if self.similarity > 0:
+                self._load_index(conn, self._clock())
+
+    async def lookup(self, state: str, normalized: str) -> Optional[CachedReply]:
+        return await asyncio.to_thread(self._lookup, state, normalized)
+
+    async def record(self, state: str, normalized: str, reply: str, session: str) -> bool:
+        """Note that ``session`` got ``reply``; returns True once it is cached"""
+        return await asyncio.to_thread(self._record, state, normalized, reply, session)
+
+    async def serve(
+        self,
+        state: Optional[str],
+        chat_ctx: llm.ChatContext,
+        session: str,
+        generate: Callable[[], AsyncIterable],
+    ) -> AsyncIterable:
+        """An llm_node stream: the cached reply for the caller's last message, or ``generate()``'s
+        chunks, offered to the cache afterwards unless they contained a tool call.
+
+        A ``state`` of None bypasses the cache for this turn.
+        """
+        utterance = last_user_utterance(chat_ctx) if state is not None else None
+        normalized = normalize_utterance(utterance) if utterance else ""
+        if not normalized or not cacheable_utterance(normalized):
+            RESPONSE_CACHE_LOOKUPS.labels(result="skipped").inc()
+            async for chunk in generate():
+                yield chunk
+            return
+
+        try:
+            cached = await self.lookup(state, normalized)
+        except sqlite3.Error as e:
+            logger.warning("Response cache lookup failed: %s", e)
+            cached = None
+        if cached is not None:
+            RESPONSE_CACHE_LOOKUPS.labels(result=cached.kind).inc()
+            yield cached.reply
+            return
+        RESPONSE_CACHE_LOOKUPS.labels(result="miss").inc()
+
+        text, cacheable = [], True
+        async for chunk in generate():
+            if isinstance(chunk, str):
+                text.append(chunk)
+            elif isinstance(chunk, llm.ChatChunk) and chunk.delta is not None:
+                if chunk.delta.tool_calls:
+                    cacheable = False
+                text.append(chunk.delta.content or "")
+            elif not isinstance(chunk, llm.ChatChunk):
+                cacheable = False
+            yield chunk
+
+        reply = "".join(text).strip()
+        # Contact details in a reply are one caller's, however many calls agree on them
+        if cacheable and reply and not EMAIL_PATTERN.search(reply) and not PHONE_PATTERN.search(reply):
+            task = asyncio.create_task(self._record_quietly(state, normalized, reply, session))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+
+    async def _record_quietly(self, state: str, normalized: str, reply: str, session: str):
+        try:
+            await self.record(state, normalized, reply, session)
+        except sqlite3.Error as e:
+            logger.warning("Could not record reply in the response cache: %s", e)
+
+_cache: Optional[ResponseCache] = None
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Process-wide response cache at RESPONSE_CACHE_PATH, or None when RESPONSE_CACHE is off"""
+    global _cache
+    if _cache is None and config.RESPONSE_CACHE:
+        _cache = ResponseCache()
+    return _cache
@@ -0,0 +1,124 @@
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from multiprocessing.connection import wait
+from typing import Callable, Optional
+
+logger = logging.getLogger("supervisor")
+
+class ChildSpec:
+    """One supervised process: what to run and how long it may take to stop"""
+
+    def __init__(self, name: str, target: Callable, args: tuple = (), stop_timeout: float = 10.0):
+        self.name = name
+        self.target = target
+        self.args = args
+        self.stop_timeout = stop_timeout
+        self.process: Optional[multiprocessing.Process] = None
+        self.started_at = 0.0
+        self.failures = 0
+        self.restart_at: Optional[float] = None
+
+def _run_child(target: Callable, args: tuple):
+    # Ctrl+C goes to the whole foreground process group; leave the services out of it
+    # (uvicorn and the LiveKit CLI install their own SIGINT handlers, which would skip
+    # the drain) so they only stop on the SIGTERM the supervisor forwards.
+    os.setpgrp()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Forked children inherit the supervisor's handler; give the service its own
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    target(*args)
+
+class Supervisor:
+    """Keeps a set of child processes running, restarting crashed ones with backoff.
+
+    On SIGTERM or SIGINT every child is sent SIGTERM and given its ``stop_timeout``
+    to drain (agent workers finish in-flight calls) before its whole process group
+    is killed.
+    """
+
+    def __init__(
+        self,
+        children: list[ChildSpec],
+        backoff_initial: float = 1.0,
+        backoff_max: float = 30.0,
+        stable_after: float = 60.0,
+    ):
+        self.children = children
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.stable_after = stable_after
+        self._stopping = False
+
+    def _start(self, child: ChildSpec):
+        child.process = multiprocessing.Process(
+            target=_run_child, args=(child.target, child.args), name=child.name
+        )
+        child.process.start()
+        child.started_at = time.monotonic()
+        child.restart_at = None
+        logger.info("Started %s (pid %s)", child.name, child.process.pid)
+
+    def _kill_group(self, child: ChildSpec):
+        """SIGKILL whatever is left of the child's process group (job processes, uvicorn workers)"""
+        try:
+            os.killpg(child.process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    def _backoff(self, child: ChildSpec) -> float:
+        if time.monotonic() - child.started_at >= self.stable_after:
+            child.failures = 0
+        child.failures += 1
+        return min(self.backoff_initial * 2 ** (child.failures - 1), self.backoff_max)
+
+    def _handle_signal(self, signum, frame):
+        if not self._stopping:
+            logger.info("Received %s, draining children", signal.Signals(signum).name)
+        self._stopping = True
+
+    def run(self):
+        """Start every child and supervise until a stop signal arrives"""
+        signal.signal(signal.SIGTERM, self._handle_signal)
+        signal.signal(signal.SIGINT, self._handle_signal)
+        for child in self.children:
+            self._start(child)
+
+        while not self._stopping:
+            now = time.monotonic()
+            for child in self.children:
+                if child.restart_at is not None:
+                    if now >= child.restart_at:
+                        self._start(child)
+                elif not child.process.is_alive():
+                    self._kill_group(child)
+                    delay = self._backoff(child)
+                    child.restart_at = now + delay
+                    logger.warning(
+                        "%s exited with code %s, restarting in %.1fs", child.name, child.process.exitcode, delay
+                    )
+            sentinels = [c.process.sentinel for c in self.children if c.restart_at is None]
+            pending = [c.restart_at - now for c in self.children if c.restart_at is not None]
+            wait(sentinels, timeout=max(0.0, min([0.5] + pending)))
+
+        self.shutdown()
+
+    def shutdown(self):
+        """Ask every child to stop, then kill whatever outlives its stop timeout"""
+        running = [c for c in self.children if c.process is not None and c.process.is_alive()]
+        # Only the service itself: it stops its own workers, and LiveKit job processes
+        # end on SIGTERM, which would cut off the calls the drain is waiting for
+        for child in running:
+            os.kill(child.process.pid, signal.SIGTERM)
+
+        deadlines = {child.name: time.monotonic() + child.stop_timeout for child in running}
+        for child in running:
+            child.process.join(max(0.0, deadlines[child.name] - time.monotonic()))
+            if child.process.is_alive():
+                logger.warning("%s did not stop within %.0fs, killing it", child.name, child.stop_timeout)
+            # Each child leads its own process group; leave nothing of it orphaned
+            self._kill_group(child)
+            child.process.join()
+        logger.info("All services stopped")
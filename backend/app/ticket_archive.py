@@ -0,0 +1,219 @@
+import logging
+import os
+import signal
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import count
+from typing import Iterable, Optional
+from sqlalchemy import Select, delete, select
+from sqlalchemy.orm import Session
+from config import config
+from models import SupportTicket, TicketArchiveFile
+from ticket_stats import StatsDelta
+
+logger = logging.getLogger("agent")
+
+TICKET_COLUMNS = [column.name for column in SupportTicket.__table__.columns]
+
+_files = count()
+
+def ticket_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("id", pa.int64()),
+        ("name", pa.string()),
+        ("email", pa.string()),
+        ("phone", pa.string()),
+        ("address", pa.string()),
+        ("issue", pa.string()),
+        ("price", pa.float64()),
+        # Naive UTC, as the hot table stores it
+        ("created_at", pa.timestamp("us")),
+    ])
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def archive_cutoff(retention_days: float, now: Optional[datetime] = None) -> datetime:
+    """Tickets created before this are moved out of the hot table"""
+    return (now or datetime.now(timezone.utc)) - timedelta(days=retention_days)
+
+def archived_files_query(ticket_id: int) -> Select:
+    """Archive files whose ID range covers ``ticket_id``"""
+    return (
+        select(TicketArchiveFile.path)
+        .where(TicketArchiveFile.first_id <= ticket_id, TicketArchiveFile.last_id >= ticket_id)
+    )
+
+def read_archived_ticket(
+    paths: Iterable[str], ticket_id: int, directory: str = config.TICKET_ARCHIVE_DIR
+) -> Optional[SupportTicket]:
+    """The archived ticket with ``ticket_id`` from ``paths``, as a detached SupportTicket.
+
+    IDs were handed out again on SQLite before support_tickets used AUTOINCREMENT, so
+    two archived tickets can share one; that is logged and the newest is returned.
+    """
+    import pyarrow.parquet as pq
+
+    rows = []
+    for path in paths:
+        # The id filter is pushed down to the row group statistics
+        rows += pq.read_table(
+            os.path.join(directory, path), schema=ticket_schema(), filters=[("id", "==", ticket_id)]
+        ).to_pylist()
+    if not rows:
+        return None
+    if len(rows) > 1:
+        logger.warning("Ticket ID %d is archived %d times; returning the newest", ticket_id, len(rows))
+    return SupportTicket(**max(rows, key=lambda row: row["created_at"] or datetime.min))
+
+def add_archived_stats(delta: StatsDelta, paths: Iterable[str], directory: str = config.TICKET_ARCHIVE_DIR) -> int:
+    """Count archived tickets into ``delta`` for a stats rebuild; returns how many were counted"""
+    import pyarrow.parquet as pq
+
+    counted = 0
+    for path in paths:
+        table = pq.read_table(os.path.join(directory, path), columns=["created_at", "issue", "price"])
+        for created_at, issue, price in zip(*(table.column(name).to_pylist() for name in table.column_names)):
+            delta.add(created_at, issue, price)
+        counted += table.num_rows
+    return counted
+
+def _write_file(rows: list[dict], month: str, directory: str, compression_level: int) -> str:
+    """Write one month's rows to a new zstd Parquet file; returns its path relative to ``directory``"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    partition = os.path.join(directory, f"month={month}")
+    os.makedirs(partition, exist_ok=True)
+    name = f"tickets-{rows[0]['id']}-{rows[-1]['id']}-{os.getpid()}-{int(time.time() * 1000)}-{next(_files)}.parquet"
+    tmp_path = os.path.join(partition, f".{name}.tmp")
+    pq.write_table(
+        pa.Table.from_pylist(rows, schema=ticket_schema()),
+        tmp_path,
+        compression="zstd",
+        compression_level=compression_level,
+    )
+    with open(tmp_path, "rb") as f:
+        # On disk before the transaction that deletes the tickets commits
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(partition, name))
+    return os.path.join(f"month={month}", name)
+
+def archive_batch(
+    db: Session,
+    cutoff: datetime,
+    batch_size: int = config.TICKET_ARCHIVE_BATCH,
+    directory: str = config.TICKET_ARCHIVE_DIR,
+    compression_level: int = config.TICKET_ARCHIVE_ZSTD_LEVEL,
+    attempts: int = 3,
+) -> int:
+    """Move up to ``batch_size`` of the oldest tickets created before ``cutoff`` into the archive and commit.
+
+    The tickets are read and written to one Parquet file per UTC month first, so the
+    write transaction only deletes them and records the files in ticket_archive_files;
+    ticket writes wait for that alone, not for compression and fsync. If a ticket
+    was edited or removed in between, the batch is rolled back and read again. A
+    failure anywhere leaves the tickets in the hot table, at worst next to an orphaned
+    file no lookup points at. Returns how many tickets were moved.
+    """
+    columns = [getattr(SupportTicket, name) for name in TICKET_COLUMNS]
+    for _ in range(attempts):
+        rows = db.execute(
+            select(*columns)
+            .where(SupportTicket.created_at < cutoff)
+            .order_by(SupportTicket.created_at, SupportTicket.id)
+            .limit(batch_size)
+        ).all()
+        # End the read transaction: SQLite cannot turn a stale read snapshot into a write
+        db.commit()
+        if not rows:
+            return 0
+        by_month: dict[str, list[dict]] = {}
+        for row in sorted(rows, key=lambda row: row.id):
+            ticket = row._asdict()
+            ticket["created_at"] = naive_utc(ticket["created_at"])
+            by_month.setdefault(ticket["created_at"].strftime("%Y-%m"), []).append(ticket)
+        files = [(month, tickets, _write_file(tickets, month, directory, compression_level)) for month, tickets in by_month.items()]
+        ids = [row.id for row in rows]
+        try:
+            if db.get_bind().dialect.delete_returning:
+                deleted = db.execute(delete(SupportTicket).where(SupportTicket.id.in_(ids)).returning(*columns)).all()
+            else:
+                # No DELETE ... RETURNING on this database (MySQL): lock and read, then delete
+                deleted = db.execute(select(*columns).where(SupportTicket.id.in_(ids)).with_for_update()).all()
+                db.execute(delete(SupportTicket).where(SupportTicket.id.in_(ids)))
+            if sorted(deleted) == sorted(rows):
+                archived_at = datetime.now(timezone.utc)
+                db.add_all(
+                    TicketArchiveFile(
+                        path=path, month=month, first_id=tickets[0]["id"], last_id=tickets[-1]["id"],
+                        tickets=len(tickets), archived_at=archived_at,
+                    )
+                    for month, tickets, path in files
+                )
+                db.commit()
+                return len(rows)
+            db.rollback()
+        except Exception:
+            db.rollback()
+            for _, _, path in files:
+                os.remove(os.path.join(directory, path))
+            raise
+        logger.info("Tickets changed while being archived; reading the batch again")
+        for _, _, path in files:
+            os.remove(os.path.join(directory, path))
+    raise RuntimeError(f"Tickets kept changing while being archived ({attempts} attempts)")
+
+def archive_old_tickets(
+    db: Session,
+    retention_days: float = config.TICKET_RETENTION_DAYS,
+    stop: Optional[threading.Event] = None,
+    **options,
+) -> int:
+    """Move every ticket older than ``retention_days`` into the archive, one short transaction per batch"""
+    from latency_metrics import TICKETS_ARCHIVED
+
+    cutoff = archive_cutoff(retention_days)
+    moved = 0
+    while stop is None or not stop.is_set():
+        batch = archive_batch(db, cutoff, **options)
+        if not batch:
+            break
+        moved += batch
+        TICKETS_ARCHIVED.inc(batch)
+    return moved
+
+def run_ticket_retention():
+    """Archive old tickets every TICKET_RETENTION_INTERVAL_SECONDS until SIGTERM"""
+    from agent_logging import setup_logging
+    from db import SessionLocal, engine
+
+    # Forked: connections pooled before the fork belong to the parent; open new ones
+    engine.dispose(close=False)
+    setup_logging()
+    stop = threading.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: stop.set())
+    logger.info("Archiving tickets older than %s days to %s", config.TICKET_RETENTION_DAYS, config.TICKET_ARCHIVE_DIR)
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            with SessionLocal() as db:
+                moved = archive_old_tickets(db, stop=stop)
+            if moved:
+                logger.info("Archived %d tickets in %.1fs", moved, time.perf_counter() - started)
+        except Exception as e:
+            logger.error("Ticket archiving failed: %s", e)
+        stop.wait(config.TICKET_RETENTION_INTERVAL_SECONDS)
+
+if __name__ == "__main__":
+    # One archiving pass: python app/ticket_archive.py
+    from db import SessionLocal
+
+    with SessionLocal() as db:
+        print(f"Archived {archive_old_tickets(db)} tickets older than {config.TICKET_RETENTION_DAYS} days")
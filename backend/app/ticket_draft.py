@@ -0,0 +1,105 @@
+import re
+from dataclasses import asdict, dataclass, fields
+from typing import Optional
+from livekit.agents import llm
+from livekit.agents.utils import is_given
+from issues import match_issue
+
+EMAIL_PATTERN = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+PHONE_PATTERN = re.compile(r"\+?\d[\d\s().-]{5,}\d")
+
+@dataclass
+class TicketDraft:
+    """Ticket details collected so far in a call"""
+    name: Optional[str] = None
+    email: Optional[str] = None
+    phone: Optional[str] = None
+    address: Optional[str] = None
+    issue: Optional[str] = None
+    price: Optional[float] = None
+    ticket_id: Optional[int] = None
+
+    REQUIRED = ("name", "email", "phone", "address", "issue", "price")
+
+    def update(self, **values) -> list[str]:
+        """Set every given (non-None) field; returns the names of fields that changed"""
+        changed = []
+        for field in fields(self):
+            value = values.get(field.name)
+            if value is not None and is_given(value) and value != getattr(self, field.name):
+                setattr(self, field.name, value)
+                changed.append(field.name)
+        return changed
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "TicketDraft":
+        names = {field.name for field in fields(cls)}
+        return cls(**{key: value for key, value in data.items() if key in names})
+
+    def is_empty(self) -> bool:
+        return all(getattr(self, field.name) is None for field in fields(self))
+
+    def missing(self) -> list[str]:
+        return [name for name in self.REQUIRED if getattr(self, name) is None]
+
+    def absorb(self, text: str):
+        """Fill still-empty email, phone and issue from caller text that is about to be compacted"""
+        if self.email is None and (match := EMAIL_PATTERN.search(text)):
+            self.email = match.group(0)
+        if self.phone is None and (match := PHONE_PATTERN.search(text)):
+            self.phone = match.group(0).strip()
+        if self.issue is None and (issue := match_issue(text)):
+            self.issue, self.price = issue.name, issue.price
+
+    def summary(self) -> str:
+        collected = "; ".join(
+            f"{name}: {getattr(self, name):g}" if name == "price" else f"{name}: {getattr(self, name)}"
+            for name in self.REQUIRED
+            if getattr(self, name) is not None
+        )
+        lines = [f"TICKET DRAFT (earlier turns summarized): {collected or 'nothing collected yet'}"]
+        if self.ticket_id is not None:
+            lines.append(f"Ticket created with ID: {self.ticket_id}")
+        elif missing := self.missing():
+            lines.append(f"Still needed: {', '.join(missing)}")
+        return "\n".join(lines)
+
+class ChatCompactor:
+    """Replaces older user turns with a snapshot of the ticket draft before each LLM request.
+
+    Turns are dropped ``keep_turns`` at a time, so between 1x and 2x ``keep_turns`` recent
+    turns stay verbatim. The system instructions and the summary snapshot only change when
+    the cut point moves, so consecutive requests share a long identical prefix that the
+    provider's prompt cache can reuse.
+    """
+
+    def __init__(self, draft: TicketDraft, keep_turns: int):
+        self.draft = draft
+        self.keep_turns = keep_turns
+        self._dropped = 0
+        self._summary: Optional[llm.ChatMessage] = None
+
+    def compact(self, chat_ctx: llm.ChatContext) -> llm.ChatContext:
+        if self.keep_turns <= 0:
+            return chat_ctx
+        items = chat_ctx.items
+        user_turns = [i for i, item in enumerate(items) if item.type == "message" and item.role == "user"]
+        dropped = (len(user_turns) - self.keep_turns) // self.keep_turns * self.keep_turns
+        if dropped <= 0:
+            return chat_ctx
+
+        cut = user_turns[dropped]
+        head = [
+            item for item in items[:cut]
+            if item.type == "message" and item.role in ("system", "developer")
+        ]
+        if dropped != self._dropped or self._summary is None:
+            for item in items[:cut]:
+                if item.type == "message" and item.role == "user":
+                    self.draft.absorb(item.text_content or "")
+            self._summary = llm.ChatMessage(role="system", content=[self.draft.summary()])
+            self._dropped = dropped
+        return llm.ChatContext(head + [self._summary] + list(items[cut:]))
@@ -0,0 +1,110 @@
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Optional
+from sqlalchemy import Select, delete, func, select, text
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from models import SupportTicket, TicketHourlyStats
+
+# Dialects whose INSERT supports ON CONFLICT DO UPDATE
+UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+UPSERT_CHUNK_ROWS = 500
+
+def hour_bucket(created_at: datetime) -> datetime:
+    """The naive UTC hour a ticket is counted in"""
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return created_at.replace(minute=0, second=0, microsecond=0)
+
+class StatsDelta:
+    """Per-(hour, issue) ticket count and revenue changes from one transaction's writes"""
+
+    def __init__(self):
+        self._changes: dict[tuple[datetime, str], list] = defaultdict(lambda: [0, 0.0])
+
+    def add(self, created_at: datetime, issue: str, price: float, sign: int = 1):
+        change = self._changes[(hour_bucket(created_at), issue)]
+        change[0] += sign
+        change[1] += sign * price
+
+    def move(self, created_at: datetime, old_issue: str, old_price: float, new_issue: str, new_price: float):
+        """Re-count an edited ticket under its new issue and price"""
+        if (old_issue, old_price) != (new_issue, new_price):
+            self.add(created_at, old_issue, old_price, sign=-1)
+            self.add(created_at, new_issue, new_price)
+
+    def rows(self) -> list[dict]:
+        return [
+            {"hour": hour, "issue": issue, "tickets": tickets, "revenue": revenue}
+            for (hour, issue), (tickets, revenue) in self._changes.items()
+            if tickets or revenue
+        ]
+
+def upsert_statements(dialect: str, delta: StatsDelta) -> list:
+    """INSERTs that add ``delta`` onto the existing stats rows, in chunks that fit SQLite's bind limit"""
+    rows = delta.rows()
+    return [_upsert(dialect, rows[i:i + UPSERT_CHUNK_ROWS]) for i in range(0, len(rows), UPSERT_CHUNK_ROWS)]
+
+def _upsert(dialect: str, rows: list[dict]):
+    table = TicketHourlyStats
+    if dialect == "mysql":
+        stmt = mysql.insert(table).values(rows)
+        return stmt.on_duplicate_key_update(
+            tickets=table.tickets + stmt.inserted.tickets,
+            revenue=table.revenue + stmt.inserted.revenue,
+        )
+    if dialect not in UPSERT_INSERTS:
+        raise NotImplementedError(f"Ticket stats upserts are not supported on {dialect}")
+    stmt = UPSERT_INSERTS[dialect](table).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[table.hour, table.issue],
+        set_={
+            "tickets": table.tickets + stmt.excluded.tickets,
+            "revenue": table.revenue + stmt.excluded.revenue,
+        },
+    )
+
+def rebuild_statements(dialect: str) -> list:
+    """Statements that start a rebuild: block concurrent ticket writes, then empty the stats table.
+
+    On SQLite the DELETE itself takes the database's write lock; on PostgreSQL a SHARE
+    lock on support_tickets holds off inserts and updates until the rebuild commits.
+    """
+    statements = [text(f"LOCK TABLE {SupportTicket.__tablename__} IN SHARE MODE")] if dialect == "postgresql" else []
+    return statements + [delete(TicketHourlyStats)]
+
+def source_query(batch_size: int = 5000) -> Select:
+    """The ticket columns the stats are computed from, streamed ``batch_size`` rows at a time"""
+    return select(SupportTicket.created_at, SupportTicket.issue, SupportTicket.price).execution_options(
+        yield_per=batch_size
+    )
+
+def stats_queries(hours: int, now: Optional[datetime] = None) -> tuple[Select, Select]:
+    """Per-issue totals and per-hour totals for the last ``hours`` hours, read from the stats table"""
+    table = TicketHourlyStats
+    since = hour_bucket(now or datetime.now(timezone.utc)) - timedelta(hours=hours - 1)
+    tickets, revenue = func.sum(table.tickets), func.sum(table.revenue)
+    by_issue = select(table.issue, tickets, revenue).group_by(table.issue).having(tickets != 0).order_by(table.issue)
+    by_hour = (
+        select(table.hour, tickets, revenue)
+        .where(table.hour >= since)
+        .group_by(table.hour)
+        .having(tickets != 0)
+        .order_by(table.hour)
+    )
+    return by_issue, by_hour
+
+def summarize(by_issue: Iterable[tuple], by_hour: Iterable[tuple]) -> dict:
+    """Dashboard payload from the two stats_queries results"""
+    by_issue = [
+        {"issue": issue, "tickets": int(tickets), "revenue": round(revenue, 2)}
+        for issue, tickets, revenue in by_issue
+    ]
+    return {
+        "total_tickets": sum(row["tickets"] for row in by_issue),
+        "total_revenue": round(sum(row["revenue"] for row in by_issue), 2),
+        "by_issue": by_issue,
+        "by_hour": [
+            {"hour": hour.isoformat(), "tickets": int(tickets), "revenue": round(revenue, 2)}
+            for hour, tickets, revenue in by_hour
+        ],
+    }
@@ -0,0 +1,179 @@
+import asyncio
+import logging
+from typing import Optional
+from async_crud import insert_idempotency_keys, insert_tickets, update_tickets
+from async_db import AsyncSessionLocal
+from config import config
+from latency_metrics import observe_db_call
+
+logger = logging.getLogger("agent")
+
+class _Op:
+    __slots__ = ("kind", "ticket_id", "fields", "idempotency", "future")
+
+    def __init__(self, kind: str, fields: dict, ticket_id: Optional[int] = None, idempotency: Optional[dict] = None):
+        self.kind = kind
+        self.ticket_id = ticket_id
+        self.fields = fields
+        self.idempotency = idempotency
+        self.future = asyncio.get_running_loop().create_future()
+
+class TicketWriter:
+    """Write-behind queue that group-commits ticket writes from every session in the process.
+
+    Writes are collected for up to ``max_delay_ms`` or ``max_batch`` operations, then
+    committed in one transaction. Consecutive creates go out as a single
+    ``INSERT ... RETURNING id`` and consecutive edits as one ``UPDATE ... RETURNING``
+    per ticket; each caller's future resolves with its ticket ID. If the batch fails,
+    its operations are retried in a transaction each, so only the failing one errors.
+    """
+
+    def __init__(
+        self,
+        session_factory=AsyncSessionLocal,
+        max_batch: int = config.TICKET_WRITER_MAX_BATCH,
+        max_delay_ms: float = config.TICKET_WRITER_MAX_DELAY_MS,
+    ):
+        self._session_factory = session_factory
+        self.max_batch = max(1, max_batch)
+        self.max_delay = max(0.0, max_delay_ms) / 1000
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._loop = asyncio.get_running_loop()
+            self._task = self._loop.create_task(self._run())
+
+    async def create_ticket(self, idempotency_key: Optional[str] = None, room: str = "", **fields) -> int:
+        """Queue a ticket insert and wait for its assigned ID.
+
+        With an ``idempotency_key``, the key is recorded in the same transaction as the ticket.
+        """
+        idempotency = {"key": idempotency_key, "room": room} if idempotency_key else None
+        return await self._submit(_Op("create", fields, idempotency=idempotency))
+
+    async def edit_ticket(self, ticket_id: int, **fields) -> Optional[int]:
+        """Queue a ticket update; resolves to the ticket ID, or None if it doesn't exist"""
+        return await self._submit(_Op("edit", fields, ticket_id=ticket_id))
+
+    async def _submit(self, op: _Op):
+        self.start()
+        self._queue.put_nowait(op)
+        return await op.future
+
+    async def aclose(self):
+        """Flush everything still queued, then stop the background task"""
+        if self._task is None:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                with observe_db_call("batch_commit"):
+                    await self._commit(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _commit(self, batch: list[_Op]):
+        try:
+            results = await self._commit_ops(batch)
+        except Exception as e:
+            if len(batch) == 1:
+                logger.error("Ticket %s failed to commit: %s", batch[0].kind, e)
+                self._fail(batch[0], e)
+                return
+            # One bad op (say, a duplicate idempotency key) must not fail the others
+            logger.warning("Ticket batch of %d failed to commit, retrying one at a time: %s", len(batch), e)
+            results = []
+            for op in batch:
+                try:
+                    results.extend(await self._commit_ops([op]))
+                except Exception as op_error:
+                    logger.error("Ticket %s failed to commit: %s", op.kind, op_error)
+                    self._fail(op, op_error)
+
+        for op, result in results:
+            if not op.future.done():
+                op.future.set_result(result)
+
+    async def _commit_ops(self, ops: list[_Op]) -> list:
+        """Write ``ops`` in one transaction; nothing is kept if any of them fails"""
+        results = []
+        async with self._session_factory() as db:
+            run: list[_Op] = []
+            for op in ops:
+                if run and op.kind != run[0].kind:
+                    results.extend(await self._flush(db, run))
+                    run = []
+                run.append(op)
+            results.extend(await self._flush(db, run))
+            await db.commit()
+        return results
+
+    @staticmethod
+    def _fail(op: _Op, error: Exception):
+        if not op.future.done():
+            op.future.set_exception(error)
+
+    @classmethod
+    async def _flush(cls, db, run: list[_Op]):
+        if not run:
+            return []
+        if run[0].kind == "create":
+            return await cls._flush_creates(db, run)
+        return await cls._flush_edits(db, run)
+
+    @staticmethod
+    async def _flush_creates(db, creates: list[_Op]):
+        ids = await insert_tickets(db, [op.fields for op in creates])
+        await insert_idempotency_keys(db, [
+            {**op.idempotency, "ticket_id": ticket_id}
+            for op, ticket_id in zip(creates, ids)
+            if op.idempotency
+        ])
+        return list(zip(creates, ids))
+
+    @staticmethod
+    async def _flush_edits(db, edits: list[_Op]):
+        merged: dict[int, dict] = {}
+        for op in edits:
+            # Later edits to the same ticket win, as they would applied one by one
+            merged[op.ticket_id] = {**merged.get(op.ticket_id, {}), **op.fields}
+        updated = await update_tickets(db, merged)
+        return [(op, op.ticket_id if op.ticket_id in updated else None) for op in edits]
+
+_writer: Optional[TicketWriter] = None
+
+def get_ticket_writer() -> TicketWriter:
+    """Process-wide writer shared by every agent session on the running event loop"""
+    global _writer
+    loop = asyncio.get_running_loop()
+    if _writer is None or (_writer._loop is not None and _writer._loop is not loop):
+        _writer = TicketWriter()
+    return _writer
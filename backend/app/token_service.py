@@ -0,0 +1,105 @@
+import hashlib
+import hmac
+import re
+import time
+import uuid
+from datetime import timedelta
+from typing import Optional
+from livekit import api
+from config import Config
+
+ROOM_PREFIX = "support-"
+SESSION_ID_PATTERN = "^[0-9a-f]{32}$"
+
+def session_id_from_room(room_name: str) -> Optional[str]:
+    """The session_id a support room was issued for, or None for other rooms"""
+    if not room_name.startswith(ROOM_PREFIX):
+        return None
+    session_id = room_name[len(ROOM_PREFIX):]
+    return session_id if re.match(SESSION_ID_PATTERN, session_id) else None
+
+class TokenService:
+    """Issues LiveKit room tokens for anonymous support callers.
+
+    Configuration is checked once when the service is built, not on every request.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        api_secret: str,
+        url: str,
+        ttl: timedelta = timedelta(hours=1),
+        resume_window: timedelta = timedelta(minutes=30),
+        clock=time.time,
+    ):
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.url = url
+        self.ttl = ttl
+        self.resume_window = resume_window
+        self._clock = clock
+
+    @classmethod
+    def from_config(cls, config: Config) -> "TokenService":
+        if not config.validate_livekit_config():
+            missing_vars = config.get_missing_livekit_vars()
+            raise ValueError(f"LiveKit configuration missing: {', '.join(missing_vars)}")
+        return cls(
+            config.LIVEKIT_API_KEY,
+            config.LIVEKIT_API_SECRET,
+            config.LIVEKIT_URL,
+            ttl=timedelta(seconds=config.TOKEN_TTL_SECONDS),
+            # The draft outlives the dropped call by DRAFT_TTL_SECONDS
+            resume_window=timedelta(seconds=config.DRAFT_TTL_SECONDS),
+        )
+
+    @staticmethod
+    def new_session_id() -> str:
+        """Full 128-bit random ID; truncated UUIDs start colliding at scale"""
+        return uuid.uuid4().hex
+
+    def _signature(self, session_id: str, expires: int) -> str:
+        message = f"resume:{session_id}:{expires}".encode()
+        return hmac.new(self.api_secret.encode(), message, hashlib.sha256).hexdigest()
+
+    def resume_token(self, session_id: str) -> str:
+        """Signed proof that this server issued ``session_id``, valid while the call may still be resumed"""
+        expires = int(self._clock() + self.ttl.total_seconds() + self.resume_window.total_seconds())
+        return f"{session_id}.{expires}.{self._signature(session_id, expires)}"
+
+    def verify_resume_token(self, resume_token: str) -> Optional[str]:
+        """The session_id a resume token was issued for, or None if it is forged, malformed or expired"""
+        try:
+            session_id, expires, signature = resume_token.split(".")
+            expires = int(expires)
+        except ValueError:
+            return None
+        if not re.match(SESSION_ID_PATTERN, session_id) or expires < self._clock():
+            return None
+        if not hmac.compare_digest(signature, self._signature(session_id, expires)):
+            return None
+        return session_id
+
+    def issue(self, session_id: Optional[str] = None) -> dict:
+        """Token for a new session, or for rejoining ``session_id`` after a dropped call.
+
+        Only pass a ``session_id`` taken from a verified resume token.
+        """
+        session_id = session_id or self.new_session_id()
+        room_name = f"{ROOM_PREFIX}{session_id}"
+        token = api.AccessToken(self.api_key, self.api_secret) \
+            .with_identity(f"customer-{session_id}") \
+            .with_name(f"Customer {session_id[:8]}") \
+            .with_grants(api.VideoGrants(room_join=True, room=room_name)) \
+            .with_ttl(self.ttl)
+        return {
+            "token": token.to_jwt(),
+            "url": self.url,
+            "room": room_name,
+            "session_id": session_id,
+            "resume_token": self.resume_token(session_id),
+        }
+
+    def issue_batch(self, session_ids: list[str]) -> list[dict]:
+        return [self.issue(session_id) for session_id in session_ids]
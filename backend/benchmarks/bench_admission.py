@@ -0,0 +1,190 @@
+"""Simulated call spike with and without admission control on /api/token.
+
+A simulated host runs calls as agent job processes. Each call is --turns agent
+replies; a reply takes --reply-ms while the host runs at most --capacity calls and
+slows down quadratically beyond that (CPU oversubscription). The worker keeps taking
+jobs up to 1.5x capacity, the overshoot a CPU-based load threshold allows before
+it reacts; later callers sit in a silent room until a job process frees up.
+
+Callers arrive at --base-rate per second, plus a --spike of callers within
+--spike-seconds. A caller hangs up if no agent has answered within --patience
+seconds of asking for a token.
+
+- without admission control every caller gets a token at once and joins a room,
+  where they may wait in silence ("silent room") for a job to pick the call up.
+- with it, tokens come from ``AdmissionStore.admit`` (the same store the job
+  processes publish their load to). Callers are admitted, queued and poll after
+  Retry-After, or rejected and retry after Retry-After.
+
+Afterwards a single client floods the per-IP token bucket.
+
+    python benchmarks/bench_admission.py --capacity 10 --spike 80
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from bench_utils import bootstrap, summarize
+
+# Time is compressed, so queued callers poll every second
+os.environ.setdefault("ADMISSION_POLL_SECONDS", "1")
+os.environ.setdefault("ADMISSION_QUEUE_TTL_SECONDS", "3")
+bootstrap("admission.db")
+
+from admission import ADMIT, QUEUE, AdmissionStore, TokenBucketLimiter  # noqa: E402
+from token_service import TokenService  # noqa: E402
+
+class Host:
+    """Agent job processes on one machine, publishing their load like LoadReporter does"""
+
+    def __init__(self, args, store: AdmissionStore = None):
+        self.args = args
+        self.store = store
+        self.active = 0
+        self.slots = asyncio.Semaphore(int(args.capacity * 1.5))
+        self.reply_latencies: list[float] = []
+        self.durations: list[float] = []
+
+    def reply_time(self) -> float:
+        overload = max(1.0, self.active / self.args.capacity)
+        return self.args.reply_ms / 1000 * overload ** 2
+
+    async def publish(self):
+        if self.store:
+            avg = sum(self.durations[-20:]) / len(self.durations[-20:]) if self.durations else 0.0
+            lag = max(0.0, self.reply_time() - self.args.reply_ms / 1000)
+            await self.store.publish("bench-host", self.active, lag, avg)
+
+    async def run_call(self, session_id: str, answered: asyncio.Event, hung_up: asyncio.Event):
+        async with self.slots:
+            if hung_up.is_set():
+                return
+            self.active += 1
+            await self.publish()
+            if self.store:
+                await self.store.claim(session_id)
+            answered.set()
+            started = time.perf_counter()
+            try:
+                for _ in range(self.args.turns):
+                    reply = self.reply_time()
+                    await asyncio.sleep(reply)
+                    self.reply_latencies.append(reply)
+                    await asyncio.sleep(self.args.think_ms / 1000)
+            finally:
+                self.active -= 1
+                self.durations.append(time.perf_counter() - started)
+                await self.publish()
+
+class Caller:
+    def __init__(self, host: Host, args):
+        self.host = host
+        self.args = args
+        self.answer_time = None
+        self.silent_wait = None
+        self.outcome = "abandoned"
+        self.queued = False
+        self.rejections = 0
+
+    async def get_token(self, session_id: str, started: float) -> bool:
+        """Ask for a token until admitted or out of patience"""
+        store, queue_id = self.host.store, None
+        while True:
+            decision = await store.admit([session_id], queue_id=queue_id)
+            if decision.action == ADMIT:
+                return True
+            if decision.action == QUEUE:
+                self.queued, queue_id = True, decision.queue_id
+            else:
+                self.rejections += 1
+            if time.perf_counter() + decision.retry_after - started > self.args.patience:
+                return False
+            await asyncio.sleep(decision.retry_after)
+
+    async def call(self):
+        started = time.perf_counter()
+        session_id = TokenService.new_session_id()
+        if self.host.store and not await self.get_token(session_id, started):
+            self.outcome = "rejected" if self.rejections and not self.queued else "gave up queued"
+            return
+        joined = time.perf_counter()
+        answered, hung_up = asyncio.Event(), asyncio.Event()
+        job = asyncio.create_task(self.host.run_call(session_id, answered, hung_up))
+        remaining = self.args.patience - (time.perf_counter() - started)
+        try:
+            await asyncio.wait_for(answered.wait(), max(remaining, 0.01))
+        except asyncio.TimeoutError:
+            # Hung up in a silent room; the job, if it starts later, is wasted
+            hung_up.set()
+            return
+        self.answer_time = time.perf_counter() - started
+        self.silent_wait = time.perf_counter() - joined
+        self.outcome = "answered"
+        await job
+
+async def scenario(label: str, args, admission: bool):
+    store = None
+    if admission:
+        path = os.path.join(tempfile.mkdtemp(prefix="deskhelp-admission-"), "admission.sqlite3")
+        store = AdmissionStore(path=path, capacity=args.capacity, max_loop_lag=args.max_lag_ms / 1000)
+    host = Host(args, store)
+    rng = random.Random(5)
+    callers, tasks = [], []
+
+    async def arrive(delay: float):
+        await asyncio.sleep(delay)
+        caller = Caller(host, args)
+        callers.append(caller)
+        await caller.call()
+
+    base = [rng.uniform(0, args.duration) for _ in range(int(args.base_rate * args.duration))]
+    spike = [args.spike_at + rng.uniform(0, args.spike_seconds) for _ in range(args.spike)]
+    started = time.perf_counter()
+    tasks = [asyncio.create_task(arrive(delay)) for delay in sorted(base + spike)]
+    await asyncio.gather(*tasks)
+
+    outcomes = {}
+    for caller in callers:
+        outcomes[caller.outcome] = outcomes.get(caller.outcome, 0) + 1
+    print(f"{label} ({len(callers)} callers, {time.perf_counter() - started:.0f}s)")
+    print("  outcomes: " + ", ".join(f"{name}={count}" for name, count in sorted(outcomes.items())))
+    print("  " + summarize("time to answer ", [c.answer_time for c in callers if c.answer_time is not None], unit="s", scale=1))
+    print("  " + summarize("silent room    ", [c.silent_wait for c in callers if c.silent_wait is not None], unit="s", scale=1))
+    print("  " + summarize("agent reply    ", host.reply_latencies))
+    print(f"  queued at least once: {sum(c.queued for c in callers)}")
+
+def flood(requests: int, per_minute: float, burst: int):
+    limiter = TokenBucketLimiter(rate=per_minute / 60, burst=burst)
+    waits = [limiter.acquire("203.0.113.7") for _ in range(requests)]
+    other = limiter.acquire("198.51.100.2")
+    print(
+        f"flood: one IP sent {requests} requests at once: {sum(w == 0 for w in waits)} allowed, "
+        f"{sum(w > 0 for w in waits)} got 429 (last Retry-After {max(waits):.0f}s); "
+        f"another IP {'allowed' if other == 0 else 'limited'}"
+    )
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--capacity", type=int, default=10, help="calls the host runs at full speed")
+    parser.add_argument("--turns", type=int, default=6)
+    parser.add_argument("--reply-ms", type=float, default=300)
+    parser.add_argument("--think-ms", type=float, default=400)
+    parser.add_argument("--duration", type=float, default=20, help="seconds of baseline arrivals")
+    parser.add_argument("--base-rate", type=float, default=1.0, help="baseline callers per second")
+    parser.add_argument("--spike", type=int, default=80, help="extra callers in the spike")
+    parser.add_argument("--spike-at", type=float, default=3.0)
+    parser.add_argument("--spike-seconds", type=float, default=2.0)
+    parser.add_argument("--patience", type=float, default=20.0, help="seconds a caller waits for an agent")
+    parser.add_argument("--max-lag-ms", type=float, default=250)
+    parser.add_argument("--flood", type=int, default=100)
+    args = parser.parse_args()
+
+    await scenario("without admission control", args, admission=False)
+    await scenario("with admission control", args, admission=True)
+    flood(args.flood, per_minute=20, burst=10)
+
+if __name__ == "__main__":
+    asyncio.run(main())
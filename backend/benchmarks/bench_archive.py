@@ -0,0 +1,190 @@
+"""Call-record archive: event-loop cost, writer throughput, bytes per call and reads.
+
+Replays --calls scripted ticket calls (``fakes.conversation``: 7 turns with a
+create_ticket and an edit_ticket call) as the AgentSession events the recorder
+subscribes to, with STT/EOU/LLM/TTS metrics for every turn, from --concurrency
+simulated sessions on one event loop.
+
+- event-loop cost: time spent in the recorder's handlers and ``close()`` per call,
+  and loop lag while the writer thread archives, compared with writing each call's
+  Parquet file on the loop at close.
+- writer throughput: calls and rows per second from the first submit to the last
+  file on disk.
+- bytes per call: one file per call (each agent job process handles one call), the
+  same calls compacted into one file per day, and the records as JSON lines.
+- reads: one ticket's transcript and a whole day of metrics through the reader API.
+
+    python benchmarks/bench_archive.py --calls 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import tempfile
+import time
+
+from bench_utils import LoopLagMonitor, bootstrap, summarize
+
+bootstrap("archive.db")
+
+import pyarrow.parquet as pq  # noqa: E402
+from livekit.agents import ConversationItemAddedEvent, FunctionToolsExecutedEvent, MetricsCollectedEvent, llm, metrics  # noqa: E402
+from call_archive import CallArchive, compact_partition, read_call_records, read_transcript, to_row, archive_schema  # noqa: E402
+from fakes import conversation  # noqa: E402
+
+def turn_metrics(rng: random.Random, at: float, speech_id: str) -> list:
+    return [
+        metrics.STTMetrics(label="deepgram.STT", request_id=speech_id, timestamp=at, duration=0.0,
+                           audio_duration=rng.uniform(1, 4), streamed=True),
+        metrics.EOUMetrics(timestamp=at, end_of_utterance_delay=rng.uniform(0.2, 0.6),
+                           transcription_delay=rng.uniform(0.1, 0.3), on_user_turn_completed_delay=0.0, speech_id=speech_id),
+        metrics.LLMMetrics(label="openai.LLM", request_id=speech_id, timestamp=at, duration=rng.uniform(0.5, 1.5),
+                           ttft=rng.uniform(0.2, 0.8), cancelled=False, completion_tokens=rng.randint(10, 60),
+                           prompt_tokens=rng.randint(600, 1500), prompt_cached_tokens=0, total_tokens=0,
+                           tokens_per_second=40.0, speech_id=speech_id),
+        metrics.TTSMetrics(label="cartesia.TTS", request_id=speech_id, timestamp=at, ttfb=rng.uniform(0.1, 0.4),
+                           duration=rng.uniform(0.5, 2), audio_duration=rng.uniform(1, 5), cancelled=False,
+                           characters_count=rng.randint(20, 120), streamed=True, speech_id=speech_id),
+    ]
+
+def call_events(caller: int, rng: random.Random) -> list[tuple[str, object]]:
+    """(event name, event) pairs for one scripted call"""
+    events, at = [], time.time()
+    for n, turn in enumerate(conversation(caller)):
+        speech_id = f"speech_{caller}_{n}"
+        events.append(("conversation_item_added", ConversationItemAddedEvent(
+            item=llm.ChatMessage(role="user", content=[turn["user"]], created_at=at, transcript_confidence=0.93),
+        )))
+        if "tool" in turn:
+            name, arguments = turn["tool"]
+            call_id = f"call_{caller}_{n}"
+            events.append(("function_tools_executed", FunctionToolsExecutedEvent(
+                function_calls=[llm.FunctionCall(call_id=call_id, name=name, arguments=json.dumps(arguments), created_at=at)],
+                function_call_outputs=[llm.FunctionCallOutput(name=name, call_id=call_id, output=f"Ticket {caller} updated", is_error=False)],
+            )))
+        events.append(("conversation_item_added", ConversationItemAddedEvent(
+            item=llm.ChatMessage(role="assistant", content=[turn["reply"]], created_at=at + 1),
+        )))
+        events.extend(("metrics_collected", MetricsCollectedEvent(metrics=m)) for m in turn_metrics(rng, at, speech_id))
+        at += rng.uniform(3, 10)
+    return events
+
+class ReplaySession:
+    """Just enough of AgentSession's event emitter for CallRecorder.attach"""
+
+    def __init__(self):
+        self.handlers = {}
+
+    def on(self, event: str, handler):
+        self.handlers[event] = handler
+
+async def run(label: str, calls: list[list], args, directory: str, on_loop: bool) -> CallArchive:
+    archive = CallArchive(directory=directory, batch_rows=args.batch_rows, flush_seconds=0.5)
+    handler_time, close_time = [], []
+    queue = asyncio.Queue()
+    for caller, events in enumerate(calls):
+        queue.put_nowait((caller, events))
+
+    async def session():
+        while not queue.empty():
+            caller, events = queue.get_nowait()
+            recorder = archive.recorder(f"{caller:032x}", f"support-{caller:032x}")
+            replay = ReplaySession()
+            recorder.attach(replay)
+            for name, event in events:
+                started = time.perf_counter()
+                replay.handlers[name](event)
+                handler_time.append(time.perf_counter() - started)
+                await asyncio.sleep(0)
+            started = time.perf_counter()
+            if on_loop:
+                # Writing the call's file right away on the event loop
+                records = recorder.records
+                archive._write([(recorder.session_id, recorder.room, caller, records)])
+            else:
+                recorder.close(ticket_id=caller)
+            close_time.append(time.perf_counter() - started)
+
+    monitor = LoopLagMonitor()
+    monitor.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(session() for _ in range(args.concurrency)))
+    loop_done = time.perf_counter() - started
+    await monitor.stop()
+    await asyncio.to_thread(archive.flush)
+    elapsed = time.perf_counter() - started
+    print(label)
+    print("  " + summarize("handler per event", handler_time, unit="us", scale=1e6))
+    print("  " + summarize("close per call   ", close_time))
+    print("  " + summarize("loop lag         ", monitor.samples))
+    print(
+        f"  {len(calls)} calls replayed in {loop_done:.2f}s, on disk after {elapsed:.2f}s: "
+        f"{len(calls) / elapsed:.0f} calls/s, {archive.rows_written / elapsed:.0f} rows/s, {archive.files_written} files"
+    )
+    return archive
+
+def directory_bytes(directory: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(directory) for name in names)
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--batch-rows", type=int, default=20000)
+    args = parser.parse_args()
+    rng = random.Random(3)
+    calls = [call_events(caller, rng) for caller in range(args.calls)]
+    rows = sum(len(events) for events in calls)
+    base = tempfile.mkdtemp(prefix="deskhelp-archive-")
+
+    # Job processes handle one call each, so each call ends up in its own file
+    await run("write on the loop at close (one file per call)", calls, args, os.path.join(base, "on_loop"), on_loop=True)
+    batched = os.path.join(base, "batched")
+    await run("recorder + writer thread (batched files)", calls, args, batched, on_loop=False)
+
+    per_call_dir = os.path.join(base, "on_loop")
+    jsonl = sum(
+        len(json.dumps(to_row(f"{c:032x}", f"support-{c:032x}", c, record), default=str)) + 1
+        for c, events in enumerate(calls[:200])
+        for record in _records(events)
+    ) * len(calls) / min(len(calls), 200)
+    sizes = {
+        "one file per call": directory_bytes(per_call_dir),
+        "batched by writer": directory_bytes(batched),
+    }
+    started = time.perf_counter()
+    today = datetime.datetime.now(datetime.timezone.utc).date()
+    for day in (today - datetime.timedelta(days=1), today):
+        compact_partition(per_call_dir, day)
+    compact_time = time.perf_counter() - started
+    sizes["compacted per day"] = directory_bytes(per_call_dir)
+    sizes["JSON lines (raw)"] = jsonl
+    print(f"bytes per call ({rows / len(calls):.0f} records each, compaction took {compact_time:.2f}s):")
+    for label, size in sizes.items():
+        print(f"  {label:18s} {size / len(calls):8.0f} B")
+
+    ticket = args.calls // 2
+    started = time.perf_counter()
+    transcript = read_transcript(per_call_dir, ticket_id=ticket)
+    print(f"read one ticket's transcript: {len(transcript)} rows in {(time.perf_counter() - started) * 1000:.1f}ms")
+    started = time.perf_counter()
+    table = read_call_records(per_call_dir, start=today - datetime.timedelta(days=1), end=today,
+                              kinds=["metrics"], columns=["name", "latency"])
+    print(f"read a day of metrics: {table.num_rows} rows in {(time.perf_counter() - started) * 1000:.1f}ms")
+    assert pq.read_schema(next(
+        os.path.join(root, name) for root, _, names in os.walk(per_call_dir) for name in names
+    )).equals(archive_schema())
+
+def _records(events: list) -> list[dict]:
+    archive = CallArchive(directory=tempfile.gettempdir())
+    recorder = archive.recorder(None, "")
+    replay = ReplaySession()
+    recorder.attach(replay)
+    for name, event in events:
+        replay.handlers[name](event)
+    return recorder.records
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,86 @@
+"""Prompt size and TTFT per turn, full chat history vs ticket-draft compaction.
+
+Replays a correction-heavy call through ``livekit_agent.Assistant`` in an AgentSession,
+once sending the full history every turn (--keep-turns 0) and once with compaction.
+``fakes.ScriptedLLM`` serializes every request as an OpenAI-format provider would,
+counts prompt tokens (~4 chars/token) and the prefix it shares with the previous
+request (what provider prompt caching can reuse, from 1024 tokens up), and simulates
+TTFT as a base latency plus prefill time per 1k uncached tokens.
+
+    python benchmarks/bench_context.py --corrections 12 --prefill-per-1k 0.05
+"""
+import argparse
+import asyncio
+
+from bench_utils import bootstrap, percentile
+
+bootstrap("context.db")
+
+from livekit.agents import AgentSession, MetricsCollectedEvent, metrics  # noqa: E402
+import livekit_agent  # noqa: E402
+from async_db import async_engine  # noqa: E402
+from config import config  # noqa: E402
+from fakes import ScriptedLLM, correction_heavy_conversation  # noqa: E402
+from ticket_writer import get_ticket_writer  # noqa: E402
+
+async def replay(script: list[dict], keep_turns: int, ttft: float, prefill_per_1k: float) -> dict:
+    scripted = ScriptedLLM(script, ttft=ttft, token_delay=0.0, prefill_per_1k=prefill_per_1k)
+    session = AgentSession(llm=scripted)
+    measured_ttft = []
+
+    @session.on("metrics_collected")
+    def _on_metrics(ev: MetricsCollectedEvent):
+        if isinstance(ev.metrics, metrics.LLMMetrics) and not ev.metrics.cancelled:
+            measured_ttft.append(ev.metrics.ttft)
+
+    assistant = livekit_agent.Assistant(keep_turns=keep_turns)
+    await session.start(agent=assistant)
+    try:
+        for turn in script:
+            await session.run(user_input=turn["user"])
+    finally:
+        await session.aclose()
+    return {"requests": scripted.requests, "ttft": measured_ttft, "draft": assistant.draft}
+
+def report(label: str, result: dict):
+    requests = result["requests"]
+    prompt = [r["prompt_tokens"] for r in requests]
+    cached = [r["cached_tokens"] for r in requests]
+    uncached = sum(prompt) - sum(cached)
+    ttft = result["ttft"]
+    print(
+        f"{label:<22} requests={len(requests):3d} prompt tokens: total={sum(prompt):6d} "
+        f"mean={sum(prompt) / len(prompt):5.0f} last={prompt[-1]:5d} max={max(prompt):5d} "
+        f"uncached={uncached:6d} ({uncached / len(requests):4.0f}/request)  "
+        f"TTFT p50={percentile(ttft, 50) * 1000:5.0f}ms p99={percentile(ttft, 99) * 1000:5.0f}ms"
+    )
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--corrections", type=int, default=12, help="caller correction rounds before confirming")
+    parser.add_argument("--keep-turns", type=int, default=config.CONTEXT_KEEP_TURNS)
+    parser.add_argument("--ttft", type=float, default=0.2, help="simulated base time to first token (s)")
+    parser.add_argument("--prefill-per-1k", type=float, default=0.05, help="simulated prefill time per 1k uncached prompt tokens (s)")
+    parser.add_argument("--per-turn", action="store_true", help="print prompt tokens for every request")
+    args = parser.parse_args()
+
+    script = correction_heavy_conversation(0, args.corrections)
+    print(f"replaying {len(script)} caller turns")
+    full = await replay(script, 0, args.ttft, args.prefill_per_1k)
+    compacted = await replay(script, args.keep_turns, args.ttft, args.prefill_per_1k)
+    report("full history", full)
+    report(f"compacted (keep {args.keep_turns})", compacted)
+    print(f"final draft: {compacted['draft']}")
+
+    if args.per_turn:
+        for i, (a, b) in enumerate(zip(full["requests"], compacted["requests"])):
+            print(
+                f"  request {i:2d}: full={a['prompt_tokens']:5d} (cached {a['cached_tokens']:5d})  "
+                f"compacted={b['prompt_tokens']:5d} (cached {b['cached_tokens']:5d})"
+            )
+
+    await get_ticket_writer().aclose()
+    await async_engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
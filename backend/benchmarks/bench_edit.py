@@ -0,0 +1,161 @@
+"""Ticket edits: read-modify-write vs one UPDATE ... RETURNING vs the batch-edit API path.
+
+Seeds --tickets tickets, then applies --edits random edits three ways and counts the
+statements each sends to the database (every execute plus the COMMIT):
+
+- read-modify-write, the old edit path: SELECT the ticket, assign in Python, flush an
+  UPDATE, COMMIT, then ``refresh`` with another SELECT.
+- ``async_crud.edit_ticket``: one ``UPDATE ... SET <given fields> RETURNING`` and COMMIT.
+- ``async_crud.edit_tickets`` with --batch edits per call, as ``PATCH /api/tickets`` does.
+
+Half the edits change contact fields only; the other half change issue and price and
+so also update the hourly stats. Afterwards the stats are checked against a rebuild.
+
+    python benchmarks/bench_edit.py --tickets 20000 --edits 2000 --batch 50
+"""
+import argparse
+import asyncio
+import random
+import time
+from contextlib import contextmanager
+
+from bench_utils import bootstrap, summarize
+
+bootstrap("edit.db")
+
+from sqlalchemy import event  # noqa: E402
+from async_crud import (  # noqa: E402
+    apply_ticket_stats,
+    edit_ticket,
+    edit_tickets,
+    get_ticket_stats,
+    insert_tickets,
+    rebuild_ticket_stats,
+)
+from async_db import AsyncSessionLocal, async_engine  # noqa: E402
+from issues import ISSUE_CATALOG  # noqa: E402
+from models import SupportTicket  # noqa: E402
+from ticket_stats import StatsDelta  # noqa: E402
+
+class StatementCounter:
+    """Counts statements and commits sent over the engine's connections"""
+
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+        event.listen(engine, "commit", self._on_execute)
+
+    def _on_execute(self, *args, **kwargs):
+        self.count += 1
+
+    @contextmanager
+    def measure(self, results: list):
+        before = self.count
+        yield
+        results.append(self.count - before)
+
+async def seed(count: int, rng: random.Random) -> list[int]:
+    ids = []
+    async with AsyncSessionLocal() as db:
+        for start in range(0, count, 1000):
+            batch = []
+            for _ in range(min(1000, count - start)):
+                issue = rng.choice(ISSUE_CATALOG)
+                batch.append(dict(
+                    name="Jane Doe", email="jane@example.com", phone="555-0100", address="1 Main St",
+                    issue=issue.name, price=issue.price,
+                ))
+            ids.extend(await insert_tickets(db, batch))
+            await db.commit()
+    return ids
+
+def random_edits(ids: list[int], count: int, rng: random.Random) -> list[tuple[int, dict]]:
+    edits = []
+    for n in range(count):
+        if n % 2:
+            issue = rng.choice(ISSUE_CATALOG)
+            values = {"issue": issue.name, "price": round(issue.price + rng.uniform(0, 5), 2)}
+        else:
+            values = {"phone": f"555-{rng.randrange(10000):04d}", "email": f"caller{n}@example.com"}
+        edits.append((rng.choice(ids), values))
+    return edits
+
+async def read_modify_write(db, ticket_id: int, values: dict):
+    """The edit path before UPDATE ... RETURNING"""
+    ticket = await db.get(SupportTicket, ticket_id)
+    if not ticket:
+        return None
+    old_issue, old_price = ticket.issue, ticket.price
+    for field, value in values.items():
+        setattr(ticket, field, value)
+    delta = StatsDelta()
+    delta.move(ticket.created_at, old_issue, old_price, ticket.issue, ticket.price)
+    await apply_ticket_stats(db, delta)
+    await db.commit()
+    await db.refresh(ticket)
+    return ticket
+
+async def run_single(edit, edits, counter: StatementCounter) -> tuple[list[float], list[int]]:
+    durations, statements = [], []
+    for ticket_id, values in edits:
+        # A fresh session per edit, like one API request or tool call
+        async with AsyncSessionLocal() as db:
+            with counter.measure(statements):
+                started = time.perf_counter()
+                ticket = await edit(db, ticket_id, values)
+                durations.append(time.perf_counter() - started)
+        assert ticket is not None and all(getattr(ticket, f) == v for f, v in values.items())
+    return durations, statements
+
+async def run_batched(edits, batch: int, counter: StatementCounter) -> tuple[list[float], list[int]]:
+    durations, statements = [], []
+    for start in range(0, len(edits), batch):
+        chunk = dict(edits[start:start + batch])
+        async with AsyncSessionLocal() as db:
+            with counter.measure(statements):
+                started = time.perf_counter()
+                updated = await edit_tickets(db, chunk)
+                durations.append(time.perf_counter() - started)
+        assert len(updated) == len(chunk)
+    return durations, statements
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tickets", type=int, default=20000)
+    parser.add_argument("--edits", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=50)
+    args = parser.parse_args()
+    rng = random.Random(11)
+    ids = await seed(args.tickets, rng)
+    counter = StatementCounter(async_engine.sync_engine)
+
+    async def update_returning(db, ticket_id, values):
+        return await edit_ticket(db, ticket_id, **values)
+
+    for label, edit in (("read-modify-write", read_modify_write), ("UPDATE ... RETURNING", update_returning)):
+        for kind, edits in (
+            ("contact", [e for e in random_edits(ids, args.edits, rng) if "phone" in e[1]]),
+            ("issue/price", [e for e in random_edits(ids, args.edits, rng) if "issue" in e[1]]),
+        ):
+            durations, statements = await run_single(edit, edits, counter)
+            print(
+                f"{label:20s} {kind:11s} {sum(statements) / len(statements):.1f} statements/edit  "
+                f"{summarize('latency', durations)}"
+            )
+
+    edits = random_edits(ids, args.edits, rng)
+    durations, statements = await run_batched(edits, args.batch, counter)
+    per_edit = [d / args.batch for d in durations]
+    print(
+        f"{'batch edit':20s} {'mixed':11s} {sum(statements) / len(edits):.2f} statements/edit  "
+        f"{summarize(f'per edit, {args.batch}/call', per_edit)}"
+    )
+
+    async with AsyncSessionLocal() as db:
+        incremental = await get_ticket_stats(db, hours=24 * 31)
+        await rebuild_ticket_stats(db)
+        print(f"stats after edits == rebuilt: {incremental == await get_ticket_stats(db, hours=24 * 31)}")
+    await async_engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
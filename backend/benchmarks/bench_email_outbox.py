@@ -0,0 +1,272 @@
+"""Confirmation-email outbox drained into a local aiosmtpd server.
+
+Seeds --backlog tickets through ``insert_tickets`` (each writes its outbox row in
+the ticket's transaction) and drains them with ``EmailDispatcher`` into an
+in-process aiosmtpd server that takes --smtp-ms per message, like a relay would.
+
+- transactional outbox: a ticket transaction that rolls back leaves no email behind.
+- throughput: the whole backlog with a new SMTP connection per message, then with
+  pooled connections of --pools sizes.
+- retries: --flaky of the recipients get a 451 on their first attempt and --bounce
+  a 550; the first are retried with backoff, the second given up on at once.
+- crash: the dispatcher is killed after sending a batch but before marking it
+  sent; once the lease runs out those emails go out again (at least once).
+
+    python benchmarks/bench_email_outbox.py --backlog 10000 --pools 1,4,16
+"""
+import argparse
+import asyncio
+import collections
+import logging
+import multiprocessing
+import random
+import socket
+import time
+from datetime import datetime, timezone
+
+from bench_utils import bootstrap, summarize
+
+bootstrap("email_outbox.db")
+
+import aiosmtplib  # noqa: E402
+from aiosmtpd.controller import Controller  # noqa: E402
+from sqlalchemy import func, select, update  # noqa: E402
+from async_crud import insert_tickets  # noqa: E402
+from async_db import AsyncSessionLocal  # noqa: E402
+import email_outbox  # noqa: E402
+from email_outbox import FAILED, PENDING, SENT, EmailDispatcher, SMTPPool  # noqa: E402
+from issues import ISSUE_CATALOG  # noqa: E402
+from models import EmailOutbox  # noqa: E402
+
+class Relay:
+    """aiosmtpd handler: records deliveries, optionally refusing some recipients"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.flaky: set[str] = set()
+        self.bounce: set[str] = set()
+        self.deliveries = collections.Counter()
+        self.connections = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.connections += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address in self.bounce:
+            return "550 5.1.1 No such user"
+        if address in self.flaky:
+            self.flaky.discard(address)
+            return "451 4.3.0 Try again later"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        await asyncio.sleep(self.delay)
+        message_id = next(
+            line.split(":", 1)[1].strip() for line in envelope.content.decode().splitlines()
+            if line.lower().startswith("message-id:")
+        )
+        self.deliveries[message_id] += 1
+        return "250 Message accepted for delivery"
+
+def run_relay(port: int, delay: float, conn):
+    """The relay in its own process, so it does not share the dispatcher's GIL"""
+    relay = Relay(delay)
+    controller = Controller(relay, hostname="127.0.0.1", port=port)
+    controller.start()
+    conn.send(None)
+    while True:
+        command, arg = conn.recv()
+        if command == "stop":
+            break
+        if command == "reset":
+            relay.deliveries.clear()
+            relay.connections = 0
+        elif command == "refuse":
+            relay.flaky, relay.bounce = arg
+        conn.send((dict(relay.deliveries), relay.connections))
+    controller.stop()
+
+class RelayProcess:
+    def __init__(self, delay: float):
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            self.port = probe.getsockname()[1]
+        context = multiprocessing.get_context("spawn")
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=run_relay, args=(self.port, delay, child), daemon=True)
+        self.process.start()
+        self.conn.recv()
+
+    def call(self, command: str, arg=None) -> tuple[dict, int]:
+        """Deliveries by Message-ID and SMTP connections opened, after running ``command``"""
+        self.conn.send((command, arg))
+        return self.conn.recv()
+
+    def stop(self):
+        self.conn.send(("stop", None))
+        self.process.join(5)
+
+def ticket(n: int, rng: random.Random) -> dict:
+    issue = rng.choice(ISSUE_CATALOG)
+    return dict(
+        name=f"Caller {n}", email=f"caller{n}@example.com", phone="555-0100", address="1 Main St",
+        issue=issue.name, price=issue.price,
+    )
+
+async def seed(count: int) -> list[int]:
+    rng, ids = random.Random(11), []
+    async with AsyncSessionLocal() as db:
+        for start in range(0, count, 1000):
+            ids.extend(await insert_tickets(db, [ticket(n, rng) for n in range(start, min(count, start + 1000))]))
+            await db.commit()
+    return ids
+
+async def outbox_counts() -> dict:
+    async with AsyncSessionLocal() as db:
+        rows = await db.execute(select(EmailOutbox.status, func.count()).group_by(EmailOutbox.status))
+        return dict(rows.all())
+
+async def reset_outbox():
+    async with AsyncSessionLocal() as db:
+        await db.execute(update(EmailOutbox).values(
+            status=PENDING, attempts=0, next_attempt_at=datetime.now(timezone.utc), sent_at=None, last_error=None,
+        ))
+        await db.commit()
+
+async def rollback_leaves_nothing():
+    async with AsyncSessionLocal() as db:
+        before = await db.scalar(select(func.count()).select_from(EmailOutbox))
+        await insert_tickets(db, [ticket(-1, random.Random(0))])
+        pending = await db.scalar(select(func.count()).select_from(EmailOutbox))
+        await db.rollback()
+        after = await db.scalar(select(func.count()).select_from(EmailOutbox))
+    print(f"transactional outbox: {pending - before} email row inside the ticket transaction, {after - before} after rollback")
+    assert pending == before + 1 and after == before
+
+class ConnectPerMessage:
+    """Baseline: a new SMTP connection for every message"""
+
+    def __init__(self, port: int, size: int):
+        self.port = port
+        self.slots = asyncio.Semaphore(size)
+
+    async def send(self, sender: str, recipient: str, message: bytes):
+        async with self.slots:
+            await aiosmtplib.send(
+                message, sender=sender, recipients=[recipient], hostname="127.0.0.1", port=self.port, start_tls=False
+            )
+
+    async def close(self):
+        pass
+
+async def drain(label: str, dispatcher: EmailDispatcher, relay: RelayProcess) -> dict:
+    """Dispatch until nothing is pending; returns deliveries by Message-ID"""
+    before = sum(relay.call("stats")[0].values())
+    batch_time = []
+    started = time.perf_counter()
+    while True:
+        batch_started = time.perf_counter()
+        claimed = await dispatcher.dispatch_once()
+        if not claimed:
+            if not (await outbox_counts()).get(PENDING):
+                break
+            # Only backed-off retries are left
+            await asyncio.sleep(0.05)
+            continue
+        batch_time.append(time.perf_counter() - batch_started)
+    elapsed = time.perf_counter() - started
+    await dispatcher.pool.close()
+    deliveries, connections = relay.call("stats")
+    sent = sum(deliveries.values()) - before
+    print(f"{label}: {sent} delivered in {elapsed:.2f}s = {sent / elapsed:.0f} emails/s over {connections} SMTP connection(s)")
+    print("  " + summarize("batch", batch_time))
+    return deliveries
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--backlog", type=int, default=10000)
+    parser.add_argument("--pools", default="1,4,16", help="SMTP pool sizes to compare")
+    parser.add_argument("--batch", type=int, default=200)
+    parser.add_argument("--smtp-ms", type=float, default=5.0, help="time the relay takes to accept one message")
+    parser.add_argument("--flaky", type=float, default=0.05, help="share of recipients refused once with 451")
+    parser.add_argument("--bounce", type=float, default=0.005, help="share of recipients refused with 550")
+    args = parser.parse_args()
+    pools = [int(size) for size in args.pools.split(",")]
+    # Failures are counted below; keep the dispatcher's per-email warnings out of the report
+    logging.getLogger("agent").setLevel(logging.CRITICAL)
+    relay = RelayProcess(args.smtp_ms / 1000)
+
+    def dispatcher(pool, **options) -> EmailDispatcher:
+        return EmailDispatcher(pool, batch_size=args.batch, retry_base=0.05, retry_max=0.5, **options)
+
+    def smtp_pool(size: int) -> SMTPPool:
+        return SMTPPool(hostname="127.0.0.1", port=relay.port, size=size, tls="none")
+
+    try:
+        await rollback_leaves_nothing()
+        started = time.perf_counter()
+        ids = await seed(args.backlog)
+        print(f"seeded {len(ids)} tickets with their outbox rows in {time.perf_counter() - started:.2f}s")
+
+        relay.call("reset")
+        await drain(f"connection per message x{max(pools)}", dispatcher(ConnectPerMessage(relay.port, max(pools))), relay)
+        for size in pools:
+            await reset_outbox()
+            relay.call("reset")
+            deliveries = await drain(f"pool of {size}", dispatcher(smtp_pool(size)), relay)
+            assert len(deliveries) == len(ids) and set(deliveries.values()) == {1}
+
+        # Transient (451) refusals are retried with backoff, permanent (550) ones given up on
+        await reset_outbox()
+        rng = random.Random(7)
+        recipients = [f"caller{n}@example.com" for n in range(len(ids))]
+        bounce = set(rng.sample(recipients, int(len(ids) * args.bounce)))
+        flaky = set(rng.sample(sorted(set(recipients) - bounce), int(len(ids) * args.flaky)))
+        relay.call("reset")
+        relay.call("refuse", (flaky, bounce))
+        await drain(f"pool of {max(pools)} with failures", dispatcher(smtp_pool(max(pools))), relay)
+        relay.call("refuse", (set(), set()))
+        counts = await outbox_counts()
+        async with AsyncSessionLocal() as db:
+            attempts = collections.Counter((await db.scalars(select(EmailOutbox.attempts))).all())
+        print(
+            f"  {len(flaky)} refused once with 451, {len(bounce)} with 550: "
+            f"sent={counts.get(SENT, 0)} failed={counts.get(FAILED, 0)} pending={counts.get(PENDING, 0)}, "
+            f"attempts per email {dict(sorted(attempts.items()))}"
+        )
+        assert counts.get(SENT, 0) == len(ids) - len(bounce) and counts.get(FAILED, 0) == len(bounce)
+
+        # Killed after sending a batch but before marking it sent: once the lease runs
+        # out the restarted dispatcher sends that batch again
+        await reset_outbox()
+        relay.call("reset")
+        crashing = dispatcher(smtp_pool(max(pools)), lease_seconds=1.0)
+
+        async def killed(*_):
+            raise SystemExit("dispatcher killed")
+
+        record, email_outbox.record_email_results = email_outbox.record_email_results, killed
+        try:
+            await crashing.dispatch_once()
+        except SystemExit:
+            pass
+        finally:
+            email_outbox.record_email_results = record
+        await crashing.pool.close()
+        lost = sum(relay.call("stats")[0].values())
+        await asyncio.sleep(1.1)
+        deliveries = await drain("restarted dispatcher after the lease", dispatcher(smtp_pool(max(pools))), relay)
+        duplicates = sum(count - 1 for count in deliveries.values())
+        print(
+            f"  {lost} emails sent before the crash; all {len(deliveries)} delivered at least once, "
+            f"{duplicates} twice (same Message-ID)"
+        )
+        assert len(deliveries) == len(ids) and duplicates == lost
+    finally:
+        relay.stop()
+
+if __name__ == "__main__":
+    asyncio.run(main())
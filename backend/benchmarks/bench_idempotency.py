@@ -0,0 +1,96 @@
+"""Duplicate create_ticket suppression under retries.
+
+Each simulated room issues its create_ticket --attempts times: the first pair races
+(a preemptive generation and the confirmed reply), the rest arrive later (a
+false-interruption regenerate). Runs once writing every call and once through
+TicketDeduplicator, then counts rows and times the duplicate path.
+
+    python benchmarks/bench_idempotency.py --rooms 500 --attempts 3
+"""
+import argparse
+import asyncio
+import time
+
+from bench_utils import bootstrap, summarize
+
+bootstrap("idempotency.db")
+
+from sqlalchemy import func, select  # noqa: E402
+from async_db import AsyncSessionLocal, async_engine  # noqa: E402
+from idempotency import TicketDeduplicator, idempotency_key  # noqa: E402
+from models import SupportTicket  # noqa: E402
+from ticket_writer import TicketWriter  # noqa: E402
+
+def ticket(room: int) -> dict:
+    return dict(
+        name="Jane Doe",
+        email=f"caller{room}@example.com",
+        phone="555-0100",
+        address="1 Main St",
+        issue="wifi not working",
+        price=20.0,
+    )
+
+async def count_tickets() -> int:
+    async with AsyncSessionLocal() as db:
+        return await db.scalar(select(func.count()).select_from(SupportTicket))
+
+async def run(rooms: int, attempts: int, dedupe: bool, prefix: str) -> dict:
+    writer = TicketWriter()
+    deduplicator = TicketDeduplicator(max_entries=rooms * 2)
+    latencies = {"first": [], "duplicate": []}
+    before = await count_tickets()
+
+    async def attempt(room: int):
+        fields = ticket(room)
+        room_name = f"support-{prefix}-{room}"
+        key = idempotency_key(room_name, fields["email"], fields["phone"], fields["issue"])
+        started = time.perf_counter()
+        if dedupe:
+            _, created = await deduplicator.create_once(
+                key, lambda: writer.create_ticket(idempotency_key=key, room=room_name, **fields)
+            )
+        else:
+            await writer.create_ticket(**fields)
+            created = True
+        latencies["first" if created else "duplicate"].append(time.perf_counter() - started)
+
+    async def call(room: int):
+        await asyncio.gather(attempt(room), attempt(room))
+        for _ in range(attempts - 2):
+            await asyncio.sleep(0.05)
+            await attempt(room)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(call(room) for room in range(rooms)))
+    elapsed = time.perf_counter() - started
+    await writer.aclose()
+    return {
+        "rows": await count_tickets() - before,
+        "elapsed": elapsed,
+        "latencies": latencies,
+        "suppressed": deduplicator.duplicates,
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rooms", type=int, default=500)
+    parser.add_argument("--attempts", type=int, default=3, help="create_ticket calls per room (>= 2)")
+    args = parser.parse_args()
+    attempts = max(2, args.attempts)
+    calls = args.rooms * attempts
+
+    stamp = int(time.time())
+    plain = await run(args.rooms, attempts, dedupe=False, prefix=f"plain-{stamp}")
+    print(f"without dedup: {calls} calls -> {plain['rows']} rows in {plain['elapsed']:.2f}s")
+    deduped = await run(args.rooms, attempts, dedupe=True, prefix=f"dedup-{stamp}")
+    print(
+        f"with dedup:    {calls} calls -> {deduped['rows']} rows in {deduped['elapsed']:.2f}s "
+        f"({deduped['suppressed']} duplicates suppressed)"
+    )
+    print("  " + summarize("first create", deduped["latencies"]["first"]))
+    print("  " + summarize("duplicate", deduped["latencies"]["duplicate"]))
+    await async_engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
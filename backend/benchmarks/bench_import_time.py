@@ -0,0 +1,109 @@
+"""Import cost of each entry point and API server time to first /health response.
+
+Each measurement runs in a fresh interpreter from app/:
+
+- ``python -X importtime -c "import <module>"`` for main, api_server and livekit_agent:
+  cumulative import time, peak RSS and the heaviest top-level packages (which overlap
+  when one imports another).
+- time from spawning an API worker to its first 200 from ``GET /health``, started the
+  way main.py does now (only api_server) and the way it used to (livekit_agent, and
+  with it every provider plugin, imported before the server starts).
+
+    python benchmarks/bench_import_time.py --runs 5
+"""
+import argparse
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+from bench_utils import APP_DIR, bootstrap
+
+bootstrap("import_time.db")
+
+ENV = dict(os.environ)
+for key in ("OPENAI_API_KEY", "DEEPGRAM_API_KEY", "CARTESIA_API_KEY"):
+    ENV.setdefault(key, "offline-benchmark")
+ENV.pop("PROMETHEUS_MULTIPROC_DIR", None)
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|\s*(\S+)")
+
+SERVE = (
+    "import uvicorn\n"
+    "{preload}"
+    "uvicorn.run('api_server:app', host='127.0.0.1', port={port}, log_level='warning')\n"
+)
+
+def import_profile(module: str) -> tuple[float, list[tuple[str, float]], int]:
+    """Cumulative import seconds, heaviest top-level packages and peak RSS (KiB) for one module"""
+    code = f"import resource, {module}; print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=APP_DIR, env=ENV, capture_output=True, text=True, check=True,
+    )
+    packages, total = {}, 0.0
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        cumulative, name = int(match.group(2)) / 1e6, match.group(3)
+        # A top-level package is listed once, where it is first imported; nested ones overlap
+        if "." not in name and name != module:
+            packages[name] = cumulative
+        if name == module:
+            total = cumulative
+    heaviest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:5]
+    return total, heaviest, int(result.stdout.strip().splitlines()[-1])
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def time_to_health(preload: str, timeout: float = 60.0) -> float:
+    """Seconds from spawning a server process to its first successful /health"""
+    port = free_port()
+    code = SERVE.format(preload=f"import {preload}\n" if preload else "", port=port)
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-c", code], cwd=APP_DIR, env=ENV,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError("API server never became healthy")
+    finally:
+        server.terminate()
+        server.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    for module in ("main", "api_server", "livekit_agent"):
+        runs = [import_profile(module) for _ in range(args.runs)]
+        total = statistics.median(run[0] for run in runs)
+        rss = statistics.median(run[2] for run in runs) / 1024
+        heaviest = ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in runs[-1][1])
+        print(f"import {module:14s} {total * 1000:7.0f}ms  peak RSS {rss:6.1f}MiB  ({heaviest})")
+
+    for label, preload in (("api_server only", ""), ("livekit_agent preloaded", "livekit_agent")):
+        samples = [time_to_health(preload) for _ in range(args.runs)]
+        print(
+            f"first /health, {label:24s} median={statistics.median(samples) * 1000:.0f}ms "
+            f"max={max(samples) * 1000:.0f}ms"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Accuracy and speed of issue classification: dict-order substring loop vs compiled matcher.
+
+Accuracy is measured on issue_corpus.jsonl (caller utterance -> expected canonical
+issue); the script exits non-zero if the compiled matcher falls below --min-accuracy.
+
+    python benchmarks/bench_issue_matcher.py
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+from bench_utils import APP_DIR
+
+sys.path.insert(0, APP_DIR)
+
+from prompt import CANONICAL_KEYWORDS, PRICES, canonicalize_issue  # noqa: E402
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "issue_corpus.jsonl")
+
+# The original keyword table and loop, kept here as the baseline
+LEGACY_KEYWORDS = {
+    "wifi": "wifi not working",
+    "internet": "wifi not working",
+    "email": "email login issues",
+    "password": "email login issues",
+    "slow": "slow laptop performance",
+    "laptop slow": "slow laptop performance",
+    "printer": "printer problems",
+    "ink": "printer problems",
+    "power": "printer problems",
+}
+
+def substring_loop(keywords: dict):
+    def classify(user_text: str) -> str:
+        t = user_text.lower()
+        for k, v in keywords.items():
+            if k in t:
+                return v
+        for price in PRICES.keys():
+            if price in t:
+                return price
+        return "unsupported"
+    return classify
+
+def load_corpus():
+    with open(CORPUS_PATH) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def accuracy(classify, corpus) -> tuple[float, list]:
+    misses = [row for row in corpus if classify(row["text"]) != row["expected"]]
+    return 1 - len(misses) / len(corpus), misses
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--min-accuracy", type=float, default=0.95)
+    parser.add_argument("--number", type=int, default=20_000)
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    texts = [row["text"] for row in corpus]
+    print(f"corpus: {len(corpus)} utterances, {len(CANONICAL_KEYWORDS)} keywords")
+
+    results = {}
+    classifiers = (
+        ("legacy loop", substring_loop(LEGACY_KEYWORDS)),
+        ("catalog loop", substring_loop(CANONICAL_KEYWORDS)),
+        ("compiled matcher", canonicalize_issue),
+    )
+    for label, classify in classifiers:
+        score, misses = accuracy(classify, corpus)
+        seconds = timeit.timeit(lambda: [classify(t) for t in texts], number=args.number // len(texts) or 1)
+        per_call = seconds / ((args.number // len(texts) or 1) * len(texts))
+        results[label] = score
+        print(f"{label:17s} accuracy={score:6.1%} {per_call * 1e6:6.2f}us/call")
+        for row in misses:
+            print(f"    miss: {row['text']!r} -> {classify(row['text'])!r} (expected {row['expected']!r})")
+
+    if results["compiled matcher"] < args.min_accuracy:
+        sys.exit(f"compiled matcher accuracy below {args.min_accuracy:.0%}")
+
+if __name__ == "__main__":
+    main()
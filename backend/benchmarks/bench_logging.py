@@ -0,0 +1,88 @@
+"""Event-loop cost per log call: synchronous handler with eager f-strings vs the queued pipeline.
+
+"before" is how the agent logged: f-strings built at the call site and a StreamHandler
+formatting and writing (one flush per record) on the calling thread, plus every
+metrics event logged. "after" is agent_logging.setup_logging: lazy %-args, records
+handed to a queue, JSON formatting, redaction and I/O on the listener thread, and
+metrics logs sampled per turn. Both write to a temporary file.
+
+    python benchmarks/bench_logging.py --calls 5000
+"""
+import argparse
+import asyncio
+import logging
+import tempfile
+import time
+import uuid
+
+from bench_utils import bootstrap, summarize
+
+bootstrap("logging.db")
+
+from livekit.agents import metrics  # noqa: E402
+from agent_logging import Sensitive, TurnSampler, setup_logging, shutdown_logging  # noqa: E402
+from config import config  # noqa: E402
+
+NAME, EMAIL, PHONE, ADDRESS, ISSUE = "Jane Doe", "jane@example.com", "555-0100", "12 Main St", "wifi not working"
+
+def llm_metrics(speech_id: str) -> metrics.LLMMetrics:
+    return metrics.LLMMetrics(
+        label="openai.LLM", request_id=uuid.uuid4().hex, timestamp=time.time(), duration=0.8,
+        ttft=0.3, cancelled=False, completion_tokens=40, prompt_tokens=2000,
+        prompt_cached_tokens=1600, total_tokens=2040, tokens_per_second=50.0, speech_id=speech_id,
+    )
+
+def tool_call_logs_before(logger: logging.Logger, ticket_id: int):
+    logger.info(f"Creating ticket for {NAME} with issue: {ISSUE}")
+    logger.info(f"Ticket details - Name: {NAME}, Address: {ADDRESS}, Issue: {ISSUE}")
+    logger.info(f"Ticket {ticket_id} created successfully")
+
+def tool_call_logs_after(logger: logging.Logger, ticket_id: int):
+    logger.info(
+        "Creating ticket for %s (%s, %s) at %s with issue: %s",
+        Sensitive(NAME), EMAIL, PHONE, Sensitive(ADDRESS), ISSUE,
+    )
+    logger.info("Ticket %s created successfully", ticket_id)
+
+async def measure(label: str, calls: int, interval: float, tool_logs, metrics_logger, sampler, logger):
+    """Time each tool call's and metrics event's log calls on the loop, spaced like real turns"""
+    durations = []
+    for i in range(calls):
+        m = llm_metrics(f"speech_{i}")
+        started = time.perf_counter()
+        tool_logs(logger, i)
+        if sampler is None or sampler.sample(m.speech_id):
+            metrics.log_metrics(m, logger=metrics_logger)
+        durations.append(time.perf_counter() - started)
+        await asyncio.sleep(interval)
+    print(f"{label:6s} " + summarize("loop time per tool call + metrics event", durations, unit="us", scale=1e6))
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=5000)
+    parser.add_argument("--interval", type=float, default=0.001, help="pause between simulated turns (s)")
+    args = parser.parse_args()
+
+    with tempfile.NamedTemporaryFile("w", suffix=".log") as before_file:
+        handler = logging.StreamHandler(before_file)
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        before_logger = logging.getLogger("bench.before")
+        before_logger.handlers = [handler]
+        before_logger.setLevel(logging.INFO)
+        before_logger.propagate = False
+        await measure("before", args.calls, args.interval, tool_call_logs_before, before_logger, None, before_logger)
+
+    with tempfile.NamedTemporaryFile("w", suffix=".log") as after_file:
+        setup_logging(stream=after_file)
+        after_logger = logging.getLogger("agent")
+        sampler = TurnSampler(config.LOG_METRICS_SAMPLE_RATE)
+        await measure("after", args.calls, args.interval, tool_call_logs_after, logging.getLogger("agent.metrics"), sampler, after_logger)
+        drain_started = time.perf_counter()
+        shutdown_logging()
+        print(f"listener thread drained the rest in {time.perf_counter() - drain_started:.3f}s (off the loop)")
+        after_file.flush()
+        with open(after_file.name) as written:
+            print("sample record: " + written.readline().strip())
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,63 @@
+"""Event-loop lag while many agent sessions write tickets concurrently.
+
+Compares the old path (sync ``crud`` on a ``SessionLocal`` called straight from the
+event loop) with the async data-access layer used by the agent's function tools.
+
+    python benchmarks/bench_loop_lag.py --sessions 10 50 200
+"""
+import argparse
+import asyncio
+
+from bench_utils import LoopLagMonitor, bootstrap, summarize
+
+bootstrap("loop_lag.db")
+
+import async_crud  # noqa: E402
+import crud  # noqa: E402
+from async_db import AsyncSessionLocal, async_engine  # noqa: E402
+from db import SessionLocal  # noqa: E402
+
+TICKET = dict(
+    name="Jane Doe",
+    email="jane@example.com",
+    phone="555-0100",
+    address="1 Main St",
+    issue="wifi not working",
+    price=20.0,
+)
+
+async def sync_session(writes: int):
+    for _ in range(writes):
+        db = SessionLocal()
+        try:
+            crud.create_ticket(db=db, **TICKET)
+        finally:
+            db.close()
+        await asyncio.sleep(0)
+
+async def async_session(writes: int):
+    for _ in range(writes):
+        async with AsyncSessionLocal() as db:
+            await async_crud.create_ticket(db=db, **TICKET)
+
+async def run(kind: str, sessions: int, writes: int):
+    monitor = LoopLagMonitor()
+    monitor.start()
+    target = sync_session if kind == "sync" else async_session
+    await asyncio.gather(*(target(writes) for _ in range(sessions)))
+    await monitor.stop()
+    print(summarize(f"{kind:5s} sessions={sessions:4d} loop lag", monitor.samples))
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--writes", type=int, default=3, help="tickets written per session")
+    args = parser.parse_args()
+
+    for sessions in args.sessions:
+        for kind in ("sync", "async"):
+            await run(kind, sessions, args.writes)
+    await async_engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+"""OFFSET vs keyset (created_at, id) page fetches on a large support_tickets table.
+
+    python benchmarks/bench_pagination.py --rows 1000000 --page-size 100
+"""
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+
+from bench_utils import bootstrap
+
+bootstrap("pagination.db")
+
+from sqlalchemy import func, insert, select  # noqa: E402
+import crud  # noqa: E402
+from db import SessionLocal, engine  # noqa: E402
+from models import SupportTicket  # noqa: E402
+
+ISSUES = ["wifi not working", "email login issues", "slow laptop performance", "printer problems"]
+
+def seed(rows: int, chunk: int = 50_000):
+    with SessionLocal() as db:
+        existing = db.scalar(select(func.count()).select_from(SupportTicket))
+    if existing >= rows:
+        return
+    start_time = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        for offset in range(existing, rows, chunk):
+            conn.execute(insert(SupportTicket), [
+                {
+                    "name": f"Caller {i}",
+                    "email": f"caller{i % 50_000}@example.com",
+                    "phone": f"555-{i % 10_000:04d}",
+                    "address": f"{i} Main St",
+                    "issue": ISSUES[i % len(ISSUES)],
+                    "price": 10.0 + i % 4 * 5,
+                    "created_at": start_time + timedelta(seconds=i * 30),
+                }
+                for i in range(offset, min(rows, offset + chunk))
+            ])
+    print(f"seeded {rows - existing} rows in {time.perf_counter() - started:.1f}s")
+
+def offset_page(db, skip: int, limit: int) -> list[SupportTicket]:
+    """The OFFSET pagination the API used to serve, kept here as the baseline"""
+    query = select(SupportTicket).order_by(SupportTicket.created_at, SupportTicket.id).offset(skip).limit(limit)
+    return list(db.scalars(query).all())
+
+def timed(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--page-size", type=int, default=100)
+    args = parser.parse_args()
+
+    seed(args.rows)
+    print(f"{'depth':>10s} {'offset':>12s} {'keyset':>12s}")
+    with SessionLocal() as db:
+        for fraction in (0.0, 0.1, 0.5, 0.9, 0.999):
+            skip = int(args.rows * fraction)
+            page = offset_page(db, skip, 1)
+            after = crud.decode_cursor(crud.encode_cursor(page[0])) if page else None
+            offset_time = timed(lambda: offset_page(db, skip, args.page_size))
+            keyset_time = timed(lambda: crud.get_tickets_page(db, limit=args.page_size, after=after))
+            print(f"{skip:>10d} {offset_time * 1000:>10.2f}ms {keyset_time * 1000:>10.2f}ms")
+
+        email = "caller4242@example.com"
+        lookup_time = timed(lambda: crud.find_tickets_by_email(db, email))
+        print(f"find_tickets_by_email: {lookup_time * 1000:.2f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Tail latency while one provider degrades: single provider vs breaker-backed chains vs hedged TTS.
+
+Every configuration runs --jobs concurrent simulated sessions in one process, each
+making --requests sequential LLM or TTS calls with the session's default connection
+options (3 retries). The primary fake is degraded for the whole run: a share of its
+calls are very slow and some fail. The fallback fake is slower when healthy but
+steady. Latency is time to the first token / audio frame; a failure is a call that
+raised after all retries and fallbacks.
+
+    python benchmarks/bench_resilience.py --jobs 20 --requests 30
+"""
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+
+from bench_utils import bootstrap, summarize
+
+# Breaker state left over from an earlier run would skew this one
+os.environ["BREAKER_STORE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="deskhelp-breakers-"), "breakers.sqlite3")
+bootstrap("resilience.db")
+
+from livekit.agents import DEFAULT_API_CONNECT_OPTIONS, llm, tts  # noqa: E402
+from fakes import FlakyLLM, FlakyTTS, ProviderFaults  # noqa: E402
+from resilience import HedgedTTS, get_breaker, provider_name, with_breakers  # noqa: E402
+
+def degraded(latency: float, seed: int, args) -> ProviderFaults:
+    return ProviderFaults(
+        latency, slow_latency=args.slow_latency, slow_rate=args.slow_rate, error_rate=args.error_rate, seed=seed
+    )
+
+async def first_token(model: llm.LLM):
+    chat_ctx = llm.ChatContext.empty()
+    chat_ctx.add_message(role="user", content="My wifi is not working")
+    async with model.chat(chat_ctx=chat_ctx, conn_options=DEFAULT_API_CONNECT_OPTIONS) as stream:
+        async for _ in stream:
+            return
+
+async def first_audio(voice: tts.TTS):
+    async with voice.synthesize("For wifi not working, the fee is $20.", conn_options=DEFAULT_API_CONNECT_OPTIONS) as stream:
+        async for _ in stream:
+            return
+
+async def run(label: str, call, target, args):
+    latencies, failures = [], 0
+
+    async def session():
+        nonlocal failures
+        for _ in range(args.requests):
+            started = time.perf_counter()
+            try:
+                await call(target)
+                latencies.append(time.perf_counter() - started)
+            except Exception:
+                failures += 1
+            await asyncio.sleep(args.think)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(session() for _ in range(args.jobs)))
+    total = args.jobs * args.requests
+    print(f"{label:22s} {summarize('first response', latencies)} failed={failures}/{total} in {time.perf_counter() - started:.1f}s")
+    return target
+
+def set_recovery(instances, seconds: float):
+    for instance in instances:
+        get_breaker(provider_name(instance)).recovery_timeout = seconds
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--jobs", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=30)
+    parser.add_argument("--think", type=float, default=0.05, help="pause between a session's calls (s)")
+    parser.add_argument("--slow-rate", type=float, default=0.3, help="share of primary calls that stall")
+    parser.add_argument("--slow-latency", type=float, default=3.0, help="stall length (s)")
+    parser.add_argument("--error-rate", type=float, default=0.1, help="share of primary calls that fail")
+    parser.add_argument("--recovery", type=float, default=2.0, help="breaker open time before probing (s)")
+    parser.add_argument("--hedge-ms", type=float, default=400)
+    parser.add_argument("--verbose", action="store_true", help="show failover and breaker logs")
+    args = parser.parse_args()
+    if not args.verbose:
+        logging.getLogger("livekit.agents").setLevel(logging.CRITICAL)
+        logging.getLogger("agent").setLevel(logging.CRITICAL)
+
+    print("LLM (primary ~300ms degraded, fallback ~450ms steady)")
+    await run("single provider", first_token, FlakyLLM("llm-single", degraded(0.3, 1, args)), args)
+    instances = [FlakyLLM("llm-primary", degraded(0.3, 1, args)), FlakyLLM("llm-fallback", ProviderFaults(0.45, seed=2))]
+    set_recovery(instances, args.recovery)
+    chain = llm.FallbackAdapter(with_breakers(instances, budget=1.0), attempt_timeout=5.0)
+    await run("breaker fallback chain", first_token, chain, args)
+
+    print("TTS (primary ~150ms degraded, fallback ~250ms steady)")
+    await run("single provider", first_audio, FlakyTTS("tts-single", degraded(0.15, 3, args)), args)
+    instances = [FlakyTTS("tts-primary", degraded(0.15, 3, args)), FlakyTTS("tts-fallback", ProviderFaults(0.25, seed=4))]
+    set_recovery(instances, args.recovery)
+    chain = tts.FallbackAdapter(with_breakers(instances, budget=0.6), max_retry_per_tts=0)
+    await run("breaker fallback chain", first_audio, chain, args)
+    instances = [FlakyTTS("tts-hedge-primary", degraded(0.15, 3, args)), FlakyTTS("tts-hedge-fallback", ProviderFaults(0.25, seed=4))]
+    set_recovery(instances, args.recovery)
+    hedged = await run("hedged", first_audio, HedgedTTS(instances, hedge_after=args.hedge_ms / 1000), args)
+    print(f"  hedges started: {hedged.hedges}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
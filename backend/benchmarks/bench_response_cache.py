@@ -0,0 +1,209 @@
+"""LLM response cache: hit rate, wrong answers and time to first token on replayed calls.
+
+Replays --calls scripted ticket calls (``fakes.conversation``) through
+``livekit_agent.Assistant`` in AgentSessions, --concurrency at a time. Each call
+also asks one to three recurring questions (out-of-scope devices, prices, what the
+desk handles) in one of several phrasings, casings and fillers, drawn with a
+Zipf-like skew, plus a one-off question nobody else asks. Calls are about different
+issues, and half ask what "it" will cost once the issue is known, whose answer
+depends on the call. ``fakes.ScriptedLLM``
+answers after --ttft seconds, with tool calls where the script has them.
+
+Every call gets a fresh ``ResponseCache`` on the same SQLite file, as each call's
+job process would. Runs: no cache, exact match only, and exact plus similarity at
+each --thresholds value. "wrong" counts cache hits whose reply differs from what
+the LLM would have said for that question.
+
+    python benchmarks/bench_response_cache.py --calls 300 --concurrency 30
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from bench_utils import bootstrap, summarize
+
+os.environ["RESPONSE_CACHE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="deskhelp-responses-"), "responses.sqlite3")
+bootstrap("response_cache.db")
+
+from livekit.agents import AgentSession  # noqa: E402
+import livekit_agent  # noqa: E402
+import response_cache  # noqa: E402
+from async_db import async_engine  # noqa: E402
+from config import config  # noqa: E402
+from fakes import ScriptedLLM, conversation  # noqa: E402
+from prompt import OUT_OF_SCOPE_REPLY, PRICES, price_confirmation  # noqa: E402
+from ticket_writer import get_ticket_writer  # noqa: E402
+
+SERVICES_REPLY = (
+    "We handle Wi-Fi not working for $20, email login issues for $15, slow laptop "
+    "performance for $25 and printer problems for $10. What can I help with?"
+)
+
+# (phrasings, the reply the prompt's rules lead to)
+QUESTIONS = [
+    (["Do you fix phones?", "Can you repair my phone?", "do you fix phone"], OUT_OF_SCOPE_REPLY),
+    (["Can you fix my TV?", "Do you do TV repairs?"], OUT_OF_SCOPE_REPLY),
+    (["What services do you offer?", "What do you fix?", "what kind of services do you offer"], SERVICES_REPLY),
+    (["How much is printer repair?", "How much for printer repair?", "how much is the printer repair"],
+     price_confirmation("printer problems")),
+    (["How much does the wifi fix cost?", "How much for wifi repair?"], price_confirmation("wifi not working")),
+    (["How much is email password reset?", "What does an email password reset cost?"],
+     price_confirmation("email login issues")),
+    (["How much to fix a slow laptop?", "What is the price for slow laptop repair?"],
+     price_confirmation("slow laptop performance")),
+    (["Can you fix my car?", "Do you repair cars?"], OUT_OF_SCOPE_REPLY),
+]
+# What each call is about, so follow-ups like "how much is it?" have a different answer per call
+CALL_ISSUES = [
+    ("My wifi is not working", "wifi not working"),
+    ("I can't sign in to my email", "email login issues"),
+    ("My laptop is really slow", "slow laptop performance"),
+    ("My printer keeps jamming", "printer problems"),
+]
+FOLLOW_UPS = ["How much is it going to cost?", "how much will that be", "What does that cost?"]
+ONE_OFF = ["my {}'s {} keeps beeping, can you look at it", "is the {} in the {} something you handle"]
+WORDS = ["kettle", "garage", "doorbell", "toaster", "drone", "tablet", "camera", "speaker", "fridge", "router",
+         "monitor", "keyboard", "scanner", "projector", "console", "watch", "headset", "modem"]
+
+def vary(text: str, rng: random.Random) -> str:
+    """What STT might hand over for the same question"""
+    if rng.random() < 0.3:
+        text = text.lower().rstrip("?")
+    if rng.random() < 0.2:
+        text = f"{rng.choice(['Um,', 'Hi,', 'Okay so', 'Hey'])} {text[0].lower()}{text[1:]}"
+    return text
+
+def build_calls(count: int, seed: int) -> list[list[dict]]:
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(QUESTIONS))]
+    calls = []
+    for caller in range(count):
+        script = conversation(caller)
+        text, issue = rng.choice(CALL_ISSUES)
+        script[3] = {"user": text, "reply": f"{price_confirmation(issue)} Shall I create the ticket?", "draft": {"issue": issue}}
+        name, arguments = script[4]["tool"]
+        script[4] = {**script[4], "tool": (name, {**arguments, "issue": issue, "price": PRICES[issue]})}
+        if rng.random() < 0.5:
+            script.insert(4, {"user": rng.choice(FOLLOW_UPS), "reply": price_confirmation(issue), "faq": True})
+        for _ in range(rng.randint(1, 3)):
+            phrasings, reply = rng.choices(QUESTIONS, weights)[0]
+            # Mostly at the start of the call, sometimes while details are being collected
+            position = 0 if rng.random() < 0.6 else rng.randint(1, 4)
+            script.insert(position, {"user": vary(rng.choice(phrasings), rng), "reply": reply, "faq": True})
+        one_off = rng.choice(ONE_OFF).format(rng.choice(WORDS), rng.choice(WORDS))
+        script.insert(rng.randint(0, 4), {"user": one_off, "reply": OUT_OF_SCOPE_REPLY, "faq": True})
+        # Scripted turns are matched by text, so a repeated question keeps one reply
+        seen, unique = set(), []
+        for turn in script:
+            if turn["user"] not in seen:
+                seen.add(turn["user"])
+                unique.append(turn)
+        calls.append(unique)
+    return calls
+
+class TimedAssistant(livekit_agent.Assistant):
+    """Records the time to the first text of each reply and what was spoken"""
+
+    def __init__(self, stats: dict, script: list[dict], **kwargs):
+        super().__init__(**kwargs)
+        self.stats = stats
+        self.expected = {turn["user"]: turn["reply"] for turn in script}
+
+    async def llm_node(self, chat_ctx, tools, model_settings):
+        started = time.perf_counter()
+        user = response_cache.last_user_utterance(chat_ctx)
+        first, text = None, []
+        async for chunk in super().llm_node(chat_ctx, tools, model_settings):
+            content = chunk if isinstance(chunk, str) else (chunk.delta.content if chunk.delta else None)
+            if content and first is None:
+                first = time.perf_counter() - started
+            text.append(content or "")
+            yield chunk
+        if user is not None and first is not None:
+            self.stats["ttft"].append(first)
+            reply = "".join(text).strip()
+            self.stats["replies"].append((user, reply))
+            # Per call: a follow-up's right answer depends on what the call is about
+            self.stats["wrong"] += reply != self.expected.get(user, reply)
+
+async def replay_call(script: list[dict], ttft: float, cache_options: dict, stats: dict):
+    if cache_options is None:
+        config.RESPONSE_CACHE = False
+        response_cache._cache = None
+    else:
+        config.RESPONSE_CACHE = True
+        # A new instance per call, like a fresh job process; concurrent calls in this
+        # process end up sharing the latest one, which reads the same file
+        cache = response_cache.ResponseCache(**cache_options)
+        original = cache.lookup
+
+        async def lookup(state, normalized):
+            hit = await original(state, normalized)
+            stats["lookups"] += 1
+            if hit is not None:
+                stats[hit.kind] += 1
+            return hit
+
+        cache.lookup = lookup
+        response_cache._cache = cache
+    session = AgentSession(llm=ScriptedLLM(script, ttft=ttft, token_delay=0.0))
+    assistant = TimedAssistant(stats, script, session_id=os.urandom(16).hex())
+    await session.start(agent=assistant)
+    try:
+        for turn in script:
+            await session.run(user_input=turn["user"])
+    finally:
+        await session.aclose()
+
+async def scenario(label: str, calls: list[list[dict]], args, cache_options: dict):
+    stats = {"ttft": [], "replies": [], "lookups": 0, "exact": 0, "similar": 0, "wrong": 0}
+    faq = {turn["user"] for script in calls for turn in script if turn.get("faq")}
+    queue = asyncio.Queue()
+    for script in calls:
+        queue.put_nowait(script)
+
+    async def worker():
+        while not queue.empty():
+            script = queue.get_nowait()
+            await replay_call(script, args.ttft, cache_options, stats)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    wrong = stats["wrong"]
+    faq_ttft = [t for t, (user, _) in zip(stats["ttft"], stats["replies"]) if user in faq]
+    hits = stats["exact"] + stats["similar"]
+    print(f"{label} ({len(calls)} calls in {elapsed:.0f}s)")
+    if cache_options is not None:
+        print(
+            f"  cache: {stats['lookups']} lookups, {hits} hits ({hits / max(stats['lookups'], 1):.0%}: "
+            f"{stats['exact']} exact, {stats['similar']} similar), {wrong} wrong replies; "
+            f"{hits / len(stats['ttft']):.0%} of all {len(stats['ttft'])} caller turns"
+        )
+    print("  " + summarize("first text, all turns", stats["ttft"]))
+    print("  " + summarize("first text, questions", faq_ttft))
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=30)
+    parser.add_argument("--ttft", type=float, default=0.45, help="simulated LLM time to first token (s)")
+    parser.add_argument("--thresholds", default="0.9,0.75", help="similarity thresholds to compare")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    calls = build_calls(args.calls, args.seed)
+
+    await scenario("no cache", calls, args, None)
+    runs = [("exact match only", 0.0)] + [(f"exact + similarity >= {t}", float(t)) for t in args.thresholds.split(",")]
+    for label, similarity in runs:
+        path = os.path.join(tempfile.mkdtemp(prefix="deskhelp-responses-"), "responses.sqlite3")
+        await scenario(label, calls, args, {"path": path, "similarity": similarity})
+
+    await get_ticket_writer().aclose()
+    await async_engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,137 @@
+"""Offline load test: N simultaneous simulated calls against ``Assistant`` in one process.
+
+Each session is a real ``AgentSession`` running ``livekit_agent.Assistant`` with its
+function tools and database writes. Provider boundaries are replaced with local
+stand-ins: scripted caller transcripts are fed in as user turns (the STT output),
+``fakes.ScriptedLLM`` plays the LLM including create_ticket/edit_ticket tool calls,
+and with no room attached there is no audio output, so TTS is a no-op.
+
+One asyncio process is bound to one core, so the largest N that keeps event-loop
+lag under --max-lag-ms is the sessions-per-core figure. Exits non-zero if any function
+tool call failed.
+
+    python benchmarks/bench_sessions.py --sessions 10 50 100 200
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from contextlib import contextmanager
+
+from bench_utils import LoopLagMonitor, bootstrap, percentile, summarize
+
+bootstrap("sessions.db")
+
+import psutil  # noqa: E402
+from livekit.agents import AgentSession  # noqa: E402
+import livekit_agent  # noqa: E402
+from async_db import async_engine  # noqa: E402
+from fakes import ScriptedLLM, conversation  # noqa: E402
+from ticket_writer import get_ticket_writer  # noqa: E402
+
+db_call_latencies: list[float] = []
+
+@contextmanager
+def recording_db_call(operation: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        db_call_latencies.append(time.perf_counter() - started)
+
+# Record every tool DB call alongside the Prometheus histogram
+livekit_agent.observe_db_call = recording_db_call
+
+async def simulated_call(caller: int, ttft: float, think_time: float, results: dict):
+    script = conversation(caller)
+    session = AgentSession(llm=ScriptedLLM(script, ttft=ttft))
+    await session.start(agent=livekit_agent.Assistant(room_name=f"support-bench-{caller}"))
+    results["started"] += 1
+    try:
+        for turn in script:
+            await asyncio.sleep(random.uniform(0.5, 1.5) * think_time)
+            result = await session.run(user_input=turn["user"])
+            for event in result.events:
+                if event.type == "function_call_output" and "rror" in event.item.output:
+                    results["tool_errors"] += 1
+        results["completed"] += 1
+    finally:
+        await session.aclose()
+
+async def run(sessions: int, ttft: float, think_time: float, ramp: float) -> dict:
+    db_call_latencies.clear()
+    process = psutil.Process()
+    rss_before = process.memory_info().rss
+    cpu_before = process.cpu_times()
+    results = {"started": 0, "completed": 0, "tool_errors": 0}
+
+    monitor = LoopLagMonitor(interval=0.01)
+    monitor.start()
+    started = time.perf_counter()
+
+    async def staggered(caller: int):
+        await asyncio.sleep(random.uniform(0, ramp))
+        await simulated_call(caller, ttft, think_time, results)
+
+    peak_rss = rss_before
+
+    async def sample_memory():
+        nonlocal peak_rss
+        while True:
+            peak_rss = max(peak_rss, process.memory_info().rss)
+            await asyncio.sleep(0.1)
+
+    sampler = asyncio.create_task(sample_memory())
+    await asyncio.gather(*(staggered(i) for i in range(sessions)))
+    sampler.cancel()
+    elapsed = time.perf_counter() - started
+    await monitor.stop()
+
+    cpu_after = process.cpu_times()
+    cpu = (cpu_after.user - cpu_before.user) + (cpu_after.system - cpu_before.system)
+    return {
+        **results,
+        "sessions": sessions,
+        "elapsed": elapsed,
+        "cpu_util": cpu / elapsed,
+        "lag_p99": percentile(monitor.samples, 99),
+        "lag": monitor.samples,
+        "db": list(db_call_latencies),
+        "mem_per_session": (peak_rss - rss_before) / sessions,
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[10, 50, 100, 200])
+    parser.add_argument("--ttft", type=float, default=0.3, help="simulated LLM time to first token (s)")
+    parser.add_argument("--think-time", type=float, default=0.5, help="mean caller pause between turns (s)")
+    parser.add_argument("--ramp", type=float, default=2.0, help="spread session starts over this many seconds")
+    parser.add_argument("--max-lag-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    print(f"cores available: {os.cpu_count()}; one asyncio process uses one")
+    sustainable = 0
+    tool_errors = 0
+    for sessions in args.sessions:
+        report = await run(sessions, args.ttft, args.think_time, args.ramp)
+        print(
+            f"\nsessions={sessions} completed={report['completed']} tool_errors={report['tool_errors']} "
+            f"wall={report['elapsed']:.1f}s cpu={report['cpu_util']:.0%} "
+            f"mem/session={report['mem_per_session'] / 1024:.0f}KiB"
+        )
+        print("  " + summarize("event-loop lag", report["lag"]))
+        print("  " + summarize("DB write latency", report["db"]))
+        tool_errors += report["tool_errors"]
+        if report["lag_p99"] * 1000 <= args.max_lag_ms and report["completed"] == sessions:
+            sustainable = sessions
+
+    print(f"\nsessions per core (loop lag p99 <= {args.max_lag_ms:.0f}ms): {sustainable or '< ' + str(args.sessions[0])}")
+    await get_ticket_writer().aclose()
+    await async_engine.dispose()
+    if tool_errors:
+        sys.exit(f"{tool_errors} function tool calls failed")
+
+if __name__ == "__main__":
+    asyncio.run(main())
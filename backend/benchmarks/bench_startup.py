@@ -0,0 +1,104 @@
+"""Per-job session setup cost with and without prewarmed process userdata.
+
+Offline (default) it times what ``entrypoint`` has to build before it can start the
+session: fresh provider clients and filters per job versus lookups from
+``JobProcess.userdata`` filled by ``prewarm``.
+
+With ``--live`` (needs CARTESIA_API_KEY) it also times job start to the first TTS
+audio frame for a cold TTS client versus one whose connection was opened at prewarm.
+
+    python benchmarks/bench_startup.py --jobs 20
+    python benchmarks/bench_startup.py --live
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from bench_utils import bootstrap, summarize
+
+bootstrap("startup.db")
+
+for key in ("OPENAI_API_KEY", "DEEPGRAM_API_KEY", "CARTESIA_API_KEY"):
+    os.environ.setdefault(key, "offline-benchmark")
+
+import aiohttp  # noqa: E402
+from livekit.plugins import cartesia, deepgram, noise_cancellation, openai  # noqa: E402
+import livekit_agent  # noqa: E402
+
+class FakeProc:
+    def __init__(self):
+        self.userdata = {}
+
+def build_cold():
+    return {
+        "llm": openai.LLM(model="gpt-4o-mini"),
+        "stt": deepgram.STT(model="nova-3", language="en-US"),
+        "tts": cartesia.TTS(voice=livekit_agent.TTS_VOICE),
+        "noise_cancellation": noise_cancellation.BVC(),
+    }
+
+def build_prewarmed(proc: FakeProc):
+    return {key: proc.userdata[key] for key in ("llm", "stt", "tts", "noise_cancellation")}
+
+def bench_offline(jobs: int):
+    cold = []
+    for _ in range(jobs):
+        started = time.perf_counter()
+        build_cold()
+        cold.append(time.perf_counter() - started)
+
+    proc = FakeProc()
+    started = time.perf_counter()
+    livekit_agent.prewarm(proc)
+    prewarm_time = time.perf_counter() - started
+
+    warm = []
+    for _ in range(jobs):
+        started = time.perf_counter()
+        build_prewarmed(proc)
+        warm.append(time.perf_counter() - started)
+
+    print(f"prewarm (once per process, before job assignment): {prewarm_time * 1000:.1f}ms")
+    print(summarize("per-job setup, cold     ", cold))
+    print(summarize("per-job setup, prewarmed", warm, unit="us", scale=1e6))
+
+async def first_frame_latency(tts) -> float:
+    started = time.perf_counter()
+    async with tts.synthesize("Hello, thanks for calling the IT help desk.") as stream:
+        async for _ in stream:
+            return time.perf_counter() - started
+    return float("nan")
+
+async def bench_live(rounds: int):
+    async with aiohttp.ClientSession() as http_session:
+        cold = []
+        for _ in range(rounds):
+            tts = cartesia.TTS(voice=livekit_agent.TTS_VOICE, http_session=http_session)
+            cold.append(await first_frame_latency(tts))
+            await tts.aclose()
+
+        warm = []
+        tts = cartesia.TTS(voice=livekit_agent.TTS_VOICE, http_session=http_session)
+        tts.prewarm()
+        await asyncio.sleep(1)
+        for _ in range(rounds):
+            warm.append(await first_frame_latency(tts))
+        await tts.aclose()
+
+    print(f"first TTS frame, cold client:      median {statistics.median(cold) * 1000:.1f}ms")
+    print(f"first TTS frame, prewarmed client: median {statistics.median(warm) * 1000:.1f}ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--jobs", type=int, default=20)
+    parser.add_argument("--live", action="store_true", help="measure first TTS frame against Cartesia")
+    args = parser.parse_args()
+
+    bench_offline(args.jobs)
+    if args.live:
+        asyncio.run(bench_live(rounds=5))
+
+if __name__ == "__main__":
+    main()
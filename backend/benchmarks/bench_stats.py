@@ -0,0 +1,125 @@
+"""Dashboard stats: GROUP BY over support_tickets on every refresh vs the maintained hourly stats.
+
+Seeds --tickets tickets spread over the last 30 days (each insert also updates the
+stats), applies --edits random issue/price edits, checks the incremental stats
+against a full rebuild, then times --refreshes dashboard reads each way and the
+extra cost the stats add to a single-ticket write.
+
+    python benchmarks/bench_stats.py --tickets 200000 --edits 2000
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from bench_utils import bootstrap, summarize
+
+bootstrap("stats.db")
+
+from sqlalchemy import func, insert, select  # noqa: E402
+from async_crud import get_ticket_stats, insert_tickets, rebuild_ticket_stats, update_tickets  # noqa: E402
+from async_db import AsyncSessionLocal, async_engine  # noqa: E402
+from issues import ISSUE_CATALOG  # noqa: E402
+from models import SupportTicket  # noqa: E402
+from ticket_stats import hour_bucket, summarize as summarize_stats  # noqa: E402
+
+def ticket(created_at: datetime, rng: random.Random) -> dict:
+    issue = rng.choice(ISSUE_CATALOG)
+    return dict(
+        name="Jane Doe", email="jane@example.com", phone="555-0100", address="1 Main St",
+        issue=issue.name, price=issue.price, created_at=created_at,
+    )
+
+async def seed(count: int, rng: random.Random) -> list[int]:
+    now = datetime.now(timezone.utc)
+    ids = []
+    async with AsyncSessionLocal() as db:
+        for start in range(0, count, 1000):
+            batch = [ticket(now - timedelta(seconds=rng.uniform(0, 30 * 86400)), rng) for _ in range(min(1000, count - start))]
+            ids.extend(await insert_tickets(db, batch))
+            await db.commit()
+    return ids
+
+async def edit(ids: list[int], count: int, rng: random.Random):
+    async with AsyncSessionLocal() as db:
+        for _ in range(count):
+            issue = rng.choice(ISSUE_CATALOG)
+            fields = rng.choice([{"issue": issue.name, "price": issue.price}, {"price": round(rng.uniform(5, 50), 2)}])
+            await update_tickets(db, {rng.choice(ids): fields})
+        await db.commit()
+
+async def on_the_fly(db, hours: int) -> dict:
+    """The dashboard computed straight from support_tickets"""
+    if db.get_bind().dialect.name == "sqlite":
+        hour = func.strftime("%Y-%m-%d %H:00:00", SupportTicket.created_at)
+    else:
+        hour = func.date_trunc("hour", SupportTicket.created_at)
+    since = hour_bucket(datetime.now(timezone.utc)) - timedelta(hours=hours - 1)
+    by_issue = await db.execute(
+        select(SupportTicket.issue, func.count(), func.sum(SupportTicket.price))
+        .group_by(SupportTicket.issue).order_by(SupportTicket.issue)
+    )
+    by_hour = await db.execute(
+        select(hour, func.count(), func.sum(SupportTicket.price))
+        .where(SupportTicket.created_at >= since).group_by(hour).order_by(hour)
+    )
+    rows = [(datetime.fromisoformat(h) if isinstance(h, str) else h, n, r) for h, n, r in by_hour]
+    return summarize_stats(by_issue, rows)
+
+async def time_refreshes(read, refreshes: int, hours: int) -> list[float]:
+    durations = []
+    for _ in range(refreshes):
+        async with AsyncSessionLocal() as db:
+            started = time.perf_counter()
+            await read(db, hours)
+            durations.append(time.perf_counter() - started)
+    return durations
+
+async def time_writes(count: int, rng: random.Random, with_stats: bool) -> list[float]:
+    durations = []
+    async with AsyncSessionLocal() as db:
+        for _ in range(count):
+            row = ticket(datetime.now(timezone.utc), rng)
+            started = time.perf_counter()
+            if with_stats:
+                await insert_tickets(db, [row])
+            else:
+                await db.execute(insert(SupportTicket).returning(SupportTicket.id, sort_by_parameter_order=True), [row])
+            await db.commit()
+            durations.append(time.perf_counter() - started)
+    return durations
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tickets", type=int, default=200000)
+    parser.add_argument("--edits", type=int, default=2000)
+    parser.add_argument("--refreshes", type=int, default=30)
+    parser.add_argument("--hours", type=int, default=24)
+    parser.add_argument("--writes", type=int, default=300)
+    args = parser.parse_args()
+    rng = random.Random(7)
+
+    started = time.perf_counter()
+    ids = await seed(args.tickets, rng)
+    await edit(ids, args.edits, rng)
+    print(f"seeded {args.tickets} tickets and {args.edits} edits in {time.perf_counter() - started:.1f}s")
+
+    async with AsyncSessionLocal() as db:
+        incremental = await get_ticket_stats(db, hours=args.hours)
+        computed = await on_the_fly(db, args.hours)
+        started = time.perf_counter()
+        counted = await rebuild_ticket_stats(db)
+        rebuild_time = time.perf_counter() - started
+        rebuilt = await get_ticket_stats(db, hours=args.hours)
+    print(f"incremental == rebuilt: {incremental == rebuilt}; == on-the-fly: {incremental == computed}")
+    print(f"rebuild from {counted} tickets: {rebuild_time:.2f}s")
+
+    print(summarize("on-the-fly GROUP BY refresh", await time_refreshes(on_the_fly, args.refreshes, args.hours)))
+    print(summarize("maintained stats refresh   ", await time_refreshes(get_ticket_stats, args.refreshes, args.hours)))
+    print(summarize("single write, no stats     ", await time_writes(args.writes, rng, with_stats=False)))
+    print(summarize("single write, with stats   ", await time_writes(args.writes, rng, with_stats=True)))
+    await async_engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,176 @@
+"""Ticket retention: hot-table size, inserts and scans before and after archiving, and lookups by ID.
+
+Seeds --rows tickets spread evenly over the last --months months, then moves every
+ticket older than --retention-days into monthly zstd Parquet files with
+``ticket_archive.archive_old_tickets`` from a second engine (as the retention
+process would), while this process keeps creating tickets.
+
+- hot table: rows, live database bytes, ``crud.create_ticket`` latency and an
+  unindexed scan, before and after archiving.
+- archiving: tickets per second and create_ticket latency while it runs.
+- lookups: ``crud.get_ticket`` for hot and archived IDs; archived tickets must
+  come back exactly as they were, and a stats rebuild must still count them.
+
+    python benchmarks/bench_ticket_archive.py --rows 500000 --months 12 --retention-days 90
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from bench_utils import bootstrap, summarize
+
+os.environ["EMAIL_CONFIRMATIONS"] = "false"
+os.environ["TICKET_ARCHIVE_DIR"] = tempfile.mkdtemp(prefix="deskhelp-tickets-")
+bootstrap("ticket_archive.db")
+
+from sqlalchemy import create_engine, func, insert, select, text  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+import crud  # noqa: E402
+from config import config  # noqa: E402
+from db import SessionLocal, engine, engine_options  # noqa: E402
+from models import SupportTicket  # noqa: E402
+from ticket_archive import archive_cutoff, archive_old_tickets  # noqa: E402
+
+ISSUES = ["wifi not working", "email login issues", "slow laptop performance", "printer problems"]
+FIELDS = ("id", "name", "email", "phone", "address", "issue", "price", "created_at")
+
+def seed(rows: int, months: int, chunk: int = 50_000):
+    now = datetime.now(timezone.utc)
+    start = now - timedelta(days=30.4 * months)
+    step = (now - start) / rows
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        for offset in range(0, rows, chunk):
+            conn.execute(insert(SupportTicket), [
+                {
+                    "name": f"Caller {i}",
+                    "email": f"caller{i % 50_000}@example.com",
+                    "phone": f"555-{i % 10_000:04d}",
+                    "address": f"{i} Main St",
+                    "issue": ISSUES[i % len(ISSUES)],
+                    "price": 10.0 + i % 4 * 5,
+                    "created_at": start + step * i,
+                }
+                for i in range(offset, min(rows, offset + chunk))
+            ])
+    with SessionLocal() as db:
+        crud.rebuild_ticket_stats(db)
+    print(f"seeded {rows} tickets over {months} months in {time.perf_counter() - started:.1f}s")
+
+def live_bytes() -> int:
+    with engine.connect() as conn:
+        page_size = conn.scalar(text("PRAGMA page_size"))
+        return (conn.scalar(text("PRAGMA page_count")) - conn.scalar(text("PRAGMA freelist_count"))) * page_size
+
+def create_tickets(count: int, stop: threading.Event = None) -> list[float]:
+    latencies = []
+    with SessionLocal() as db:
+        for i in range(count):
+            if stop is not None and stop.is_set():
+                break
+            started = time.perf_counter()
+            crud.create_ticket(db, f"New {i}", f"new{i}@example.com", "555-0100", "1 Main St", ISSUES[i % 4], 10.0)
+            latencies.append(time.perf_counter() - started)
+    return latencies
+
+def scan() -> float:
+    """Best of three unindexed scans of the hot table"""
+    best = float("inf")
+    with SessionLocal() as db:
+        for _ in range(3):
+            started = time.perf_counter()
+            db.scalar(select(func.count()).select_from(SupportTicket).where(SupportTicket.address.like("%7 Main%")))
+            best = min(best, time.perf_counter() - started)
+    return best
+
+def hot_table(label: str, args):
+    with SessionLocal() as db:
+        rows = db.scalar(select(func.count()).select_from(SupportTicket))
+    print(f"{label}: {rows} hot tickets, {live_bytes() / 1e6:.1f} MB live in the database")
+    print("  " + summarize("create_ticket", create_tickets(args.inserts)))
+    print(f"  unindexed scan: {scan() * 1000:.1f}ms")
+
+def lookups(label: str, ids: list[int]) -> tuple[list[float], list]:
+    latencies, tickets = [], []
+    with SessionLocal() as db:
+        for ticket_id in ids:
+            started = time.perf_counter()
+            ticket = crud.get_ticket(db, ticket_id)
+            latencies.append(time.perf_counter() - started)
+            tickets.append(ticket)
+            db.expunge_all()
+    print("  " + summarize(label, latencies))
+    return latencies, tickets
+
+def as_tuple(ticket) -> tuple:
+    created_at = ticket.created_at.replace(tzinfo=None)
+    return tuple(getattr(ticket, field) for field in FIELDS[:-1]) + (created_at,)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--months", type=int, default=12)
+    parser.add_argument("--retention-days", type=float, default=90)
+    parser.add_argument("--inserts", type=int, default=300, help="create_ticket calls per measurement")
+    parser.add_argument("--lookups", type=int, default=300)
+    args = parser.parse_args()
+
+    seed(args.rows, args.months)
+    rng = random.Random(5)
+    cutoff = archive_cutoff(args.retention_days).replace(tzinfo=None)
+    with SessionLocal() as db:
+        old_ids = db.scalars(select(SupportTicket.id).where(SupportTicket.created_at < cutoff)).all()
+        hot_ids = db.scalars(select(SupportTicket.id).where(SupportTicket.created_at >= cutoff)).all()
+        sample = rng.sample(old_ids, min(args.lookups, len(old_ids)))
+        originals = {t.id: as_tuple(t) for t in db.scalars(select(SupportTicket).where(SupportTicket.id.in_(sample)))}
+        stats_before = crud.get_ticket_stats(db)
+    hot_table("before archiving", args)
+    lookups("get_ticket, hot table", rng.sample(hot_ids, min(args.lookups, len(hot_ids))))
+
+    # The retention process has its own connection; this process keeps taking tickets meanwhile
+    archiver = create_engine(config.DATABASE_URL, **engine_options(config.DATABASE_URL))
+    result, stop = {}, threading.Event()
+
+    def archive():
+        started = time.perf_counter()
+        with Session(archiver) as db:
+            result["moved"] = archive_old_tickets(db, args.retention_days)
+        result["elapsed"] = time.perf_counter() - started
+        stop.set()
+
+    thread = threading.Thread(target=archive)
+    thread.start()
+    during = create_tickets(10 ** 9, stop)
+    thread.join()
+    archiver.dispose()
+    archive_bytes = sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(config.TICKET_ARCHIVE_DIR) for name in names
+    )
+    print(
+        f"archived {result['moved']} tickets in {result['elapsed']:.1f}s = {result['moved'] / result['elapsed']:.0f} tickets/s, "
+        f"{archive_bytes / result['moved']:.0f} B/ticket as zstd Parquet"
+    )
+    print("  " + summarize("create_ticket while archiving", during))
+
+    hot_table("after archiving", args)
+    lookups("get_ticket, hot table", rng.sample(hot_ids, min(args.lookups, len(hot_ids))))
+    _, tickets = lookups("get_ticket, archived", sample)
+    mismatched = sum(1 for ticket_id, ticket in zip(sample, tickets) if ticket is None or as_tuple(ticket) != originals[ticket_id])
+    with SessionLocal() as db:
+        stats_after = crud.get_ticket_stats(db)
+        crud.rebuild_ticket_stats(db)
+        stats_rebuilt = crud.get_ticket_stats(db)
+    print(
+        f"  {len(sample) - mismatched}/{len(sample)} archived tickets returned unchanged; total tickets in stats: "
+        f"{stats_before['total_tickets']} before, {stats_after['total_tickets']} after archiving, "
+        f"{stats_rebuilt['total_tickets']} after a rebuild"
+    )
+    assert mismatched == 0 and stats_rebuilt == stats_after
+
+if __name__ == "__main__":
+    main()
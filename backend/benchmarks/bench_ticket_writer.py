@@ -0,0 +1,82 @@
+"""Ticket insert throughput: one transaction per call vs the group-committing TicketWriter.
+
+    python benchmarks/bench_ticket_writer.py --tickets 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import time
+
+from bench_utils import bootstrap
+
+bootstrap("ticket_writer.db")
+
+import async_crud  # noqa: E402
+import crud  # noqa: E402
+from async_db import AsyncSessionLocal, async_engine  # noqa: E402
+from db import SessionLocal  # noqa: E402
+from ticket_writer import TicketWriter  # noqa: E402
+
+TICKET = dict(
+    name="Jane Doe",
+    email="jane@example.com",
+    phone="555-0100",
+    address="1 Main St",
+    issue="wifi not working",
+    price=20.0,
+)
+
+def report(label: str, tickets: int, elapsed: float):
+    print(f"{label:28s} {tickets:6d} tickets in {elapsed:7.3f}s -> {tickets / elapsed:9.1f} tickets/s")
+
+def bench_sync_per_call(tickets: int):
+    start = time.perf_counter()
+    for _ in range(tickets):
+        db = SessionLocal()
+        try:
+            crud.create_ticket(db=db, **TICKET)
+        finally:
+            db.close()
+    report("sync crud, per call", tickets, time.perf_counter() - start)
+
+async def bench_async_per_call(tickets: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            async with AsyncSessionLocal() as db:
+                await async_crud.create_ticket(db=db, **TICKET)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(tickets)))
+    report("async crud, per call", tickets, time.perf_counter() - start)
+
+async def bench_writer(tickets: int, concurrency: int, max_batch: int, max_delay_ms: float):
+    writer = TicketWriter(max_batch=max_batch, max_delay_ms=max_delay_ms)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            return await writer.create_ticket(**TICKET)
+
+    start = time.perf_counter()
+    ids = await asyncio.gather(*(one() for _ in range(tickets)))
+    elapsed = time.perf_counter() - start
+    await writer.aclose()
+    assert len(set(ids)) == tickets, "every caller must get a distinct ticket ID"
+    report(f"TicketWriter batch={max_batch}", tickets, elapsed)
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tickets", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50, help="simultaneous callers")
+    parser.add_argument("--max-batch", type=int, default=100)
+    parser.add_argument("--max-delay-ms", type=float, default=10)
+    args = parser.parse_args()
+
+    bench_sync_per_call(args.tickets)
+    await bench_async_per_call(args.tickets, args.concurrency)
+    await bench_writer(args.tickets, args.concurrency, args.max_batch, args.max_delay_ms)
+    await async_engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,102 @@
+"""Load test for /api/token: spawns a local uvicorn server and reports p50/p99 latency.
+
+Dummy LiveKit credentials are used, since tokens are signed locally and never sent to
+LiveKit.
+
+    python benchmarks/bench_token_load.py --requests 5000 --concurrency 64 --workers 4
+    python benchmarks/bench_token_load.py --url http://localhost:8000 --batch 10
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+from bench_utils import APP_DIR, bootstrap, summarize
+
+bootstrap("token_load.db")
+
+import httpx  # noqa: E402
+
+def spawn_server(port: int, workers: int) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "LIVEKIT_API_KEY": os.getenv("LIVEKIT_API_KEY", "bench-key"),
+        "LIVEKIT_API_SECRET": os.getenv("LIVEKIT_API_SECRET", "bench-secret-" + "x" * 32),
+        "LIVEKIT_URL": os.getenv("LIVEKIT_URL", "ws://localhost:7880"),
+        # Measures token issuance itself, so nothing is queued or rate limited
+        "ADMISSION_CONTROL": os.getenv("ADMISSION_CONTROL", "false"),
+        "TOKEN_RATE_PER_MINUTE": os.getenv("TOKEN_RATE_PER_MINUTE", "0"),
+    }
+    return subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "api_server:app",
+            "--app-dir", APP_DIR, "--port", str(port),
+            "--workers", str(workers), "--log-level", "warning",
+        ],
+        env=env,
+    )
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError("server did not become ready")
+
+async def run_load(url: str, requests: int, concurrency: int, batch: int):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        await wait_ready(client)
+        latencies = []
+        errors = 0
+        queue = asyncio.Queue()
+        for _ in range(requests):
+            queue.put_nowait(None)
+
+        async def worker():
+            nonlocal errors
+            while not queue.empty():
+                queue.get_nowait()
+                started = time.perf_counter()
+                if batch > 1:
+                    response = await client.post("/api/token/batch", json={"count": batch})
+                else:
+                    response = await client.post("/api/token")
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    tokens = requests * batch
+    print(summarize(f"requests (batch={batch})", latencies))
+    print(f"throughput: {requests / elapsed:.0f} req/s, {tokens / elapsed:.0f} tokens/s, errors={errors}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", help="target an already running server instead of spawning one")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--batch", type=int, default=1, help="tokens per request via /api/token/batch")
+    args = parser.parse_args()
+
+    server = None if args.url else spawn_server(args.port, args.workers)
+    try:
+        asyncio.run(run_load(args.url or f"http://127.0.0.1:{args.port}", args.requests, args.concurrency, args.batch))
+    finally:
+        if server:
+            server.terminate()
+            server.wait(timeout=10)
+
+if __name__ == "__main__":
+    main()
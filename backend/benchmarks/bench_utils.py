@@ -0,0 +1,79 @@
+"""Shared helpers for the benchmark scripts.
+
+Benchmarks run from the backend directory, e.g. ``python benchmarks/bench_loop_lag.py``.
+They never need API keys: unless DATABASE_URL is already set they point the app at a
+throwaway SQLite file.
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+
+def bootstrap(db_name: str = "bench.db") -> str:
+    """Put app/ on sys.path, default DATABASE_URL to a temporary SQLite file and migrate it"""
+    if APP_DIR not in sys.path:
+        sys.path.insert(0, APP_DIR)
+    if not os.getenv("DATABASE_URL"):
+        path = os.path.join(tempfile.mkdtemp(prefix="deskhelp-bench-"), db_name)
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+
+    from migrate import run_migrations
+
+    run_migrations()
+    return os.environ["DATABASE_URL"]
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def summarize(label: str, values, unit: str = "ms", scale: float = 1000.0) -> str:
+    if not values:
+        return f"{label}: no samples"
+    return (
+        f"{label}: n={len(values)} "
+        f"mean={statistics.mean(values) * scale:.2f}{unit} "
+        f"p50={percentile(values, 50) * scale:.2f}{unit} "
+        f"p99={percentile(values, 99) * scale:.2f}{unit} "
+        f"max={max(values) * scale:.2f}{unit}"
+    )
+
+class LoopLagMonitor:
+    """Measure how late a periodic tick fires on the running event loop"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples: list[float] = []
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - expected))
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+class Timer:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
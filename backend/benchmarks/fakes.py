@@ -0,0 +1,293 @@
+"""Local stand-ins for provider plugins, so benchmarks run without network or API keys."""
+import asyncio
+import json
+import os
+import random
+import re
+import uuid
+from typing import Optional
+
+from livekit.agents import APIConnectionError, llm, tts
+from livekit.agents.types import DEFAULT_API_CONNECT_OPTIONS
+
+def conversation(caller: int) -> list[dict]:
+    """A full ticket call: collect details, confirm, create the ticket, then edit it"""
+    email = f"caller{caller}@example.com"
+    return [
+        {
+            "user": "Hi, my name is Jane Doe",
+            "reply": "Thanks Jane. What's your email and phone number?",
+            "draft": {"name": "Jane Doe"},
+        },
+        {
+            "user": f"It's {email}, phone 555-0100",
+            "reply": "Got it. What's your address?",
+            "draft": {"email": email, "phone": "555-0100"},
+        },
+        {
+            "user": "12 Main Street, Springfield",
+            "reply": "And what issue are you having?",
+            "draft": {"address": "12 Main Street, Springfield"},
+        },
+        {
+            "user": "My wifi is not working",
+            "reply": "For wifi not working, the fee is $20. Shall I create the ticket?",
+            "draft": {"issue": "wifi not working"},
+        },
+        {
+            "user": "Yes please",
+            "tool": ("create_ticket", {
+                "name": "Jane Doe",
+                "email": email,
+                "phone": "555-0100",
+                "address": "12 Main Street, Springfield",
+                "issue": "wifi not working",
+                "price": 20.0,
+            }),
+            "reply": "Your ticket is created. You'll get an email confirmation.",
+        },
+        {
+            "user": "Actually change my phone to 555-9999",
+            "tool": ("edit_ticket", {"phone": "555-9999"}),
+            "reply": "Done, I've updated your phone number.",
+        },
+        {"user": "Thanks, bye", "reply": "Goodbye!"},
+    ]
+
+def correction_heavy_conversation(caller: int, corrections: int = 12) -> list[dict]:
+    """The standard call with rounds of caller corrections before the ticket is confirmed"""
+    script = conversation(caller)
+    create = dict(script[4]["tool"][1])
+    rounds = []
+    for i in range(corrections):
+        phone = f"555-{1000 + i:04d}"
+        address = f"{20 + i} Oak Avenue, Springfield"
+        if i % 2 == 0:
+            rounds.append({
+                "user": f"Sorry, my phone is actually {phone}",
+                "reply": f"No problem, I've changed your phone to {phone}. Anything else to correct?",
+                "draft": {"phone": phone},
+            })
+            create["phone"] = phone
+        else:
+            rounds.append({
+                "user": f"Wait, the address should be {address}",
+                "reply": f"Updated, your address is now {address}. Is everything else correct?",
+                "draft": {"address": address},
+            })
+            create["address"] = address
+    confirm = {**script[4], "tool": ("create_ticket", create)}
+    return script[:4] + rounds + [confirm] + script[5:]
+
+_TICKET_ID = re.compile(r"ID: (\d+)")
+
+# Providers only reuse cached prefixes of at least this many tokens (OpenAI: 1024)
+PROMPT_CACHE_MIN_TOKENS = 1024
+
+def estimate_tokens(text: str) -> int:
+    """~4 characters per token, close enough to compare prompt sizes"""
+    return (len(text) + 3) // 4
+
+def serialize_request(chat_ctx: llm.ChatContext, tools) -> str:
+    """The request as an OpenAI-format provider would see it: tool schemas, then messages"""
+    schemas = [llm.utils.build_legacy_openai_schema(tool) for tool in tools if isinstance(tool, llm.FunctionTool)]
+    messages, _ = chat_ctx.to_provider_format("openai")
+    return json.dumps(schemas, sort_keys=True) + json.dumps(messages, ensure_ascii=False)
+
+def cached_prefix_tokens(previous: str, current: str) -> int:
+    common = len(os.path.commonprefix([previous, current]))
+    tokens = common // 4
+    return tokens if tokens >= PROMPT_CACHE_MIN_TOKENS else 0
+
+class ScriptedLLM(llm.LLM):
+    """Mock LLM that plays back a conversation script, including tool calls.
+
+    Each request is answered with the scripted turn for the latest user message. A turn
+    with a tool emits the call first; once the tool output is in the chat context it
+    emits the reply. A turn with a ``draft`` emits the reply together with an
+    update_ticket_draft call, which needs no follow-up request.
+
+    ``ttft`` and ``token_delay`` simulate provider latency without using CPU, and
+    ``prefill_per_1k`` adds time per 1k prompt tokens not covered by the provider's
+    prompt cache (the common prefix with the previous request). Every request's token
+    counts and simulated TTFT are appended to ``requests``.
+    """
+
+    def __init__(
+        self,
+        script: list[dict],
+        ttft: float = 0.3,
+        token_delay: float = 0.01,
+        prefill_per_1k: float = 0.0,
+    ):
+        super().__init__()
+        self.script = script
+        self.ttft = ttft
+        self.token_delay = token_delay
+        self.prefill_per_1k = prefill_per_1k
+        self.requests: list[dict] = []
+        self._previous_request = ""
+
+    @property
+    def model(self) -> str:
+        return "scripted"
+
+    @property
+    def provider(self) -> str:
+        return "fake"
+
+    def chat(self, *, chat_ctx, tools=None, conn_options=DEFAULT_API_CONNECT_OPTIONS, **kwargs):
+        return ScriptedLLMStream(self, chat_ctx=chat_ctx, tools=tools or [], conn_options=conn_options)
+
+    def _account(self, chat_ctx: llm.ChatContext, tools) -> float:
+        request = serialize_request(chat_ctx, tools)
+        prompt_tokens = estimate_tokens(request)
+        cached_tokens = cached_prefix_tokens(self._previous_request, request)
+        self._previous_request = request
+        ttft = self.ttft + self.prefill_per_1k * (prompt_tokens - cached_tokens) / 1000
+        self.requests.append({"prompt_tokens": prompt_tokens, "cached_tokens": cached_tokens, "ttft": ttft})
+        return ttft
+
+class ScriptedLLMStream(llm.LLMStream):
+    def _next_turn(self) -> tuple[Optional[dict], bool]:
+        items = self._chat_ctx.items
+        last_user = next(
+            (item.text_content for item in reversed(items) if item.type == "message" and item.role == "user"),
+            None,
+        )
+        turn = next((turn for turn in self._llm.script if turn["user"] == last_user), None)
+        tool_done = bool(items) and items[-1].type == "function_call_output"
+        return turn, tool_done
+
+    def _last_ticket_id(self) -> Optional[int]:
+        # The create_ticket output, or the draft summary once that turn is compacted
+        for item in reversed(self._chat_ctx.items):
+            text = item.output if item.type == "function_call_output" else (
+                item.text_content if item.type == "message" else None
+            )
+            match = _TICKET_ID.search(text or "")
+            if match:
+                return int(match.group(1))
+        return None
+
+    def _tool_call(self, name: str, arguments: dict) -> llm.FunctionToolCall:
+        return llm.FunctionToolCall(name=name, arguments=json.dumps(arguments), call_id=uuid.uuid4().hex)
+
+    async def _run(self) -> None:
+        turn, tool_done = self._next_turn()
+        request_id = uuid.uuid4().hex
+        await asyncio.sleep(self._llm._account(self._chat_ctx, self._tools))
+
+        if turn and turn.get("tool") and not tool_done:
+            name, arguments = turn["tool"]
+            if name == "edit_ticket":
+                arguments = {"ticket_id": self._last_ticket_id(), **arguments}
+            self._event_ch.send_nowait(llm.ChatChunk(
+                id=request_id,
+                delta=llm.ChoiceDelta(role="assistant", tool_calls=[self._tool_call(name, arguments)]),
+            ))
+            return
+
+        reply = turn["reply"] if turn else "How can I help you today?"
+        for word in reply.split(" "):
+            self._event_ch.send_nowait(llm.ChatChunk(
+                id=request_id, delta=llm.ChoiceDelta(role="assistant", content=word + " ")
+            ))
+            await asyncio.sleep(self._llm.token_delay)
+
+        if turn and turn.get("draft") and not tool_done:
+            self._event_ch.send_nowait(llm.ChatChunk(
+                id=request_id,
+                delta=llm.ChoiceDelta(
+                    role="assistant", tool_calls=[self._tool_call("update_ticket_draft", turn["draft"])]
+                ),
+            ))
+
+class ProviderFaults:
+    """Latency and error injection for a fake provider; change the fields mid-run to degrade it.
+
+    Each call waits ``latency`` (+/-20%), or ``slow_latency`` for a ``slow_rate`` share
+    of calls, then fails with probability ``error_rate``.
+    """
+
+    def __init__(
+        self,
+        latency: float,
+        slow_latency: float = 0.0,
+        slow_rate: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.slow_latency = slow_latency
+        self.slow_rate = slow_rate
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+
+    async def wait(self, name: str):
+        if self._random.random() < self.slow_rate:
+            delay = self.slow_latency
+        else:
+            delay = self.latency * self._random.uniform(0.8, 1.2)
+        await asyncio.sleep(delay)
+        if self._random.random() < self.error_rate:
+            raise APIConnectionError(f"{name}: injected failure")
+
+class FlakyLLM(llm.LLM):
+    """Mock LLM that answers every request with a short reply after the injected faults"""
+
+    def __init__(self, name: str, faults: ProviderFaults, reply: str = "Got it. What's your address?"):
+        super().__init__()
+        self.name = name
+        self.faults = faults
+        self.reply = reply
+
+    @property
+    def model(self) -> str:
+        return self.name
+
+    @property
+    def provider(self) -> str:
+        return "fake"
+
+    def chat(self, *, chat_ctx, tools=None, conn_options=DEFAULT_API_CONNECT_OPTIONS, **kwargs):
+        return FlakyLLMStream(self, chat_ctx=chat_ctx, tools=tools or [], conn_options=conn_options)
+
+class FlakyLLMStream(llm.LLMStream):
+    async def _run(self) -> None:
+        await self._llm.faults.wait(self._llm.name)
+        request_id = uuid.uuid4().hex
+        for word in self._llm.reply.split(" "):
+            self._event_ch.send_nowait(llm.ChatChunk(
+                id=request_id, delta=llm.ChoiceDelta(role="assistant", content=word + " ")
+            ))
+
+class FlakyTTS(tts.TTS):
+    """Mock non-streaming TTS: silence at 24 kHz mono after the injected faults"""
+
+    def __init__(self, name: str, faults: ProviderFaults, audio_seconds: float = 0.5):
+        super().__init__(capabilities=tts.TTSCapabilities(streaming=False), sample_rate=24000, num_channels=1)
+        self.name = name
+        self.faults = faults
+        self.audio_seconds = audio_seconds
+
+    @property
+    def model(self) -> str:
+        return self.name
+
+    @property
+    def provider(self) -> str:
+        return "fake"
+
+    def synthesize(self, text: str, *, conn_options=DEFAULT_API_CONNECT_OPTIONS):
+        return FlakyChunkedStream(tts=self, input_text=text, conn_options=conn_options)
+
+class FlakyChunkedStream(tts.ChunkedStream):
+    async def _run(self, output_emitter: tts.AudioEmitter) -> None:
+        await self._tts.faults.wait(self._tts.name)
+        output_emitter.initialize(
+            request_id=uuid.uuid4().hex, sample_rate=24000, num_channels=1, mime_type="audio/pcm"
+        )
+        chunk = b"\0\0" * 2400  # 100 ms of 16-bit silence
+        for _ in range(max(1, int(self._tts.audio_seconds * 10))):
+            output_emitter.push(chunk)
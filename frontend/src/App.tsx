@@ -11,12 +11,14 @@ function App() {
   const [connectionStatus, setConnectionStatus] = useState<'connecting' | 'connected' | 'disconnected'>('disconnected')
   const [isSpeaking, setIsSpeaking] = useState(false)
   const [sessionId, setSessionId] = useState<string | null>(null)
+  const [queueWait, setQueueWait] = useState<number | null>(null)
 
   const streamRef = useRef<MediaStream | null>(null)
   const animationRef = useRef<number>(0)
   const callTimerRef = useRef<number | null>(null)
   const speakingTimeoutRef = useRef<number | null>(null)
   const roomRef = useRef<Room | null>(null)
+  const endedByUserRef = useRef(false)
 
   const formatCallDuration = (seconds: number) => {
     const mins = Math.floor(seconds / 60)
@@ -94,18 +96,41 @@ function App() {
       setConnectionStatus('connecting')
 
       try {
-        const response = await fetch(`${BASE_URL}token`, {
+        // Rejoin the dropped call's session so the agent can restore the collected details
+        const resumeToken = sessionStorage.getItem('resumeToken')
+        const requestToken = (queueId: string | null) => fetch(`${BASE_URL}token`, {
           method: 'POST',
           headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify({
+            ...(resumeToken ? { resume_token: resumeToken } : {}),
+            ...(queueId ? { queue_id: queueId } : {}),
+          }),
         })
 
+        let response = await requestToken(null)
+        while (response.status === 202) {
+          // Every agent is busy: keep our place in the queue and ask again after Retry-After
+          const queued = await response.json()
+          setQueueWait(queued.estimated_wait_seconds)
+          await new Promise(resolve => setTimeout(resolve, queued.retry_after * 1000))
+          response = await requestToken(queued.queue_id)
+        }
+        setQueueWait(null)
+
+        if (response.status === 429 || response.status === 503) {
+          const retryAfter = response.headers.get('Retry-After')
+          const reason = response.status === 429 ? 'Too many attempts' : 'All agents are busy'
+          throw new Error(`${reason}. Please try again${retryAfter ? ` in ${retryAfter} seconds` : ' later'}.`)
+        }
         if (!response.ok) {
           throw new Error(`HTTP error! status: ${response.status}`)
         }
 
-        const { token, url, session_id } = await response.json()
+        const { token, url, session_id, resume_token } = await response.json()
         console.log(`Starting support session: ${session_id}`)
         setSessionId(session_id)
+        sessionStorage.removeItem('resumeToken')
+        endedByUserRef.current = false
 
         const micAccess = await requestMicrophoneAccess()
         if (!micAccess) {
@@ -128,6 +153,9 @@ function App() {
 
         newRoom.on(RoomEvent.Disconnected, () => {
           console.log('Disconnected from LiveKit room')
+          if (!endedByUserRef.current) {
+            sessionStorage.setItem('resumeToken', resume_token)
+          }
           setIsConnected(false)
           setConnectionStatus('disconnected')
           setSessionId(null)
@@ -157,11 +185,13 @@ function App() {
 
       } catch (error) {
         console.error('Connection failed:', error)
+        setQueueWait(null)
         setConnectionStatus('disconnected')
         alert(`Failed to connect to support: ${error instanceof Error ? error.message : 'Unknown error'}`)
       }
     } else {
 
+      endedByUserRef.current = true
       if (roomRef.current) {
         await roomRef.current.disconnect()
         roomRef.current = null
@@ -234,7 +264,7 @@ function App() {
             <div className="contact-details">
               <h2 className="contact-name">DeskHelp Support</h2>
               <p className="contact-status">
-                {connectionStatus === 'connecting' && 'Connecting...'}
+                {connectionStatus === 'connecting' && (queueWait !== null ? `All agents are busy • about ${Math.ceil(queueWait / 60)} min wait` : 'Connecting...')}
                 {connectionStatus === 'connected' && `Connected • ${formatCallDuration(callDuration)} ${sessionId ? `• Session: ${sessionId}` : ''}`}
                 {connectionStatus === 'disconnected' && 'Available 24/7'}
               </p>